@@ -1,4 +1,22 @@
 from django.contrib import admin
-from .models import *
+from .models import AccountDeletion, Road, RoadAlias, RoadblockReport
 
 admin.site.register(RoadblockReport)
+
+
+@admin.register(AccountDeletion)
+class AccountDeletionAdmin(admin.ModelAdmin):
+    list_display = ["username", "status", "stage", "rows_deleted", "created_at", "finished_at"]
+    list_filter = ["status"]
+
+
+class RoadAliasInline(admin.TabularInline):
+    model = RoadAlias
+    extra = 0
+
+
+@admin.register(Road)
+class RoadAdmin(admin.ModelAdmin):
+    list_display = ["name"]
+    search_fields = ["name", "aliases__key"]
+    inlines = [RoadAliasInline]
@@ -6,4 +6,10 @@ class AppConfig(AppConfig):
     name = "app"
 
     def ready(self):
-        import app.signals
\ No newline at end of file
+        from django.db.backends.signals import connection_created
+
+        import app.signals
+        import app.tasks
+        from app.metrics import instrument_connection
+
+        connection_created.connect(instrument_connection, dispatch_uid="reten_metrics")
@@ -0,0 +1,137 @@
+import gzip
+import mimetypes
+import os
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotAllowed
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always built
+    brotli = None
+
+COMPRESSIBLE = {".css", ".js", ".svg", ".html", ".txt", ".json", ".map", ".xml"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=60"
+
+
+# ---------- COLLECTSTATIC ----------
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Content-hashed names via the manifest, plus .gz/.br siblings written
+    # once at collect time so requests never compress static files.
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        for name in self.hashed_files.values():
+            if os.path.splitext(name)[1] in COMPRESSIBLE:
+                self.write_compressed(name)
+
+    def write_compressed(self, name):
+        path = self.path(name)
+        with open(path, "rb") as f:
+            data = f.read()
+
+        variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(data, quality=11)))
+
+        for suffix, compressed in variants:
+            # tiny files can grow when compressed; the server falls back to the original
+            if len(compressed) < len(data):
+                with open(path + suffix, "wb") as f:
+                    f.write(compressed)
+
+
+# ---------- SERVING ----------
+def accepted_encodings(header):
+    # {coding: q} from Accept-Encoding; "gzip;q=0" refuses gzip, it doesn't ask for it
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+class StaticAssetMiddleware:
+    # Serves STATIC_ROOT in front of the URLconf when DEBUG is off. Hashed
+    # names never change content, so they get a one-year immutable lifetime;
+    # FileResponse hands the open file to wsgi.file_wrapper (sendfile).
+    ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.DEBUG or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.prefix = "/" + urlsplit(settings.STATIC_URL).path.strip("/") + "/"
+        self.files = self.scan(str(settings.STATIC_ROOT))
+        self.hashed = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+
+    def scan(self, root):
+        # built once per process: lookups are a dict hit, and paths that
+        # aren't in the index (including any ../ tricks) simply 404 downstream
+        files = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                files[os.path.relpath(path, root).replace(os.sep, "/")] = path
+        return files
+
+    def __call__(self, request):
+        # a plain dict lookup, so the async path can return without awaiting
+        name = self.match(request)
+        if name is None:
+            return self.get_response(request)
+        response = self.serve(request, name)
+        if iscoroutinefunction(self):
+            return self.wrap(response)
+        return response
+
+    async def wrap(self, response):
+        return response
+
+    def match(self, request):
+        if not request.path_info.startswith(self.prefix):
+            return None
+        name = request.path_info[len(self.prefix):]
+        return name if name in self.files else None
+
+    def serve(self, request, name):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+
+        # the variant with the highest q; on a tie, the first in ENCODINGS
+        accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        path, encoding, best = self.files[name], None, 0.0
+        for candidate, suffix in self.ENCODINGS:
+            q = accepted.get(candidate, accepted.get("*", 0.0))
+            if q > best and name + suffix in self.files:
+                path, encoding, best = self.files[name + suffix], candidate, q
+
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        response = FileResponse(open(path, "rb"), content_type=content_type, filename=os.path.basename(name))
+        if encoding:
+            response["Content-Encoding"] = encoding
+        response["Vary"] = "Accept-Encoding"
+        response["Cache-Control"] = IMMUTABLE if name in self.hashed else REVALIDATE
+        return response
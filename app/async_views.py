@@ -0,0 +1,160 @@
+import asyncio
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required, permission_required
+from django.http import Http404, JsonResponse
+from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
+
+from . import confirmations, report_cache, timelines
+from .etags import aconditional, report_etag, report_history_etag, report_list_etag
+from .forms import ReportPhotoForm, RoadblockCommentForm, RoadblockFilterForm
+from .models import RoadblockReport, UserProfile
+from .report_cache import comment_page_queryset, split_comment_page
+from .views import (
+    EMPTY_STATS,
+    api_login_required,
+    filter_reports,
+    list_reports,
+    parse_comment_cursor,
+    report_revisions,
+    stats_querysets,
+    timeline_scope,
+)
+
+# Async twins of the read-heavy views, wired in by app/urls.py when
+# ASYNC_VIEWS is on and the app is served through config/asgi.py.
+# Independent queries are awaited together with asyncio.gather. Rendering
+# stays in a worker thread, because the template context processors touch
+# request.user lazily.
+
+
+async def alist(qs):
+    return [obj async for obj in qs]
+
+
+async def alist_reports(qs):
+    if len(qs.per_shard()) == 1:
+        return await alist(qs)
+    return await sync_to_async(list_reports)(qs)
+
+
+arender = sync_to_async(render)
+arender_to_string = sync_to_async(render_to_string)
+
+
+# ---------- REPORT LIST ----------
+@login_required
+@aconditional(report_list_etag)
+async def report_list_view(request):
+    user = await request.auser()
+    profile = await UserProfile.objects.filter(user=user).afirst()
+
+    scope = await sync_to_async(timeline_scope)(user, profile, request.GET)  # may read the cache or build a city list
+    if scope:
+        load = sync_to_async(timelines.reports)(*scope)
+    else:
+        load = alist_reports(filter_reports(user, profile, request.GET))
+    stats = stats_querysets(profile) or {}
+    reports, confirmed, *counts = await asyncio.gather(
+        load,
+        sync_to_async(confirmations.confirmed_reports)(user.pk),
+        *(stat.acount() for stat in stats.values()),
+    )
+
+    return await arender(
+        request,
+        "roadblocks/report_list.html",
+        {
+            "reports": reports,
+            "filter_form": RoadblockFilterForm(request.GET),
+            "needs_location": not profile or not profile.state,
+            "stats": dict(zip(stats, counts)) if stats else EMPTY_STATS,
+            "confirmed_ids": confirmed.among(report.pk for report in reports),
+        },
+        using=settings.REPORT_LIST_TEMPLATE_ENGINE,
+    )
+
+
+# ---------- REPORT DETAIL ----------
+@login_required
+@aconditional(report_etag)
+async def report_detail_view(request, pk):
+    from . import attachments  # lazily, like the photo views
+
+    user = await request.auser()
+    detail = await sync_to_async(report_cache.get_detail)(pk)
+    if detail is None:
+        raise Http404("No RoadblockReport matches the given query.")
+    report = detail["report"]
+
+    if request.method == "POST":
+        comment_form = RoadblockCommentForm(request.POST)
+        if comment_form.is_valid():
+            comment = comment_form.save(commit=False)
+            comment.owner = user
+            comment.report_id = report.pk
+            await comment.asave()
+            return redirect("report-detail", pk=pk)
+    else:
+        comment_form = RoadblockCommentForm()
+
+    before = parse_comment_cursor(request)
+    if before:
+        confirmed, comments = await asyncio.gather(
+            sync_to_async(confirmations.confirmed_reports)(user.pk),
+            alist(comment_page_queryset(pk, before=before)),
+        )
+        comments, next_cursor = split_comment_page(comments)
+    else:
+        confirmed = await sync_to_async(confirmations.confirmed_reports)(user.pk)
+        comments, next_cursor = detail["comments"], detail["next_cursor"]
+
+    return await arender(
+        request,
+        "roadblocks/report_detail.html",
+        {
+            "report": report,
+            "comment_form": comment_form,
+            "already_confirmed": report.pk in confirmed,
+            "confirmation_count": report.confirmation_count,
+            "comments": comments,
+            "next_cursor": next_cursor,
+            "idempotency_key": uuid.uuid4().hex,
+            "photos": detail["attachments"],
+            "photo_form": ReportPhotoForm(),
+            "max_photos": attachments.MAX_PER_REPORT,
+        },
+    )
+
+
+# ---------- JSON ----------
+@login_required
+async def report_comments_view(request, pk):
+    if not await RoadblockReport.objects.filter(pk=pk).aexists():
+        raise Http404("No RoadblockReport matches the given query.")
+
+    comments, next_cursor = split_comment_page(
+        await alist(comment_page_queryset(pk, before=parse_comment_cursor(request)))
+    )
+    html = await arender_to_string("roadblocks/_comment_items.html", {"comments": comments}, request=request)
+    return JsonResponse({"html": html, "count": len(comments), "next_cursor": next_cursor})
+
+
+@api_login_required
+@permission_required("app.can_view_moderation", raise_exception=True)
+@aconditional(report_history_etag)
+async def api_report_history(request, pk):
+    revisions = [
+        {
+            "id": rev.id,
+            "action": rev.action,
+            "actor": rev.actor.username if rev.actor else None,
+            "changes": rev.changes,
+            "ts": rev.ts.isoformat(),
+        }
+        async for rev in report_revisions(pk)
+    ]
+    return JsonResponse({"report_id": pk, "revisions": revisions})
@@ -0,0 +1,308 @@
+import hashlib
+import logging
+import os
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import IntegrityError
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from . import metrics
+from .models import ReportAttachment, RoadblockReport, attachment_storage
+from .sharding import shard_for_pk
+
+logger = logging.getLogger(__name__)
+
+# Photos on reports.
+#
+#   photos/<ab>/<sha256>.<ext>     the upload, byte for byte
+#   thumbnails/<ab>/<sha256>.jpg   at most THUMBNAIL_SIZE px, built by the worker
+#
+# HashingUploadHandler streams each upload to a temporary file and hashes it
+# on the way, so uploads never sit in memory. Files are named by content, so
+# a photo posted to ten reports is stored once; FileSystemStorage moves the
+# temporary file into place, other backends stream its chunks. Thumbnails are
+# built by the task worker (run_worker --threads N) and the first one becomes
+# the report's cover, the only image list pages load.
+#
+# Files are never deleted with their rows: `manage.py sweep_attachments`
+# removes the ones no row points at any more.
+MAX_BYTES = getattr(settings, "ATTACHMENT_MAX_BYTES", 10 * 2**20)
+MAX_PER_REPORT = getattr(settings, "ATTACHMENT_MAX_PER_REPORT", 8)
+THUMBNAIL_SIZE = getattr(settings, "ATTACHMENT_THUMBNAIL_SIZE", 320)
+THUMBNAIL_QUALITY = 80
+CHUNK_SIZE = 64 * 2**10
+
+# (content type, extension, test on the first bytes)
+TYPES = [
+    ("image/jpeg", ".jpg", lambda head: head[:3] == b"\xff\xd8\xff"),
+    ("image/png", ".png", lambda head: head[:8] == b"\x89PNG\r\n\x1a\n"),
+    ("image/gif", ".gif", lambda head: head[:6] in (b"GIF87a", b"GIF89a")),
+    ("image/webp", ".webp", lambda head: head[:4] == b"RIFF" and head[8:12] == b"WEBP"),
+]
+
+
+# ---------- UPLOADS ----------
+class HashingUploadHandler(FileUploadHandler):
+    # The only upload handler (FILE_UPLOAD_HANDLERS). Past MAX_BYTES bytes are
+    # counted but no longer written; the form rejects the file by its size.
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.hasher = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received <= MAX_BYTES:
+            self.file.write(raw_data)
+            self.hasher.update(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.content_hash = self.hasher.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, "file"):
+            path = self.file.temporary_file_path()
+            try:
+                self.file.close()
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def sniff(upload):
+    # (content type, extension) from the file's own first bytes, never from
+    # what the browser claims; None if it isn't an image we accept
+    upload.seek(0)
+    head = upload.read(12)
+    upload.seek(0)
+    for content_type, extension, test in TYPES:
+        if test(head):
+            return content_type, extension
+    return None
+
+
+def content_hash(upload):
+    # set by HashingUploadHandler; files that came another way are hashed here
+    digest = getattr(upload, "content_hash", None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        for chunk in upload.chunks(CHUNK_SIZE):
+            hasher.update(chunk)
+        upload.seek(0)
+        digest = hasher.hexdigest()
+    return digest
+
+
+def original_name(digest, extension):
+    return f"photos/{digest[:2]}/{digest}{extension}"
+
+
+def thumbnail_name(digest):
+    return f"thumbnails/{digest[:2]}/{digest}.jpg"
+
+
+def store(upload, name):
+    # content-addressed: an existing file with this name already holds these bytes
+    storage = attachment_storage()
+    if storage.exists(name):
+        return name, False
+    return storage.save(name, upload), True
+
+
+def attach(report, owner, upload, content_type, extension):
+    # Returns (attachment, created). The same photo twice on one report is
+    # the existing attachment.
+    digest = content_hash(upload)
+    existing = ReportAttachment.objects.for_report(report.pk).filter(report_id=report.pk, content_hash=digest)
+    attachment = existing.first()
+    if attachment is not None:
+        metrics.ATTACHMENT_UPLOADS.inc(result="repeat")
+        return attachment, False
+
+    name, stored = store(upload, original_name(digest, extension))
+    try:
+        attachment = ReportAttachment.objects.create(
+            report_id=report.pk,
+            owner=owner,
+            content_hash=digest,
+            content_type=content_type,
+            size=upload.size,
+            file=name,
+        )
+    except IntegrityError:  # a double submit got there first
+        return existing.get(), False
+    metrics.ATTACHMENT_UPLOADS.inc(result="stored" if stored else "deduplicated")
+
+    if pillow()[0] is not None:
+        from .tasks import make_thumbnail
+
+        make_thumbnail.delay(attachment.pk)
+    RoadblockReport.touch(pk=report.pk)
+    return attachment, True
+
+
+def detach(attachment):
+    # the report's cover moves on to its next photo with a thumbnail
+    report_id = attachment.report_id
+    attachment.delete()
+    photos = ReportAttachment.objects.for_report(report_id).filter(report_id=report_id).exclude(thumbnail="")
+    RoadblockReport.objects.for_report(report_id).filter(pk=report_id, cover__isnull=True).update(
+        cover=photos.order_by("id").values("id")[:1]
+    )
+    RoadblockReport.touch(pk=report_id)
+
+
+# ---------- THUMBNAILS ----------
+def pillow():
+    # (Image, ImageOps), or (None, None) without Pillow, in which case photos
+    # get no thumbnails. Imported on first use: most workers never need it.
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None, None
+    return Image, ImageOps
+
+
+def oriented_size(image):
+    # the size as displayed: EXIF orientations 5-8 are rotated a quarter turn
+    width, height = image.size
+    if image.getexif().get(0x0112) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+def render_thumbnail(image):
+    # JPEGs are decoded straight at 1/2, 1/4 or 1/8 scale, which is most of
+    # the work saved on a camera photo
+    Image, ImageOps = pillow()
+    image.draft("RGB", (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+    out = BytesIO()
+    image.save(out, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def build_thumbnail(attachment_id):
+    # make_thumbnail task body; a thumbnail another report's copy of the
+    # photo already has is reused
+    Image, _ = pillow()
+    db = shard_for_pk(attachment_id)
+    attachment = ReportAttachment.objects.using(db).filter(pk=attachment_id).first()
+    if attachment is None or attachment.thumbnail or Image is None:
+        return
+
+    storage = attachment_storage()
+    name = thumbnail_name(attachment.content_hash)
+    try:
+        with storage.open(attachment.file.name, "rb") as f, Image.open(f) as image:
+            width, height = oriented_size(image)
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(render_thumbnail(image)))
+    except (OSError, Image.DecompressionBombError) as exc:
+        # not worth retrying: the file is broken or absurdly large
+        logger.warning("No thumbnail for attachment %s: %s", attachment_id, exc)
+        return
+
+    ReportAttachment.objects.using(db).filter(pk=attachment_id).update(thumbnail=name, width=width, height=height)
+    RoadblockReport.objects.using(db).filter(pk=attachment.report_id, cover__isnull=True).update(cover=attachment_id)
+    RoadblockReport.touch(pk=attachment.report_id)
+
+
+# ---------- SERVING ----------
+# A URL always serves the same bytes, so browsers keep them for a year and
+# never revalidate. Private: only signed-in users see report photos.
+IMMUTABLE = "private, max-age=31536000, immutable"
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class Unsatisfiable(ValueError):
+    pass
+
+
+def byte_range(header, size):
+    # (first, last) inclusive for a single range, None to send the whole file
+    # (anything else, multiple ranges included, is allowed to be ignored)
+    match = BYTE_RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:  # bytes=-N, the last N bytes
+        if int(last) == 0:
+            raise Unsatisfiable
+        return max(size - int(last), 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size:
+        raise Unsatisfiable
+    if last < first:
+        return None
+    return first, last
+
+
+def read_span(f, start, length):
+    try:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def file_response(request, name, content_type, etag):
+    f = attachment_storage().open(name, "rb")
+    size = f.size
+    header = request.headers.get("Range")
+    # If-Range: only resume a download of these exact bytes
+    if header and request.headers.get("If-Range", etag) == etag:
+        try:
+            span = byte_range(header, size)
+        except Unsatisfiable:
+            f.close()
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        if span:
+            first, last = span
+            response = StreamingHttpResponse(
+                read_span(f, first, last - first + 1), status=206, content_type=content_type
+            )
+            response["Content-Length"] = str(last - first + 1)
+            response["Content-Range"] = f"bytes {first}-{last}/{size}"
+            return response
+    return FileResponse(f, content_type=content_type)
+
+
+def serve(request, name, content_type, etag):
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = file_response(request, name, content_type, etag)
+    response["ETag"] = etag
+    response["Cache-Control"] = IMMUTABLE
+    response["Accept-Ranges"] = "bytes"
+    response["X-Content-Type-Options"] = "nosniff"
+    return response
+
@@ -0,0 +1,95 @@
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.utils import timezone
+
+from .models import ReportRevision
+
+AUDITED_FIELDS = [
+    "title",
+    "description",
+    "road_name",
+    "nearby_place",
+    "city",
+    "state",
+    "severity",
+    "status",
+    "verified",
+]
+
+_pending = ContextVar("pending_report_revisions", default=None)
+
+
+def form_changes(form):
+    return {
+        name: [form.initial.get(name), form.cleaned_data.get(name)]
+        for name in form.changed_data
+        if name in AUDITED_FIELDS
+    }
+
+
+def deleted_changes(report):
+    return {name: [getattr(report, name), None] for name in AUDITED_FIELDS}
+
+
+def record(report, actor, action, changes):
+    if not changes:
+        return None
+
+    ts = timezone.now()
+    revision = ReportRevision(
+        report_id=report.pk,
+        actor_id=getattr(actor, "pk", None),
+        action=action,
+        changes=changes,
+        ts=ts,
+        month=ts.year * 100 + ts.month,
+    )
+
+    pending = _pending.get()
+    if pending is None:
+        # outside a request (shell, worker): nothing to batch with
+        revision.save()
+    else:
+        pending.append(revision)
+    return revision
+
+
+def flush():
+    pending = _pending.get()
+    if pending:
+        ReportRevision.objects.bulk_create(pending)
+        pending.clear()
+
+
+class AuditMiddleware:
+    # Collects the revisions a request produces and writes them in one
+    # INSERT once the view has returned.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = _pending.set([])
+        try:
+            response = self.get_response(request)
+            flush()
+        finally:
+            _pending.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        token = _pending.set([])
+        try:
+            response = await self.get_response(request)
+            await sync_to_async(flush)()
+        finally:
+            _pending.reset(token)
+        return response
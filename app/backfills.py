@@ -0,0 +1,154 @@
+import time
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .confirmations import counted_confirmations
+from .models import BackfillProgress, RoadblockReport, UserProfile
+
+# Batched, throttled, resumable backfills for columns on the big report
+# tables (see app/online_migrations.py for the schema side).
+#
+# A backfill walks the rows that may need it in id order, BATCH ids per
+# short transaction, on every shard. After each batch it saves its cursor in
+# BackfillProgress and sleeps, at least `sleep` seconds and long enough that
+# writing takes no more than `duty` of the wall clock, so replicas and the
+# site's own writes keep up. An interrupted run resumes from its cursor.
+#
+#   python manage.py run_backfill report_roads --batch 2000 --duty 0.25
+REGISTRY = {}
+
+
+def register(cls):
+    REGISTRY[cls.name] = cls()
+    return cls
+
+
+class Backfill:
+    name = ""
+    help = ""
+
+    def queryset(self):
+        # rows that may need filling; narrowing it keeps reruns cheap
+        return RoadblockReport.objects.all()
+
+    def apply(self, qs, pks):
+        # fill in one batch; qs is the model's manager on the batch's database.
+        # Returns the number of rows changed.
+        raise NotImplementedError
+
+
+# ---------- BACKFILLS ----------
+@register
+class ReportRoads(Backfill):
+    name = "report_roads"
+    help = "Link reports to their canonical road (app/roads.py)."
+
+    def queryset(self):
+        return RoadblockReport.objects.filter(road__isnull=True)
+
+    def apply(self, qs, pks):
+        from .roads import road_id_for
+
+        by_road = {}
+        for pk, road_name in qs.filter(pk__in=pks).values_list("pk", "road_name"):
+            road_id = road_id_for(road_name)
+            if road_id:
+                by_road.setdefault(road_id, []).append(pk)
+        # road isn't shown on any page, so version and updated_at stay put
+        return sum(qs.filter(pk__in=ids).update(road_id=road_id) for road_id, ids in by_road.items())
+
+
+@register
+class ReportDisplayFields(Backfill):
+    name = "report_display_fields"
+    help = "Recompute maps_url and trust_level, which save() normally keeps up to date."
+
+    def apply(self, qs, pks):
+        fields = ["road_name", "nearby_place", "city", "state", "verified", "owner_id", "maps_url", "trust_level"]
+        reports = list(qs.filter(pk__in=pks).only(*fields))
+        verified_owners = set(
+            UserProfile.objects.filter(
+                user_id__in={report.owner_id for report in reports}, is_verified=True
+            ).values_list("user_id", flat=True)
+        )
+        # one UPDATE per distinct value pair, as in scoring.write_scores;
+        # bulk_update's CASE per row is far slower on a batch this size
+        by_values = {}
+        for report in reports:
+            maps_url = report.build_maps_url()
+            trust_level = "ADMIN" if report.verified else "ACCOUNT" if report.owner_id in verified_owners else "NONE"
+            if (maps_url, trust_level) != (report.maps_url, report.trust_level):
+                by_values.setdefault((maps_url, trust_level), []).append(report.pk)
+        changed = [pk for ids in by_values.values() for pk in ids]
+        for (maps_url, trust_level), ids in by_values.items():
+            qs.filter(pk__in=ids).update(maps_url=maps_url, trust_level=trust_level)
+        if changed:
+            touch(qs, changed)
+        return len(changed)
+
+
+@register
+class ReportConfirmationCount(Backfill):
+    name = "report_confirmation_count"
+    help = "Recount confirmation_count from the confirmation rows."
+
+    def apply(self, qs, pks):
+        stale = list(
+            qs.filter(pk__in=pks).exclude(confirmation_count=counted_confirmations()).values_list("pk", flat=True)
+        )
+        if stale:
+            qs.filter(pk__in=stale).update(confirmation_count=counted_confirmations())
+            touch(qs, stale)
+        return len(stale)
+
+
+def touch(qs, pks):
+    # pages show these fields, so cached copies have to move on
+    qs.filter(pk__in=pks).update(version=F("version") + 1, updated_at=timezone.now())
+    RoadblockReport.forget_versions(pks)
+
+
+# ---------- RUNNER ----------
+def run(name, batch=1000, sleep=0.05, duty=0.5, max_batches=None, restart=False, stdout=None):
+    # Returns True once every database is done, False if max_batches stopped
+    # it early (run it again to carry on).
+    backfill = REGISTRY[name]
+    batches = 0
+    for part in backfill.queryset().per_shard():
+        alias = part.db
+        progress, _ = BackfillProgress.objects.get_or_create(name=name, database=alias)
+        if restart:
+            progress.last_pk, progress.rows, progress.batches, progress.finished_at = 0, 0, 0, None
+            progress.save()
+        if progress.finished_at:
+            continue
+
+        manager = part.model.objects.using(alias)
+        while True:
+            if max_batches is not None and batches >= max_batches:
+                return False
+            pks = list(part.filter(pk__gt=progress.last_pk).order_by("pk").values_list("pk", flat=True)[:batch])
+            if not pks:
+                progress.finished_at = timezone.now()
+                progress.save(update_fields=["finished_at", "updated_at"])
+                break
+
+            start = time.perf_counter()
+            with transaction.atomic(using=alias):
+                changed = backfill.apply(manager, pks)
+            elapsed = time.perf_counter() - start
+
+            progress.last_pk = pks[-1]
+            progress.rows += changed
+            progress.batches += 1
+            progress.save(update_fields=["last_pk", "rows", "batches", "updated_at"])
+            batches += 1
+            if stdout and progress.batches % 100 == 0:
+                stdout.write(f"{name} on {alias}: up to pk {progress.last_pk}, {progress.rows} rows changed")
+            time.sleep(max(sleep, elapsed * (1 - duty) / duty))
+
+        if stdout:
+            stdout.write(f"{name} on {alias}: done, {progress.rows} rows changed in {progress.batches} batches")
+    return True
@@ -0,0 +1,274 @@
+import atexit
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .metrics import CONFIRMATIONS, cache_lookup
+from .models import RoadblockConfirmation, RoadblockReport
+from .sharding import by_shard, scatter
+
+FLUSH_INTERVAL = getattr(settings, "CONFIRMATION_FLUSH_INTERVAL", 0.5)
+FLUSH_BATCH = getattr(settings, "CONFIRMATION_FLUSH_BATCH", 200)
+INDEX_TTL = getattr(settings, "CONFIRMED_INDEX_TTL", 600)
+IDEMPOTENCY_TTL = 24 * 60 * 60
+
+
+# ---------- WRITES ----------
+def confirm(report_id, user_id):
+    # INSERT ... ON CONFLICT DO NOTHING: a double click or a racing request is
+    # a no-op instead of an IntegrityError.
+    RoadblockConfirmation.objects.for_report(report_id).bulk_create(
+        [RoadblockConfirmation(report_id=report_id, user_id=user_id)],
+        ignore_conflicts=True,
+    )
+    CONFIRMATIONS.inc(action="confirm")
+    update_confirmed(user_id, report_id, True)
+    counters.mark(report_id)
+
+
+def unconfirm(report_id, user_id):
+    # no signals or dependents, so this is a single DELETE
+    rows = RoadblockConfirmation.objects.for_report(report_id)
+    deleted, _ = rows.filter(report_id=report_id, user_id=user_id).delete()
+    CONFIRMATIONS.inc(action="unconfirm")
+    if deleted:
+        update_confirmed(user_id, report_id, False)
+        counters.mark(report_id)
+
+
+def current_count(report_id):
+    # counted from the rows, for responses sent before the next flush
+    return RoadblockConfirmation.objects.for_report(report_id).filter(report_id=report_id).count()
+
+
+# ---------- COUNTER COALESCING ----------
+def counted_confirmations():
+    # a report's confirmation_count, recounted from the table in SQL
+    counts = (
+        RoadblockConfirmation.objects.filter(report=OuterRef("pk"))
+        .values("report")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class CounterCoalescer:
+    # Collects the reports whose confirmations changed and refreshes their
+    # confirmation_count (and version) in one UPDATE per batch. Counts are
+    # recomputed from the confirmation rows, so flushes from several processes
+    # never double count. Pending ids are flushed when the process exits; a
+    # process killed outright can leave a count behind until the next change
+    # to that report or `manage.py run_backfill report_confirmation_count --restart`.
+    def __init__(self, interval=FLUSH_INTERVAL, batch=FLUSH_BATCH):
+        self.interval = interval
+        self.batch = batch
+        self.dirty = set()
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def mark(self, report_id):
+        if self.interval <= 0:
+            self.write([report_id])
+            return
+
+        with self.lock:
+            self.dirty.add(report_id)
+            full = len(self.dirty) >= self.batch
+            if not full and self.timer is None:
+                self.timer = threading.Timer(self.interval, self.flush_from_timer)
+                self.timer.daemon = True
+                self.timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            ids, self.dirty = self.dirty, set()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if ids:
+            self.write(ids)
+        return len(ids)
+
+    def flush_from_timer(self):
+        try:
+            with self.lock:
+                self.timer = None
+            self.flush()
+        finally:
+            connections.close_all()  # only this thread's connections
+
+    def write(self, ids):
+        for alias, shard_ids in by_shard(ids).items():
+            RoadblockReport.objects.using(alias).filter(pk__in=shard_ids).update(
+                confirmation_count=counted_confirmations(),
+                version=F("version") + 1,
+                updated_at=timezone.now(),
+            )
+        RoadblockReport.forget_versions(ids)
+
+
+counters = CounterCoalescer()
+atexit.register(counters.flush)
+
+
+# ---------- PER-USER INDEX ----------
+class ConfirmedReports:
+    # The report ids one user has confirmed, as a sorted array: 4 bytes per id
+    # in the cache, and membership by binary search.
+    def __init__(self, ids=(), typecode="I"):
+        ids = sorted(set(ids))
+        if ids and ids[-1] >= 2**32:
+            typecode = "Q"
+        self.ids = array(typecode, ids)
+
+    def __contains__(self, report_id):
+        i = bisect_left(self.ids, report_id)
+        return i < len(self.ids) and self.ids[i] == report_id
+
+    def __len__(self):
+        return len(self.ids)
+
+    def among(self, report_ids):
+        # one merge pass over a page of ids (any order) and the sorted array
+        found = set()
+        i, ids, n = 0, self.ids, len(self.ids)
+        for report_id in sorted(report_ids):
+            while i < n and ids[i] < report_id:
+                i += 1
+            if i == n:
+                break
+            if ids[i] == report_id:
+                found.add(report_id)
+        return found
+
+    def add(self, report_id):
+        i = bisect_left(self.ids, report_id)
+        if i == len(self.ids) or self.ids[i] != report_id:
+            if report_id >= 2**32 and self.ids.typecode == "I":
+                self.ids = array("Q", self.ids)
+            self.ids.insert(i, report_id)
+
+    def discard(self, report_id):
+        i = bisect_left(self.ids, report_id)
+        if i < len(self.ids) and self.ids[i] == report_id:
+            del self.ids[i]
+
+    def dumps(self):
+        return self.ids.typecode, self.ids.tobytes()
+
+    @classmethod
+    def loads(cls, value):
+        index = cls()
+        index.ids = array(value[0])
+        index.ids.frombytes(value[1])
+        return index
+
+
+# Every change to a user's confirmations bumps their index version first,
+# and a cached index is only read while it carries the current version. A
+# writer patches the cached index only if it is exactly one version behind,
+# i.e. nobody else changed the confirmations in between; otherwise it is
+# left for the next read to rebuild. A racing writer can cost a rebuild but
+# can never leave an index missing a change.
+def index_key(user_id):
+    return f"confirmed:{user_id}"
+
+
+def index_version_key(user_id):
+    return f"confirmed:{user_id}:version"
+
+
+def new_index_version(key):
+    # nanoseconds: a version that fell out of the cache never comes back
+    # with a number an old index was stored under
+    cache.add(key, time.time_ns(), INDEX_TTL)
+    return cache.get(key)
+
+
+def index_version(user_id):
+    # also part of the list and detail ETags, see app/etags.py
+    key = index_version_key(user_id)
+    version = cache.get(key)
+    return version if version is not None else new_index_version(key)
+
+
+def bump_index_version(user_id):
+    key = index_version_key(user_id)
+    try:
+        return cache.incr(key)
+    except ValueError:  # not in the cache
+        new_index_version(key)
+        return cache.incr(key)
+
+
+def confirmed_reports(user_id):
+    key, version_key = index_key(user_id), index_version_key(user_id)
+    values = cache.get_many([key, version_key])
+    version = values.get(version_key)
+    if version is None:
+        version = new_index_version(version_key)
+    value = values.get(key)
+    hit = value is not None and value[0] == version
+    cache_lookup("confirmed_index", hit)
+    if hit:
+        return ConfirmedReports.loads(value[1])
+
+    # the version was read before the table, so a confirm landing during
+    # the rebuild leaves this copy stale rather than wrong
+    qs = RoadblockConfirmation.objects.filter(user_id=user_id).values_list("report_id", flat=True)
+    index = ConfirmedReports(report_id for part in scatter(list, qs.per_shard()) for report_id in part)
+    cache.set(key, (version, index.dumps()), INDEX_TTL)
+    return index
+
+
+def forget_confirmed(user_id):
+    # after an account purge; a version key that comes back is a new number
+    cache.delete_many([index_key(user_id), index_version_key(user_id)])
+
+
+def update_confirmed(user_id, report_id, confirmed):
+    # call after the confirmation row has been written or deleted
+    version = bump_index_version(user_id)
+    key = index_key(user_id)
+    value = cache.get(key)
+    if value is None or value[0] != version - 1:
+        return
+    index = ConfirmedReports.loads(value[1])
+    if confirmed:
+        index.add(report_id)
+    else:
+        index.discard(report_id)
+    cache.set(key, (version, index.dumps()), INDEX_TTL)
+
+
+# ---------- IDEMPOTENCY ----------
+def idempotency_key(request):
+    key = request.headers.get("Idempotency-Key") or request.POST.get("idempotency_key")
+    if not key:
+        return None
+    match = request.resolver_match
+    return f"idem:{request.user.pk}:{match.url_name}:{match.kwargs.get('pk')}:{key[:64]}"
+
+
+def replay(key):
+    if not key:
+        return None
+    payload = cache.get(key)
+    cache_lookup("idempotency", payload is not None)
+    return payload
+
+
+def remember(key, payload):
+    if key:
+        cache.set(key, payload, IDEMPOTENCY_TTL)
@@ -0,0 +1,199 @@
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ReportRevision, RoadblockConfirmation, RoadblockReport
+from .notifications import record_report_events
+from .sharding import by_shard
+
+# Raises a report's severity, or flags it for moderator review, when it
+# collects confirmations quickly.
+#
+# A single `manage.py run_escalation` process reads new RoadblockConfirmation
+# rows in id order, a few thousand per query, and keeps a sliding window of
+# distinct confirmers per report in memory. Crossing a threshold only queues
+# the change; queued changes are written every FLUSH_INTERVAL seconds. So the
+# database sees one read per batch and one write per escalation, never one per
+# confirmation.
+#
+#   ESCALATION_THRESHOLDS = {"MED": 5, "HIGH": 15}  distinct confirmers within
+#                                                     ESCALATION_WINDOW seconds
+#   ESCALATION_REVIEW_THRESHOLD = 30                 flag for moderator review
+WINDOW = getattr(settings, "ESCALATION_WINDOW", 600)
+THRESHOLDS = getattr(settings, "ESCALATION_THRESHOLDS", {"MED": 5, "HIGH": 15})
+REVIEW_THRESHOLD = getattr(settings, "ESCALATION_REVIEW_THRESHOLD", 30)
+FLUSH_INTERVAL = getattr(settings, "ESCALATION_FLUSH_INTERVAL", 5.0)
+BATCH = getattr(settings, "ESCALATION_BATCH", 5000)
+
+RANK = {code: rank for rank, (code, _) in enumerate(RoadblockReport.SEVERITY_CHOICES)}
+
+
+# ---------- ENGINE ----------
+class EscalationEngine:
+    # Pure in-memory state; times are epoch seconds from the confirmations
+    # themselves, so a replay behaves exactly like the live feed.
+    def __init__(self, window=WINDOW, thresholds=THRESHOLDS, review_threshold=REVIEW_THRESHOLD):
+        self.window = window
+        self.levels = sorted(thresholds.items(), key=lambda item: RANK[item[0]], reverse=True)
+        self.review_threshold = review_threshold
+        self.clock = 0.0
+
+        self.windows = {}  # report_id -> {user_id: ts}, oldest first
+        self.raised = {}  # report_id -> highest severity queued so far
+        self.flagged = set()
+
+        # queued for the next flush
+        self.escalate = {}
+        self.review = set()
+
+    def observe(self, report_id, user_id, ts):
+        if ts > self.clock:
+            self.clock = ts
+        window = self.windows.get(report_id)
+        if window is None:
+            window = self.windows[report_id] = OrderedDict()
+        window[user_id] = ts
+        window.move_to_end(user_id)
+
+        cutoff = self.clock - self.window
+        while window and next(iter(window.values())) < cutoff:
+            window.popitem(last=False)
+        self.evaluate(report_id, len(window))
+
+    def evaluate(self, report_id, confirmers):
+        for level, threshold in self.levels:
+            if confirmers >= threshold:
+                if RANK[level] > RANK.get(self.raised.get(report_id), -1):
+                    self.raised[report_id] = self.escalate[report_id] = level
+                break
+        if confirmers >= self.review_threshold and report_id not in self.flagged:
+            self.flagged.add(report_id)
+            self.review.add(report_id)
+
+    def take(self):
+        escalate, review = self.escalate, self.review
+        self.escalate, self.review = {}, set()
+        return escalate, review
+
+    def sweep(self, now=None):
+        # forget reports that have gone quiet, so memory tracks the active set
+        cutoff = (now or self.clock) - self.window
+        idle = [
+            report_id
+            for report_id, window in self.windows.items()
+            if not window or next(reversed(window.values())) < cutoff
+        ]
+        for report_id in idle:
+            del self.windows[report_id]
+            self.raised.pop(report_id, None)
+            self.flagged.discard(report_id)
+        return len(idle)
+
+
+# ---------- PERSISTENCE ----------
+def persist(escalate, review):
+    # Writes are conditional on the row not having changed under us, so a
+    # moderator edit in between wins and severities only ever go up.
+    now = timezone.now()
+    revisions, raised = [], []
+    for alias, ids in by_shard({*escalate, *review}).items():
+        reports = RoadblockReport.objects.using(alias).filter(pk__in=ids, status="ACTIVE")
+        for report in reports.only("severity", "needs_review", "state", "city", "status"):
+            changes = {}
+            target = escalate.get(report.pk)
+            if target and RANK[target] > RANK[report.severity]:
+                changes["severity"] = [report.severity, target]
+            if report.pk in review and not report.needs_review:
+                changes["needs_review"] = [False, True]
+            if not changes:
+                continue
+
+            updated = (
+                RoadblockReport.objects.using(alias)
+                .filter(pk=report.pk, severity=report.severity, needs_review=report.needs_review)
+                .update(
+                    **{field: new for field, (_, new) in changes.items()},
+                    version=F("version") + 1,
+                    updated_at=now,
+                )
+            )
+            if not updated:
+                continue
+            revisions.append(
+                ReportRevision(
+                    report_id=report.pk, action="ESCALATE", changes=changes, ts=now, month=now.year * 100 + now.month
+                )
+            )
+            if "severity" in changes:
+                report.severity = target
+                raised.append(report)
+
+    if revisions:
+        ReportRevision.objects.bulk_create(revisions)
+        RoadblockReport.forget_versions([revision.report_id for revision in revisions])
+    # alerts go out for reports that just reached a notifying severity
+    record_report_events(raised, "ESCALATE")
+    return len(revisions)
+
+
+def flush(engine, now=None):
+    escalate, review = engine.take()
+    engine.sweep(now)
+    if not escalate and not review:
+        return 0
+    return persist(escalate, review)
+
+
+# ---------- FEED ----------
+class ConfirmationFeed:
+    # Tails the confirmation table by id, one cursor per database. Starts at
+    # the first row inside the window so a restart rebuilds the rates it lost.
+    # A row committed out of id order can be missed; that only lowers a rate.
+    def __init__(self, since):
+        self.cursors = {}
+        for qs in RoadblockConfirmation.objects.all().per_shard():
+            first = qs.filter(created_at__gte=since).order_by("id").values_list("id", flat=True).first()
+            if first is None:
+                first = (qs.order_by("-id").values_list("id", flat=True).first() or 0) + 1
+            self.cursors[qs.db] = first - 1
+
+    def read(self, batch=BATCH):
+        rows = []
+        for qs in RoadblockConfirmation.objects.all().per_shard():
+            part = list(
+                qs.filter(id__gt=self.cursors[qs.db])
+                .order_by("id")
+                .values_list("id", "report_id", "user_id", "created_at")[:batch]
+            )
+            if part:
+                self.cursors[qs.db] = part[-1][0]
+                rows += part
+        # shards interleave in time
+        return sorted(rows, key=itemgetter(3))
+
+
+def watch(poll=1.0, once=False, stdout=None):
+    engine = EscalationEngine()
+    feed = ConfirmationFeed(timezone.now() - timedelta(seconds=engine.window))
+    last_flush = time.monotonic()
+
+    while True:
+        rows = feed.read()
+        for _, report_id, user_id, created_at in rows:
+            engine.observe(report_id, user_id, created_at.timestamp())
+
+        if not rows or time.monotonic() - last_flush >= FLUSH_INTERVAL:
+            changed = flush(engine, time.time())
+            last_flush = time.monotonic()
+            if changed and stdout:
+                stdout.write(f"escalated {changed} reports")
+
+        if not rows:
+            if once:
+                return engine
+            time.sleep(poll)
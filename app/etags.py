@@ -0,0 +1,115 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .confirmations import index_version
+from .models import RoadblockReport, ReportRevision
+from .report_cache import current_version
+from .sharding import scatter
+
+
+# Every ETag here is computed from one or two indexed lookups, so a matching
+# If-None-Match turns into a 304 before any template is rendered. Pages are
+# per user, so the user, their CSRF cookie (embedded in forms) and the query
+# string are always part of the tag. Report pages also show which reports the
+# user confirmed, which changes before the report's own version does (see
+# app/confirmations.py), so those tags carry the user's index version too.
+def make_etag(request, *parts):
+    key = "|".join(
+        str(part)
+        for part in (
+            request.user.pk,
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+            request.GET.urlencode(),
+            *parts,
+        )
+    )
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def user_state(user):
+    profile = getattr(user, "profile", None)
+    return (profile.state or "").upper() if profile else ""
+
+
+def scoped_reports(user):
+    if user.is_staff or user.is_superuser:
+        return RoadblockReport.objects.all(), ""
+    state = user_state(user)
+    return RoadblockReport.objects.for_state(state).filter(state=state), state
+
+
+def report_marks(qs):
+    # newest update and row count, summed over every shard the reports span
+    parts = scatter(lambda part: part.aggregate(last=Max("updated_at"), n=Count("id")), qs.per_shard())
+    lasts = [part["last"] for part in parts if part["last"] is not None]
+    return max(lasts, default=None), sum(part["n"] for part in parts)
+
+
+def report_list_etag(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    qs, state = scoped_reports(request.user)
+    return make_etag(request, "list", state, index_version(request.user.pk), *report_marks(qs))
+
+
+def all_reports_etag(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    return make_etag(request, "all", *report_marks(RoadblockReport.objects.all()))
+
+
+def report_etag(request, pk, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    version = current_version(pk)
+    if version is None:
+        return None
+    return make_etag(request, "report", pk, version, index_version(request.user.pk))
+
+
+def report_history_etag(request, pk, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    marks = ReportRevision.objects.filter(report_id=pk).aggregate(last=Max("id"), n=Count("id"))
+    return make_etag(request, "history", pk, marks["last"], marks["n"])
+
+
+def conditional(etag_func):
+    # private + no-cache: the browser keeps its copy but revalidates every time
+    def decorator(view):
+        return cache_control(private=True, no_cache=True)(condition(etag_func=etag_func)(view))
+
+    return decorator
+
+
+def conditional_method(etag_func, name="get"):
+    return method_decorator(conditional(etag_func), name=name)
+
+
+def aconditional(etag_func):
+    # Django's condition() calls etag_func synchronously even around an async
+    # view, which the ORM refuses; run it in a thread instead.
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag = await sync_to_async(etag_func)(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag is not None else None
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if etag and request.method in ("GET", "HEAD"):
+                response.headers.setdefault("ETag", etag)
+            return response
+
+        return cache_control(private=True, no_cache=True)(inner)
+
+    return decorator
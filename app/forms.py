@@ -1,5 +1,7 @@
 from django import forms
-from .models import RoadblockReport, RoadblockComment, UserProfile
+from django.template.defaultfilters import filesizeformat
+from .models import ReportAttachment, RoadblockReport, RoadblockComment, UserProfile
+from .sharding import shard_for_pk, shard_for_state
 
 US_STATES = [
     ("AL", "Alabama"),
@@ -83,6 +85,13 @@ class RoadblockReportForm(forms.ModelForm):
                 "State must contain letters only."
             )
 
+        # a report stays on the shard it was filed on
+        moved = self.instance.pk and state != self.instance.state
+        if moved and shard_for_state(state) != shard_for_pk(self.instance.pk):
+            raise forms.ValidationError(
+                "This report can't be moved to that state. File a new report there instead."
+            )
+
         return state
 
 
@@ -99,8 +108,38 @@ class RoadblockCommentForm(forms.ModelForm):
         return text
 
 
+class ReportPhotoForm(forms.Form):
+    photo = forms.FileField()
+
+    def __init__(self, *args, report=None, **kwargs):
+        from . import attachments  # lazily, like the photo views
+
+        super().__init__(*args, **kwargs)
+        self.fields["photo"].widget.attrs["accept"] = ",".join(content_type for content_type, _, _ in attachments.TYPES)
+        self.report = report
+        self.kind = None
+
+    def clean_photo(self):
+        from . import attachments
+
+        photo = self.cleaned_data["photo"]
+        if photo.size > attachments.MAX_BYTES:
+            raise forms.ValidationError(f"Photos can be at most {filesizeformat(attachments.MAX_BYTES)}.")
+
+        self.kind = attachments.sniff(photo)
+        if self.kind is None:
+            raise forms.ValidationError("Upload a JPEG, PNG, GIF or WebP image.")
+
+        if self.report is not None:
+            count = ReportAttachment.objects.for_report(self.report.pk).filter(report_id=self.report.pk).count()
+            if count >= attachments.MAX_PER_REPORT:
+                raise forms.ValidationError(f"A report can have at most {attachments.MAX_PER_REPORT} photos.")
+        return photo
+
+
 class RoadblockFilterForm(forms.Form):
     city = forms.CharField(required=False)
+    road = forms.CharField(required=False, help_text="e.g. I-55 or Interstate 55")
     severity = forms.ChoiceField(
         required=False,
         choices=[("", "Any")] + RoadblockReport.SEVERITY_CHOICES,
@@ -148,7 +187,8 @@ class ProfileLocationForm(forms.ModelForm):
 class ProfileContactForm(forms.ModelForm):
     class Meta:
         model = UserProfile
-        fields = ["email", "phone"]
+        fields = ["email", "phone", "notify_high_severity"]
+        labels = {"notify_high_severity": "Email me about high-severity roadblocks in my area"}
 
     def clean_phone(self):
         phone = self.cleaned_data["phone"].strip()
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+from app import online_migrations
+
+
+class Command(BaseCommand):
+    help = "List unapplied migrations that would lock or rewrite the large report tables. Exits 1 if there are any."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="Ignore table sizes, so a CI database with no rows gets the production verdict.",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        min_rows = 0 if options["strict"] else online_migrations.MIN_ROWS
+
+        found = online_migrations.plan_problems(connection, executor.loader, plan, min_rows)
+        if found:
+            raise CommandError(
+                f"{len(found)} unsafe operations in unapplied migrations:\n{online_migrations.describe_problems(found)}"
+            )
+        self.stdout.write(f"{len(plan)} unapplied migrations, none unsafe")
@@ -0,0 +1,74 @@
+import os
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from app import sharding
+
+
+class Command(BaseCommand):
+    help = "Create the shard databases, move their id sequences into their ranges and copy users over."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=1000, help="Users copied per statement.")
+
+    def handle(self, *args, **options):
+        if not sharding.ENABLED:
+            raise CommandError("SHARD_DATABASES is empty, there are no shards to set up.")
+
+        for index, alias in enumerate(sharding.ALIASES):
+            if index == 0:
+                continue  # the default database is migrated as usual and keeps range 0
+            connection = connections[alias]
+            if connection.vendor == "sqlite" and str(connection.settings_dict["NAME"]) != ":memory:":
+                os.makedirs(os.path.dirname(connection.settings_dict["NAME"]) or ".", exist_ok=True)
+
+            call_command("migrate", database=alias, verbosity=0)
+            start = index * sharding.ID_RANGE
+            for model in apps.get_models():
+                if sharding.is_sharded(model):
+                    self.move_sequence(connection, model._meta.db_table, start)
+
+            copied = self.copy_users(alias, options["batch"])
+            self.stdout.write(f"{alias}: ids from {start + 1}, {copied} users copied")
+
+    def move_sequence(self, connection, table, start):
+        # never moves a sequence backwards; a shard reused after a reset keeps
+        # its higher ids
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s", [start, table])
+                if not cursor.rowcount:
+                    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, start])
+            elif connection.vendor == "postgresql":
+                highest = f"SELECT COALESCE(MAX(id), 0) FROM {connection.ops.quote_name(table)}"
+                cursor.execute(f"SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST(%s, ({highest})))", [table, start])
+            elif connection.vendor == "mysql":
+                # MySQL ignores a value below the current maximum
+                cursor.execute(f"ALTER TABLE {connection.ops.quote_name(table)} AUTO_INCREMENT = {start + 1}")
+            else:
+                raise CommandError(f"Don't know how to set id sequences on {connection.vendor}.")
+
+    def copy_users(self, alias, batch):
+        # the same minimal copies app.sharding.replicate_user keeps up to date
+        copied = 0
+        users = User.objects.order_by("pk").only("pk", "date_joined", *sharding.REPLICATED_USER_FIELDS)
+        chunk = []
+        for user in users.iterator(chunk_size=batch):
+            chunk.append(
+                User(
+                    pk=user.pk,
+                    password="!",
+                    date_joined=user.date_joined,
+                    **{name: getattr(user, name) for name in sharding.REPLICATED_USER_FIELDS},
+                )
+            )
+            if len(chunk) == batch:
+                copied += len(User.objects.using(alias).bulk_create(chunk, ignore_conflicts=True))
+                chunk = []
+        if chunk:
+            copied += len(User.objects.using(alias).bulk_create(chunk, ignore_conflicts=True))
+        return copied
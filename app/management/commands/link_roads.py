@@ -0,0 +1,22 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Link reports filed before roads were normalized (or bulk-created) to their road."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=2000, help="Reports per transaction.")
+        parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to pause between batches.")
+
+    def handle(self, *args, **options):
+        # the report_roads backfill (app/backfills.py), always from the top:
+        # only reports without a road are read
+        call_command(
+            "run_backfill",
+            "report_roads",
+            batch=options["batch"],
+            sleep=options["sleep"],
+            restart=True,
+            stdout=self.stdout,
+        )
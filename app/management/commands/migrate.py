@@ -0,0 +1,20 @@
+from django.core.management.commands.migrate import Command as MigrateCommand
+
+from app import online_migrations
+
+
+class Command(MigrateCommand):
+    # Django's migrate, plus the large-table safety check in app/online_migrations.py
+    help = MigrateCommand.help + " Refuses migrations that would lock or rewrite the large report tables."
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--allow-unsafe",
+            action="store_true",
+            help="Apply migrations even if they lock or rewrite large tables (maintenance windows only).",
+        )
+
+    def handle(self, *args, **options):
+        with online_migrations.allow_unsafe(options["allow_unsafe"]):
+            return super().handle(*args, **options)
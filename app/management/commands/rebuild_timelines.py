@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from app import timelines
+from app.models import RoadblockReport
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached report list timelines (REPORT_TIMELINES) from the reports table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--state", action="append", default=[], help="Only this state; repeatable.")
+        parser.add_argument("--chunk", type=int, default=5000, help="Rows fetched per round trip.")
+
+    def handle(self, *args, **options):
+        # one newest-first scan per database, keeping the first LENGTH ids of
+        # every state and city it passes
+        states = [state.upper() for state in options["state"]]
+        qs = RoadblockReport.objects.exclude(state__isnull=True).exclude(state="")
+        if states:
+            qs = qs.filter(state__in=states)
+
+        found, cities = {}, {}
+        for part in qs.per_shard():
+            rows = part.order_by("-id").values_list("id", "state", "city")
+            for report_id, state, city in rows.iterator(chunk_size=options["chunk"]):
+                cities.setdefault(timelines.cities_key(state), set()).add(city)
+                for key in timelines.keys_for(state, city):
+                    ids = found.setdefault(key, [])
+                    if len(ids) < timelines.LENGTH:
+                        ids.append(report_id)
+
+        # a report saved during the scan can be missed until its next save
+        timelines.store(
+            {
+                **{key: timelines.Timeline(ids).dumps() for key, ids in found.items()},
+                **{key: tuple(sorted(names)) for key, names in cities.items()},
+            }
+        )
+        self.stdout.write(f"rebuilt {len(found)} timelines")
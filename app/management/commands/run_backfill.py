@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import backfills
+
+
+class Command(BaseCommand):
+    help = "Fill a column on the report tables in small throttled batches, resuming where the last run stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", nargs="?", help="Backfill to run; leave out to list them.")
+        parser.add_argument("--batch", type=int, default=1000, help="Rows per transaction.")
+        parser.add_argument("--sleep", type=float, default=0.05, help="Minimum seconds to pause between batches.")
+        parser.add_argument(
+            "--duty", type=float, default=0.5, help="Largest share of wall-clock time spent writing (0-1]."
+        )
+        parser.add_argument("--max-batches", type=int, help="Stop after this many batches; rerun to resume.")
+        parser.add_argument("--restart", action="store_true", help="Forget saved progress and start from the top.")
+
+    def handle(self, *args, **options):
+        name = options["name"]
+        if not name:
+            for backfill in backfills.REGISTRY.values():
+                self.stdout.write(f"{backfill.name:28}{backfill.help}")
+            return
+        if name not in backfills.REGISTRY:
+            raise CommandError(f"Unknown backfill {name!r}; choose from {', '.join(sorted(backfills.REGISTRY))}.")
+        if not 0 < options["duty"] <= 1:
+            raise CommandError("--duty must be above 0 and at most 1.")
+
+        done = backfills.run(
+            name,
+            batch=options["batch"],
+            sleep=options["sleep"],
+            duty=options["duty"],
+            max_batches=options["max_batches"],
+            restart=options["restart"],
+            stdout=self.stdout,
+        )
+        if not done:
+            self.stdout.write(f"{name}: stopped after {options['max_batches']} batches; run again to resume")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.escalation import watch
+
+
+class Command(BaseCommand):
+    help = "Watch new confirmations and escalate reports that are being confirmed quickly. Run one per site."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sleep", type=float, default=1.0, help="Seconds to wait when there is nothing new.")
+        parser.add_argument("--once", action="store_true", help="Exit once the backlog is processed.")
+
+    def handle(self, *args, **options):
+        watch(options["sleep"], options["once"], self.stdout)
@@ -0,0 +1,73 @@
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from app.taskqueue import claim_tasks, requeue_stale, run_task, worker_id
+
+
+def run_and_close(task_obj):
+    try:
+        return run_task(task_obj)
+    finally:
+        close_old_connections()
+
+
+def work(threads, batch, sleep, once, stdout=None, requeue_every=60.0):
+    owner = worker_id()
+    next_requeue = 0.0
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        while True:
+            # a long-running worker also picks up tasks orphaned after it started
+            if time.monotonic() >= next_requeue:
+                requeue_stale()
+                next_requeue = time.monotonic() + requeue_every
+            claimed = claim_tasks(batch, owner)
+            if claimed:
+                results = list(pool.map(run_and_close, claimed))
+                if stdout:
+                    stdout.write(f"[{owner}] ran {len(results)} tasks, {results.count(False)} failed")
+            elif once:
+                return
+            else:
+                time.sleep(sleep)
+
+
+class Command(BaseCommand):
+    help = "Run background tasks from the DB queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4, help="Tasks run concurrently per process.")
+        parser.add_argument("--processes", type=int, default=1, help="Worker processes to fork.")
+        parser.add_argument("--batch", type=int, default=None, help="Tasks claimed per poll (default: --threads).")
+        parser.add_argument("--sleep", type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is drained.")
+        parser.add_argument(
+            "--requeue-every", type=float, default=60.0, help="Seconds between checks for stale RUNNING tasks."
+        )
+
+    def handle(self, *args, **options):
+        work_args = (
+            options["threads"],
+            options["batch"] or options["threads"],
+            options["sleep"],
+            options["once"],
+            self.stdout,
+            options["requeue_every"],
+        )
+
+        if options["processes"] <= 1:
+            work(*work_args)
+            return
+
+        # children must not inherit the parent's DB connections
+        connections.close_all()
+        ctx = multiprocessing.get_context("fork")
+        procs = [ctx.Process(target=work, args=work_args) for _ in range(options["processes"])]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import scoring
+
+
+class Command(BaseCommand):
+    help = "Recompute the moderation priority score of every unverified active report. Needs numpy."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=scoring.BATCH, help="Reports read and scored per query.")
+        parser.add_argument("--dry-run", action="store_true", help="Score, but write nothing.")
+
+    def handle(self, *args, **options):
+        if scoring.np is None:
+            raise CommandError("score_reports needs numpy: pip install numpy")
+
+        start = time.perf_counter()
+        scored, changed = scoring.score_reports(options["batch"], options["dry_run"], self.stdout)
+        verb = "would change" if options["dry_run"] else "changed"
+        self.stdout.write(f"scored {scored} reports, {verb} {changed}, in {time.perf_counter() - start:.1f}s")
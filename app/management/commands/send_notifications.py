@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.notifications import fan_out_events, send_digests
+
+
+class Command(BaseCommand):
+    help = "Fan out pending roadblock events to area subscribers and mail their digests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep running instead of exiting when idle.")
+        parser.add_argument("--sleep", type=float, default=30, help="Seconds to wait between passes with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            events, deliveries = fan_out_events()
+            sent = send_digests()
+            if events or sent:
+                self.stdout.write(f"{events} events -> {deliveries} deliveries, {sent} digests sent")
+
+            if not options["loop"]:
+                break
+            if not events and not sent:
+                time.sleep(options["sleep"])
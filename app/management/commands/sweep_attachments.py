@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.models import ReportAttachment, attachment_storage
+
+
+class Command(BaseCommand):
+    help = "Delete stored photos and thumbnails that no attachment points at any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age", type=float, default=24, help="Only files older than this many hours (uploads in flight)."
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be deleted.")
+
+    def handle(self, *args, **options):
+        # one directory per hash prefix (app/attachments.py), and one lookup
+        # per directory for the hashes its files are named after
+        storage = attachment_storage()
+        cutoff = timezone.now() - timedelta(hours=options["min_age"])
+        found = deleted = 0
+        for top in ("photos", "thumbnails"):
+            if not storage.exists(top):
+                continue
+            for prefix in storage.listdir(top)[0]:
+                names = [f"{top}/{prefix}/{name}" for name in storage.listdir(f"{top}/{prefix}")[1]]
+                hashes = {name.rsplit("/", 1)[1][:64] for name in names}
+                used = set()
+                for qs in ReportAttachment.objects.filter(content_hash__in=hashes).per_shard():
+                    for file, thumbnail in qs.values_list("file", "thumbnail"):
+                        used.update((file, thumbnail))
+
+                for name in names:
+                    if name in used or storage.get_modified_time(name) > cutoff:
+                        continue
+                    found += 1
+                    if not options["dry_run"]:
+                        storage.delete(name)
+                        deleted += 1
+
+        self.stdout.write(f"{found} unused files, {deleted} deleted")
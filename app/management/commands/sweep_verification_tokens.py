@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.models import EmailVerificationToken
+
+
+class Command(BaseCommand):
+    help = "Delete expired legacy email verification tokens in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=1000, help="Rows deleted per statement.")
+        parser.add_argument("--sleep", type=float, default=0.1, help="Seconds to pause between batches.")
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be deleted.")
+
+    def handle(self, *args, **options):
+        # walks the created_at index; short transactions keep lock times low
+        expired = EmailVerificationToken.objects.filter(created_at__lt=timezone.now() - EmailVerificationToken.LIFETIME)
+
+        if options["dry_run"]:
+            self.stdout.write(f"{expired.count()} expired tokens")
+            return
+
+        total = 0
+        while True:
+            ids = list(expired.order_by("created_at").values_list("pk", flat=True)[: options["batch"]])
+            if not ids:
+                break
+            deleted, _ = EmailVerificationToken.objects.filter(pk__in=ids).delete()
+            total += deleted
+            if len(ids) < options["batch"]:
+                break
+            time.sleep(options["sleep"])
+
+        self.stdout.write(f"deleted {total} expired tokens")
@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from app.taskqueue import purge_finished, queue_stats
+
+
+class Command(BaseCommand):
+    help = "Show background task queue depth and latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", help="Print raw JSON.")
+        parser.add_argument("--purge", action="store_true", help="Delete finished tasks older than a week.")
+
+    def handle(self, *args, **options):
+        if options["purge"]:
+            self.stdout.write(f"purged {purge_finished()} finished tasks")
+
+        stats = queue_stats()
+        if options["json"]:
+            self.stdout.write(json.dumps(stats))
+            return
+
+        depth = ", ".join(f"{status.lower()}={n}" for status, n in stats["depth"].items())
+        self.stdout.write(f"depth: {depth} (ready now: {stats['ready']})")
+        self.stdout.write(f"oldest ready task waiting: {stats['oldest_wait_seconds']:.1f}s")
+        self.stdout.write(
+            f"last hour: {stats['done_last_window']} done, "
+            f"avg wait {stats['avg_wait_seconds']:.2f}s, avg run {stats['avg_run_seconds']:.2f}s"
+        )
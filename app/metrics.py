@@ -0,0 +1,350 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+# Prometheus text-format metrics without a client library.
+#
+# Every thread records into its own dict, so the hot path is a plain dict
+# update with no lock. A scrape sums all the thread shards, plus the totals
+# of threads that have exited (timer threads come and go all the time). With METRICS_DIR
+# set, each process also writes its totals to METRICS_DIR/<pid>.json, at most
+# once every METRICS_FLUSH_INTERVAL seconds. /metrics then adds up every file,
+# so the counts cover all gunicorn/uvicorn workers and run_worker processes.
+# Clear the directory when you deploy.
+METRICS_DIR = getattr(settings, "METRICS_DIR", "")
+FLUSH_INTERVAL = getattr(settings, "METRICS_FLUSH_INTERVAL", 5.0)
+
+REGISTRY = {}
+
+_shards = {}  # id -> shard of every live thread that has recorded
+_retired = {}  # summed shards of exited threads
+_shards_lock = threading.RLock()  # never taken on the hot path
+_local = threading.local()
+_last_flush = 0.0
+
+
+class _ShardMarker:
+    pass
+
+
+def _shard():
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _shards[id(shard)] = shard
+        # the thread-local is cleared when its thread exits, which drops the
+        # marker and folds the shard into _retired
+        _local.marker = marker = _ShardMarker()
+        weakref.finalize(marker, _retire, shard, _shards)
+        return shard
+
+
+def _retire(shard, shards):
+    with _shards_lock:
+        # shards is not _shards for a thread of the parent after a fork
+        if shards is not _shards or shards.pop(id(shard), None) is not shard:
+            return
+        for key, value in shard.items():
+            _retired[key] = _retired.get(key, 0) + value
+
+
+def _labels(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _add(key, value):
+    shard = _shard()
+    shard[key] = shard.get(key, 0) + value
+
+
+def _reset_after_fork():
+    # a forked worker starts from zero instead of re-reporting the parent's totals
+    global _shards, _retired, _shards_lock, _local, _last_flush
+    _shards, _retired, _shards_lock, _local, _last_flush = {}, {}, threading.RLock(), threading.local(), 0.0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# ---------- METRIC TYPES ----------
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        REGISTRY[name] = self
+
+    def inc(self, value=1, **labels):
+        _add((self.name, _labels(labels)), value)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = [(bound, f"{bound:g}") for bound in sorted(buckets)]
+        REGISTRY[name] = self
+
+    def observe(self, value, **labels):
+        labels = _labels(labels)
+        shard = _shard()
+        for bound, le in self.buckets:
+            if value <= bound:
+                key = (self.name + "_bucket", labels + (("le", le),))
+                shard[key] = shard.get(key, 0) + 1
+        for key, amount in (((self.name + "_sum", labels), value), ((self.name + "_count", labels), 1)):
+            shard[key] = shard.get(key, 0) + amount
+
+
+REQUEST_LATENCY = Histogram(
+    "reten_http_request_duration_seconds",
+    "Request latency by URL name.",
+    [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+)
+REQUESTS = Counter("reten_http_requests_total", "Requests by URL name, method and status class.")
+DB_QUERY_DURATION = Histogram(
+    "reten_db_query_duration_seconds",
+    "SQL query latency by database alias.",
+    [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1],
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "reten_db_queries_per_request",
+    "Number of SQL queries one request ran.",
+    [1, 2, 5, 10, 20, 50, 100, 200],
+)
+CACHE_REQUESTS = Counter("reten_cache_requests_total", "Application cache lookups by cache and result (hit/miss).")
+REPORTS_CREATED = Counter("reten_reports_created_total", "Roadblock reports created.")
+CONFIRMATIONS = Counter("reten_report_confirmations_total", "Confirm/unconfirm actions.")
+VERIFICATIONS = Counter("reten_report_verifications_total", "Reports verified by moderators.")
+TASKS = Counter("reten_tasks_total", "Background tasks run, by task and result.")
+VERIFICATION_LINKS = Counter(
+    "reten_email_verification_links_total", "Email verification links sent and used, by result."
+)
+ATTACHMENT_UPLOADS = Counter(
+    "reten_attachment_uploads_total", "Report photos uploaded, by result (stored/deduplicated/repeat)."
+)
+
+
+def cache_lookup(cache_name, hit):
+    CACHE_REQUESTS.inc(cache=cache_name, result="hit" if hit else "miss")
+
+
+# ---------- DB INSTRUMENTATION ----------
+_request_queries = threading.local()
+
+
+def db_wrapper(alias):
+    def wrapper(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            DB_QUERY_DURATION.observe(time.perf_counter() - start, alias=alias)
+            _request_queries.count = getattr(_request_queries, "count", 0) + 1
+
+    return wrapper
+
+
+def instrument_connection(sender, connection, **kwargs):
+    # connection_created receiver, see AppConfig.ready
+    if not getattr(connection, "_reten_metrics", False):
+        connection.execute_wrappers.append(db_wrapper(connection.alias))
+        connection._reten_metrics = True
+
+
+# ---------- SNAPSHOTS ----------
+def local_samples():
+    with _shards_lock:
+        totals = dict(_retired)
+        shards = list(_shards.values())
+    for shard in shards:
+        for key, value in shard.copy().items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def flush(force=False):
+    global _last_flush
+    if not METRICS_DIR:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL:
+        return
+    _last_flush = now
+
+    data = [[name, list(map(list, labels)), value] for (name, labels), value in local_samples().items()]
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=METRICS_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, os.path.join(METRICS_DIR, f"{os.getpid()}.json"))
+
+
+def all_samples():
+    if not METRICS_DIR:
+        return local_samples()
+
+    flush(force=True)
+    totals = {}
+    for filename in os.listdir(METRICS_DIR):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # a process is mid-write or the file was cleaned up
+        for name, labels, value in data:
+            key = (name, tuple(map(tuple, labels)))
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+# ---------- GAUGES ----------
+def gauges():
+    from rest_framework.authtoken.models import Token
+
+    from .models import EmailVerificationToken, NotificationDelivery, Task
+
+    queued = Task.objects.filter(status="QUEUED").values_list("name").annotate(n=Count("id")).order_by()
+    return [
+        (
+            "reten_task_queue_depth",
+            "Queued background tasks by task name; send_verification_email is the mail queue.",
+            [((("task", name),), n) for name, n in queued],
+        ),
+        (
+            "reten_notification_deliveries_pending",
+            "Alert deliveries waiting for the next digest.",
+            [((), sum(qs.count() for qs in NotificationDelivery.objects.filter(sent_at__isnull=True).per_shard()))],
+        ),
+        (
+            "reten_api_tokens",
+            "API auth tokens issued.",
+            [((), Token.objects.count())],
+        ),
+        (
+            "reten_email_verification_tokens_active",
+            "Unexpired legacy (table-backed) email verification tokens.",
+            [((), EmailVerificationToken.objects.filter(created_at__gt=timezone.now() - EmailVerificationToken.LIFETIME).count())],
+        ),
+    ]
+
+
+# ---------- EXPOSITION ----------
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def _line(name, labels, value):
+    if labels:
+        body = ",".join(f'{key}="{_escape(val)}"' for key, val in labels)
+        return f"{name}{{{body}}} {_number(value)}"
+    return f"{name} {_number(value)}"
+
+
+def _histogram_lines(metric, rows):
+    base = metric.name
+    series = {}
+    for name, labels, value in rows:
+        if name.endswith("_bucket"):
+            le = dict(labels)["le"]
+            plain = tuple(pair for pair in labels if pair[0] != "le")
+            series.setdefault(plain, {})[le] = value
+        else:
+            series.setdefault(labels, {})[name[len(base) :]] = value
+
+    lines = []
+    for labels, parts in sorted(series.items()):
+        count = parts.get("_count", 0)
+        for _, le in metric.buckets:
+            lines.append(_line(base + "_bucket", labels + (("le", le),), parts.get(le, 0)))
+        lines.append(_line(base + "_bucket", labels + (("le", "+Inf"),), count))
+        lines.append(_line(base + "_sum", labels, parts.get("_sum", 0)))
+        lines.append(_line(base + "_count", labels, count))
+    return lines
+
+
+def render():
+    by_metric = {}
+    for (name, labels), value in all_samples().items():
+        base = name
+        for suffix in ("_bucket", "_sum", "_count"):
+            if name.endswith(suffix) and name[: -len(suffix)] in REGISTRY:
+                base = name[: -len(suffix)]
+        by_metric.setdefault(base, []).append((name, labels, value))
+
+    lines = []
+    for base, metric in sorted(REGISTRY.items()):
+        lines.append(f"# HELP {base} {metric.help}")
+        lines.append(f"# TYPE {base} {metric.kind}")
+        rows = by_metric.get(base, [])
+        if metric.kind == "histogram":
+            lines.extend(_histogram_lines(metric, rows))
+        else:
+            lines.extend(_line(name, labels, value) for name, labels, value in sorted(rows))
+
+    for name, help, rows in gauges():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(_line(name, labels, value) for labels, value in rows)
+
+    return "\n".join(lines) + "\n"
+
+
+# ---------- MIDDLEWARE ----------
+class MetricsMiddleware:
+    # Put it near the top of MIDDLEWARE so the latency covers the whole stack.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        _request_queries.count = 0
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, _request_queries.count)
+        return response
+
+    async def __acall__(self, request):
+        # queries run in sync_to_async threads, so the per-request query
+        # count is only recorded for sync requests
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, None)
+        return response
+
+    def record(self, request, response, elapsed, queries):
+        match = getattr(request, "resolver_match", None)
+        view = (match.url_name or match.view_name) if match else "<unmatched>"
+        REQUEST_LATENCY.observe(elapsed, view=view)
+        REQUESTS.inc(view=view, method=request.method, status=f"{response.status_code // 100}xx")
+        if queries is not None:
+            DB_QUERIES_PER_REQUEST.observe(queries, view=view)
+        flush()
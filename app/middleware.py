@@ -0,0 +1,12 @@
+from django.middleware.gzip import GZipMiddleware as DjangoGZipMiddleware
+
+
+class GZipMiddleware(DjangoGZipMiddleware):
+    # Django's, minus photos: JPEG/PNG/WebP only grow when gzipped, and a
+    # gzipped 206 no longer matches its Content-Range, which breaks resume
+    # and seeking. SVG is text and still compressed.
+    def process_response(self, request, response):
+        content_type = response.get("Content-Type", "")
+        if response.status_code == 206 or (content_type.startswith("image/") and "svg" not in content_type):
+            return response
+        return super().process_response(request, response)
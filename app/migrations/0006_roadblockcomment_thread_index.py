@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0005_alter_roadblockreport_options"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="roadblockcomment",
+            index=models.Index(fields=["report", "-id"], name="comment_thread_idx"),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db import migrations, models
+
+from app.online_migrations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # 0006_roadblockcomment_thread_index built with AddIndexConcurrently.
+    # Databases that already applied the original keep it as it is; any
+    # database still before 0006 runs this one and can keep writing comments
+    # while the index builds.
+    replaces = [("app", "0006_roadblockcomment_thread_index")]
+    atomic = False
+
+    dependencies = [
+        ("app", "0005_alter_roadblockreport_options"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="roadblockcomment",
+            index=models.Index(fields=["report", "-id"], name="comment_thread_idx"),
+        ),
+    ]
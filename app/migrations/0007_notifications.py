@@ -0,0 +1,116 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0006_roadblockcomment_thread_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationDelivery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="NotificationEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("CREATED", "Created"), ("VERIFIED", "Verified")],
+                        max_length=8,
+                    ),
+                ),
+                ("state", models.CharField(max_length=2)),
+                ("city", models.CharField(max_length=80)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="last_notified_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="notify_high_severity",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name="userprofile",
+            index=models.Index(fields=["state", "city"], name="profile_area_idx"),
+        ),
+        migrations.AddField(
+            model_name="notificationdelivery",
+            name="report",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="notification_deliveries",
+                to="app.roadblockreport",
+            ),
+        ),
+        migrations.AddField(
+            model_name="notificationdelivery",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="notification_deliveries",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="notificationevent",
+            name="report",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="notification_events",
+                to="app.roadblockreport",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notificationdelivery",
+            index=models.Index(
+                fields=["sent_at", "user"], name="notif_delivery_pending_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="notificationdelivery",
+            constraint=models.UniqueConstraint(
+                fields=("user", "report"), name="unique_delivery_per_user"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notificationevent",
+            index=models.Index(
+                fields=["processed_at", "id"], name="notif_event_pending_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0009_accountdeletion"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReportRevision",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("report_id", models.BigIntegerField()),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("EDIT", "Edited"),
+                            ("VERIFY", "Verified"),
+                            ("RESOLVE", "Resolved"),
+                            ("DELETE", "Deleted"),
+                        ],
+                        max_length=8,
+                    ),
+                ),
+                ("changes", models.JSONField(default=dict)),
+                ("ts", models.DateTimeField(default=django.utils.timezone.now)),
+                ("month", models.PositiveIntegerField()),
+                (
+                    "actor",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["report_id", "ts"], name="revision_report_ts_idx"
+                    ),
+                    models.Index(fields=["month"], name="revision_month_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0010_reportrevision"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="roadblockreport",
+            name="updated_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="roadblockreport",
+            name="version",
+            field=models.PositiveIntegerField(db_default=models.Value(1), null=True),
+        ),
+    ]
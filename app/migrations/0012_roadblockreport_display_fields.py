@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # older reports are filled by `manage.py run_backfill report_display_fields`
+
+    dependencies = [
+        ("app", "0011_roadblockreport_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="roadblockreport",
+            name="maps_url",
+            field=models.CharField(blank=True, db_default=models.Value(""), max_length=600, null=True),
+        ),
+        migrations.AddField(
+            model_name="roadblockreport",
+            name="trust_level",
+            field=models.CharField(
+                choices=[
+                    ("ADMIN", "Admin Verified"),
+                    ("ACCOUNT", "Verified Account"),
+                    ("NONE", "Unverified"),
+                ],
+                db_default=models.Value("NONE"),
+                max_length=7,
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # older reports are counted by `manage.py run_backfill report_confirmation_count`
+
+    dependencies = [
+        ("app", "0012_roadblockreport_display_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="roadblockreport",
+            name="confirmation_count",
+            field=models.PositiveIntegerField(db_default=models.Value(0), null=True),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0013_roadblockreport_confirmation_count"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RequestProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                ("method", models.CharField(max_length=8)),
+                ("path", models.CharField(max_length=500)),
+                ("url_name", models.CharField(blank=True, max_length=100)),
+                ("status_code", models.PositiveSmallIntegerField(null=True)),
+                (
+                    "engine",
+                    models.CharField(
+                        choices=[
+                            ("cprofile", "cProfile"),
+                            ("pyinstrument", "pyinstrument"),
+                        ],
+                        max_length=12,
+                    ),
+                ),
+                ("duration_ms", models.FloatField()),
+                ("sql_count", models.PositiveIntegerField(default=0)),
+                ("sql_ms", models.FloatField(default=0)),
+                ("top_functions", models.JSONField(default=list)),
+                ("slow_queries", models.JSONField(default=list)),
+                ("report", models.TextField(blank=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
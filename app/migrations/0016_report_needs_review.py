@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0015_emailverificationtoken_created_at_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="roadblockreport",
+            name="needs_review",
+            field=models.BooleanField(db_default=models.Value(False), null=True),
+        ),
+        migrations.AlterField(
+            model_name="notificationevent",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("CREATED", "Created"),
+                    ("VERIFIED", "Verified"),
+                    ("ESCALATE", "Escalated"),
+                ],
+                max_length=8,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="reportrevision",
+            name="action",
+            field=models.CharField(
+                choices=[
+                    ("EDIT", "Edited"),
+                    ("VERIFY", "Verified"),
+                    ("RESOLVE", "Resolved"),
+                    ("DELETE", "Deleted"),
+                    ("ESCALATE", "Escalated"),
+                ],
+                max_length=8,
+            ),
+        ),
+    ]
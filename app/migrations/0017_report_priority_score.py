@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0016_report_needs_review"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="roadblockreport",
+            name="priority_score",
+            field=models.FloatField(db_default=models.Value(0.0), null=True),
+        ),
+    ]
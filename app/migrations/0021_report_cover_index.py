@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+from app.online_migrations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # built without blocking writes to the report table; see app/online_migrations.py
+    atomic = False
+
+    dependencies = [
+        ("app", "0020_attachments"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="roadblockreport",
+            index=models.Index(fields=["cover"], name="report_cover_idx"),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+from app.online_migrations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # the report indexes 0011 and 0018 need, built without blocking writes;
+    # see app/online_migrations.py
+    atomic = False
+
+    dependencies = [
+        ("app", "0021_report_cover_index"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="roadblockreport",
+            index=models.Index(fields=["updated_at"], name="report_updated_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="roadblockreport",
+            index=models.Index(fields=["state", "updated_at"], name="report_state_updated_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="roadblockreport",
+            index=models.Index(fields=["road", "state", "status"], name="report_road_state_status_idx"),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:50
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0022_report_online_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="userprofile",
+            name="profile_area_idx",
+        ),
+        migrations.AddIndex(
+            model_name="userprofile",
+            index=models.Index(
+                models.F("state"),
+                django.db.models.functions.text.Lower("city"),
+                name="profile_area_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:12
+
+from django.db import migrations, models
+
+from app.online_migrations import AlterFieldToText
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0023_profile_area_case_insensitive"),
+    ]
+
+    operations = [
+        # a varchar(600) could not hold a percent-encoded URL built from
+        # fields of up to 120 + 120 + 80 characters
+        AlterFieldToText(
+            model_name="roadblockreport",
+            name="maps_url",
+            field=models.TextField(blank=True, db_default=models.Value(""), null=True),
+        ),
+    ]
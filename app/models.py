@@ -1,9 +1,40 @@
 import uuid
+from urllib.parse import urlencode
 from django.utils import timezone
 from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage, storages
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 
+from .sharding import ShardedQuerySet
+
+
+def attachment_storage():
+    # photos go to STORAGES["attachments"] (any Django storage backend) when
+    # it is configured, else to the default storage
+    return storages["attachments"] if "attachments" in settings.STORAGES else default_storage
+
+
+class Road(models.Model):
+    # canonical name, e.g. "I-55" or "US-49"; see app/roads.py
+    name = models.CharField(max_length=120, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class RoadAlias(models.Model):
+    # one row per spelling seen in a report ("INTERSTATE 55", "I 55 N", ...)
+    key = models.CharField(max_length=120, unique=True)
+    road = models.ForeignKey(Road, on_delete=models.CASCADE, related_name="aliases")
+
+    def __str__(self):
+        return f"{self.key} -> {self.road_id}"
+
 
 class RoadblockReport(models.Model):
     SEVERITY_CHOICES = [
@@ -15,11 +46,28 @@ class RoadblockReport(models.Model):
         ("ACTIVE", "Active"),
         ("RESOLVED", "Resolved"),
     ]
+    TRUST_CHOICES = [
+        ("ADMIN", "Admin Verified"),
+        ("ACCOUNT", "Verified Account"),
+        ("NONE", "Unverified"),
+    ]
 
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="roadblock_reports")
     title = models.CharField(max_length=80)
     description = models.TextField()
     road_name = models.CharField(max_length=120)
+    # linked from road_name on save. Roads live on the default database, so
+    # there is no database constraint: sharded reports point across databases.
+    # The (road, state, status) index in Meta covers lookups by road.
+    road = models.ForeignKey(
+        Road,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        db_constraint=False,
+        db_index=False,
+        related_name="reports",
+    )
     nearby_place = models.CharField(max_length=120, blank=True)
     city = models.CharField(max_length=80)
     state = models.CharField(max_length=2, null=True, blank=True)
@@ -31,18 +79,140 @@ class RoadblockReport(models.Model):
     status = models.CharField(max_length=8, choices=STATUS_CHOICES, default="ACTIVE")
     verified = models.BooleanField(default=False)
 
+    # Columns added since launch are nullable with a constant db_default (a
+    # Value, or Django rebuilds the table on SQLite), so adding one never
+    # rewrites the table; see app/online_migrations.py. Existing rows read
+    # the default and none is ever NULL.
+
+    # set by app/escalation.py when confirmations pour in; cleared when a
+    # moderator verifies or resolves the report
+    needs_review = models.BooleanField(null=True, db_default=Value(False))
+
+    # moderation priority between 0 and 1, rewritten in bulk by
+    # `manage.py score_reports` (app/scoring.py); 0 until first scored
+    priority_score = models.FloatField(null=True, db_default=Value(0.0))
+
+    # display fields computed in save() so list rows don't build them per
+    # render; `run_backfill report_display_fields` fills in older reports
+    # no length cap: percent-encoding can make the URL many times longer than its parts
+    maps_url = models.TextField(blank=True, null=True, db_default=Value(""))
+    trust_level = models.CharField(max_length=7, choices=TRUST_CHOICES, null=True, db_default=Value("NONE"))
+
+    # maintained in micro-batches by app/confirmations.py, never per click;
+    # `run_backfill report_confirmation_count` recounts older reports
+    confirmation_count = models.PositiveIntegerField(null=True, db_default=Value(0))
+
+    # the photo whose thumbnail list rows show, set by app/attachments.py
+    # once a thumbnail exists; lists never load the attachments themselves.
+    # Indexed in Meta, so the index could be built concurrently.
+    cover = models.ForeignKey(
+        "ReportAttachment",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        db_constraint=False,
+        db_index=False,
+        related_name="+",
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # bumped on every change to the report or what its pages show (comments,
+    # confirmations, owner verification); drives ETags and cache keys.
+    # updated_at is set in save() rather than by auto_now, which would count
+    # as a default and rebuild the table; NULL on reports unchanged since.
+    version = models.PositiveIntegerField(null=True, db_default=Value(1))
+    updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         permissions = [
             ("can_view_moderation", "Can view moderation dashboard"),
             ("can_verify_report", "Can verify roadblock reports"),
             ("can_resolve_report", "Can resolve roadblock reports"),
         ]
+        indexes = [
+            models.Index(fields=["updated_at"], name="report_updated_idx"),
+            models.Index(fields=["state", "updated_at"], name="report_state_updated_idx"),
+            models.Index(fields=["road", "state", "status"], name="report_road_state_status_idx"),
+            models.Index(fields=["cover"], name="report_cover_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.city}, {self.state})"
 
+    def save(self, *args, **kwargs):
+        from .roads import road_id_for
+
+        self.maps_url = self.build_maps_url()
+        self.trust_level = self.compute_trust_level()
+        self.road_id = road_id_for(self.road_name)
+        self.updated_at = timezone.now()
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+
+        # Versions key caches and ETags, so a stale instance must never move
+        # one backwards; confirmation_count belongs to app.confirmations and
+        # cover to app.attachments.
+        self.version = F("version") + 1
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "version", "updated_at", "maps_url", "trust_level", "road"}
+        else:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ("confirmation_count", "cover")
+            ]
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=["version"])
+
+    def build_maps_url(self):
+        parts = [self.road_name]
+        if self.nearby_place:
+            parts += ["near", self.nearby_place]
+        parts += [self.city, self.state or ""]
+        return "https://www.google.com/maps/search/?" + urlencode({"api": 1, "query": " ".join(parts)})
+
+    def compute_trust_level(self):
+        if self.verified:
+            return "ADMIN"
+        owner_verified = UserProfile.objects.filter(user_id=self.owner_id, is_verified=True).exists()
+        return "ACCOUNT" if owner_verified else "NONE"
+
+    @classmethod
+    def touch(cls, **filters):
+        qs = cls.objects.filter(**filters)
+        if list(filters) == ["pk"]:
+            shards = [(qs.for_report(filters["pk"]), [filters["pk"]])]
+        else:
+            shards = [(part, list(part.values_list("pk", flat=True))) for part in qs.per_shard()]
+
+        updated = 0
+        for part, pks in shards:
+            updated += part.update(version=F("version") + 1, updated_at=timezone.now())
+            cls.forget_versions(pks)
+        return updated
+
+    # The current version of each report is cached (see app/report_cache.py);
+    # anything that bumps version without save() must forget it.
+    @staticmethod
+    def version_cache_key(pk):
+        return f"report:{pk}:version"
+
+    @classmethod
+    def forget_versions(cls, pks):
+        if pks:
+            cache.delete_many([cls.version_cache_key(pk) for pk in pks])
+
+    @classmethod
+    def refresh_owner_trust(cls, owner):
+        level = "ACCOUNT" if UserProfile.objects.filter(user=owner, is_verified=True).exists() else "NONE"
+        for qs in cls.objects.filter(owner=owner, verified=False).per_shard():
+            qs.update(trust_level=level)
+        return cls.touch(owner=owner)
+
 
 class RoadblockComment(models.Model):
     report = models.ForeignKey(RoadblockReport, on_delete=models.CASCADE, related_name="comments")
@@ -50,8 +220,16 @@ class RoadblockComment(models.Model):
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # newest-first thread pages: WHERE report_id = ? AND id < cursor ORDER BY id DESC
+            models.Index(fields=["report", "-id"], name="comment_thread_idx"),
+        ]
+
     def __str__(self):
-        return f"Comment by {self.owner.username} on {self.report.id}"
+        return f"Comment by {self.owner.username} on {self.report_id}"
 
 
 class RoadblockConfirmation(models.Model):
@@ -59,13 +237,41 @@ class RoadblockConfirmation(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="roadblock_confirmations")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=["report", "user"], name="unique_confirmation_per_user")
         ]
 
     def __str__(self):
-        return f"{self.user.username} confirmed {self.report.id}"
+        return f"{self.user.username} confirmed {self.report_id}"
+
+
+class ReportAttachment(models.Model):
+    # A photo on a report. Files are named by their sha256, so a photo
+    # uploaded to many reports is stored once; see app/attachments.py.
+    report = models.ForeignKey(RoadblockReport, on_delete=models.CASCADE, related_name="attachments")
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="report_attachments")
+    content_hash = models.CharField(max_length=64, db_index=True)
+    content_type = models.CharField(max_length=40)
+    size = models.PositiveBigIntegerField()
+    file = models.FileField(storage=attachment_storage, max_length=255)
+    # empty until the worker has built it
+    thumbnail = models.FileField(storage=attachment_storage, max_length=255, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["report", "content_hash"], name="unique_attachment_per_report")
+        ]
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} on {self.report_id}"
     
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
@@ -81,16 +287,217 @@ class UserProfile(models.Model):
     # verification
     is_verified = models.BooleanField(default=False)
 
+    # notifications
+    notify_high_severity = models.BooleanField(default=True)
+    last_notified_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # case-insensitive on city, see notifications.recipients_for
+            models.Index(F("state"), Lower("city"), name="profile_area_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} profile"
     
 class EmailVerificationToken(models.Model):
+    LIFETIME = timedelta(hours=24)
+
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)  # for sweep_verification_tokens
 
     def is_expired(self):
-        return timezone.now() > (self.created_at + timedelta(hours=24))
+        return timezone.now() > (self.created_at + self.LIFETIME)
+
+    def __str__(self):
+        return f"Email token for {self.user.username}"
+
+
+class NotificationEvent(models.Model):
+    KIND_CHOICES = [
+        ("CREATED", "Created"),
+        ("VERIFIED", "Verified"),
+        ("ESCALATE", "Escalated"),
+    ]
+
+    report = models.ForeignKey(RoadblockReport, on_delete=models.CASCADE, related_name="notification_events")
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+
+    # area is copied so fan-out doesn't depend on later edits to the report
+    state = models.CharField(max_length=2)
+    city = models.CharField(max_length=80)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["processed_at", "id"], name="notif_event_pending_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} event for {self.report_id}"
+
+
+class NotificationDelivery(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notification_deliveries")
+    report = models.ForeignKey(RoadblockReport, on_delete=models.CASCADE, related_name="notification_deliveries")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # one mail per user per report, however many events the report produces
+            models.UniqueConstraint(fields=["user", "report"], name="unique_delivery_per_user"),
+        ]
+        indexes = [
+            models.Index(fields=["sent_at", "user"], name="notif_delivery_pending_idx"),
+        ]
+
+    def __str__(self):
+        return f"Notify {self.user_id} about {self.report_id}"
+
+
+class Task(models.Model):
+    STATUS_CHOICES = [
+        ("QUEUED", "Queued"),
+        ("RUNNING", "Running"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+
+    priority = models.SmallIntegerField(default=0)  # higher runs first
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default="QUEUED")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    locked_by = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+
+    run_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "-priority", "run_at"], name="task_claim_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} [{self.status}]"
+
+
+class AccountDeletion(models.Model):
+    STATUS_CHOICES = [
+        ("PENDING", "Pending"),
+        ("RUNNING", "Running"),
+        ("DONE", "Done"),
+    ]
+
+    # kept after the user row is gone, for support/audit
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    user_id_snapshot = models.IntegerField()
+    username = models.CharField(max_length=150)
+
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default="PENDING")
+    stage = models.CharField(max_length=40, blank=True)
+    rows_deleted = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Deletion of {self.username} [{self.status}]"
+
+
+class ReportRevision(models.Model):
+    ACTION_CHOICES = [
+        ("EDIT", "Edited"),
+        ("VERIFY", "Verified"),
+        ("RESOLVE", "Resolved"),
+        ("DELETE", "Deleted"),
+        ("ESCALATE", "Escalated"),
+    ]
+
+    # plain id, not a FK: history has to outlive the report it describes
+    report_id = models.BigIntegerField()
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    action = models.CharField(max_length=8, choices=ACTION_CHOICES)
+    changes = models.JSONField(default=dict)  # {"field": [old, new]} for changed fields only
+    ts = models.DateTimeField(default=timezone.now)
+    month = models.PositiveIntegerField()  # partition key, YYYYMM
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["report_id", "ts"], name="revision_report_ts_idx"),
+            models.Index(fields=["month"], name="revision_month_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Report revisions are append-only.")
+        if not self.month:
+            self.month = self.ts.year * 100 + self.ts.month
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Report revisions are append-only.")
+
+    def __str__(self):
+        return f"{self.action} on {self.report_id} at {self.ts:%Y-%m-%d %H:%M}"
+
+
+class RequestProfile(models.Model):
+    ENGINE_CHOICES = [
+        ("cprofile", "cProfile"),
+        ("pyinstrument", "pyinstrument"),
+    ]
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    method = models.CharField(max_length=8)
+    path = models.CharField(max_length=500)
+    url_name = models.CharField(max_length=100, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    engine = models.CharField(max_length=12, choices=ENGINE_CHOICES)
+    duration_ms = models.FloatField()
+    sql_count = models.PositiveIntegerField(default=0)
+    sql_ms = models.FloatField(default=0)
+    top_functions = models.JSONField(default=list)  # [{"function", "calls", "own_ms", "cumulative_ms"}]
+    slow_queries = models.JSONField(default=list)  # [{"sql", "ms"}], slowest first
+    report = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+class BackfillProgress(models.Model):
+    # one row per backfill and database, so run_backfill can resume; see app/backfills.py
+    name = models.CharField(max_length=60)
+    database = models.CharField(max_length=40)
+    last_pk = models.BigIntegerField(default=0)
+    rows = models.PositiveBigIntegerField(default=0)
+    batches = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["name", "database"], name="backfill_progress_unique"),
+        ]
 
     def __str__(self):
-        return f"Email token for {self.user.username}"
\ No newline at end of file
+        return f"{self.name} on {self.database} at pk {self.last_pk}"
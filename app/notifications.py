@@ -0,0 +1,166 @@
+from datetime import timedelta
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import NotificationDelivery, NotificationEvent, RoadblockReport, UserProfile
+from .sharding import by_shard
+
+
+BATCH_SIZE = getattr(settings, "NOTIFICATION_BATCH_SIZE", 500)
+MIN_INTERVAL = timedelta(seconds=getattr(settings, "NOTIFICATION_MIN_INTERVAL", 3600))
+NOTIFY_SEVERITIES = {"HIGH"}
+
+
+# ---------- REQUEST PATH ----------
+def record_report_event(report, kind):
+    from .tasks import process_notifications
+
+    # Two inserts (event + task), no recipient lookup: the worker does the fan-out.
+    if report.severity not in NOTIFY_SEVERITIES or not report.state:
+        return None
+    event = NotificationEvent.objects.create(
+        report=report,
+        kind=kind,
+        state=report.state.upper(),
+        city=report.city.strip(),
+    )
+    process_notifications.delay()
+    return event
+
+
+def record_report_events(reports, kind):
+    # batch form of record_report_event: one INSERT per database, one task
+    from .tasks import process_notifications
+
+    events = [
+        NotificationEvent(report=report, kind=kind, state=report.state.upper(), city=report.city.strip())
+        for report in reports
+        if report.severity in NOTIFY_SEVERITIES and report.state
+    ]
+    for alias, shard_events in by_shard(events, key=attrgetter("report_id")).items():
+        NotificationEvent.objects.using(alias).bulk_create(shard_events)
+    if events:
+        process_notifications.delay()
+    return events
+
+
+# ---------- WORKER ----------
+def recipients_for(event):
+    # (state, lower(city)) hits profile_area_idx, so "jackson" on a profile
+    # matches a report in "Jackson"; a blank profile city means "whole state"
+    return (
+        UserProfile.objects.annotate(city_lower=Lower("city"))
+        .filter(state=event.state, city_lower__in=[Lower(Value(event.city)), ""])
+        .filter(is_verified=True, notify_high_severity=True)
+        .exclude(email="")
+        .exclude(user_id=event.report.owner_id)
+        .values_list("user_id", flat=True)
+    )
+
+
+def fan_out_events(limit=100, batch_size=BATCH_SIZE):
+    events = list(
+        NotificationEvent.objects.filter(processed_at__isnull=True)
+        .select_related("report")
+        .order_by("id")[:limit]
+    )
+
+    created = 0
+    for event in events:
+        pending = []
+        for user_id in recipients_for(event).iterator(chunk_size=batch_size):
+            pending.append(NotificationDelivery(user_id=user_id, report_id=event.report_id))
+            if len(pending) >= batch_size:
+                created += len(NotificationDelivery.objects.bulk_create(pending, ignore_conflicts=True))
+                pending = []
+        if pending:
+            created += len(NotificationDelivery.objects.bulk_create(pending, ignore_conflicts=True))
+
+        NotificationEvent.objects.filter(pk=event.pk).update(processed_at=timezone.now())
+
+    return len(events), created
+
+
+def build_digest(profile, reports):
+    lines = [f"New high-severity roadblocks near {profile.city or profile.state}:", ""]
+    for report in reports:
+        place = f" near {report.nearby_place}" if report.nearby_place else ""
+        lines.append(f"- {report.title}: {report.road_name}{place}, {report.city}, {report.state}")
+    lines += ["", "You can turn these emails off from your profile."]
+
+    subject = "New roadblock in your area" if len(reports) == 1 else f"{len(reports)} new roadblocks in your area"
+    return EmailMessage(
+        subject=subject,
+        body="\n".join(lines),
+        from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
+        to=[profile.email],
+    )
+
+
+def due_users(pending, now, limit):
+    # rate limit: users mailed within MIN_INTERVAL keep their deliveries queued
+    cutoff = now - MIN_INTERVAL
+    if pending.db == DEFAULT_DB_ALIAS:
+        return list(
+            pending.filter(
+                Q(user__profile__last_notified_at__isnull=True) | Q(user__profile__last_notified_at__lte=cutoff)
+            )
+            .values_list("user_id", flat=True)
+            .distinct()[:limit]
+        )
+
+    # Deliveries on a shard (app/sharding.py) can't join the profiles, which
+    # stay on the default database, so the pending users are checked there a
+    # chunk at a time.
+    due = UserProfile.objects.filter(Q(last_notified_at__isnull=True) | Q(last_notified_at__lte=cutoff))
+    candidates = pending.values_list("user_id", flat=True).distinct().order_by("user_id").iterator(chunk_size=limit)
+    user_ids = []
+    while len(user_ids) < limit:
+        chunk = list(islice(candidates, limit))
+        if not chunk:
+            break
+        user_ids += due.filter(user_id__in=chunk).values_list("user_id", flat=True)
+    return user_ids[:limit]
+
+
+def send_digests(limit=BATCH_SIZE):
+    now = timezone.now()
+    pending = NotificationDelivery.objects.filter(sent_at__isnull=True)
+    user_ids = due_users(pending, now, limit)
+    if not user_ids:
+        return 0
+
+    profiles = UserProfile.objects.in_bulk(user_ids, field_name="user_id")
+    rows = NotificationDelivery.objects.filter(user_id__in=user_ids, sent_at__isnull=True).values_list(
+        "pk", "user_id", "report_id"
+    )
+    delivery_ids, pending = [], {}
+    for pk, user_id, report_id in rows:
+        delivery_ids.append(pk)
+        pending.setdefault(user_id, []).append(report_id)
+
+    reports = RoadblockReport.objects.in_bulk({rid for rids in pending.values() for rid in rids})
+    messages, mailed = [], []
+    for user_id, report_ids in pending.items():
+        profile = profiles.get(user_id)
+        digest_reports = [reports[rid] for rid in report_ids if rid in reports]
+        if profile and profile.email and digest_reports:
+            messages.append(build_digest(profile, digest_reports))
+            mailed.append(user_id)
+
+    with get_connection() as connection:
+        connection.send_messages(messages)
+
+    with transaction.atomic():
+        NotificationDelivery.objects.filter(pk__in=delivery_ids).update(sent_at=now)
+        # only users who got a digest start a new MIN_INTERVAL
+        UserProfile.objects.filter(user_id__in=mailed).update(last_notified_at=now)
+
+    return len(messages)
@@ -0,0 +1,245 @@
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import NotSupportedError, migrations
+
+# Schema changes on the big report tables without locking them for the
+# length of a deploy.
+#
+#  - AddIndexConcurrently / RemoveIndexConcurrently build or drop an index
+#    while writes continue: CONCURRENTLY on PostgreSQL, ALGORITHM=INPLACE,
+#    LOCK=NONE on MySQL. SQLite has no online index build and gets a plain
+#    one. The migration must set atomic = False.
+#  - AlterFieldToText lifts a CharField's length cap without touching the
+#    rows on PostgreSQL and SQLite.
+#  - New columns are added nullable (or with a constant default) and filled
+#    by `manage.py run_backfill`, see app/backfills.py.
+#  - `manage.py migrate` refuses a migration that would rebuild, rewrite or
+#    write-lock a hot table holding MIGRATION_SAFETY_MIN_ROWS rows or more,
+#    unless run with --allow-unsafe. `manage.py check_migrations` runs the
+#    same check without migrating, for CI.
+HOT_TABLES = set(
+    getattr(
+        settings,
+        "MIGRATION_HOT_TABLES",
+        ["app_roadblockreport", "app_roadblockcomment", "app_roadblockconfirmation", "app_notificationdelivery"],
+    )
+)
+MIN_ROWS = getattr(settings, "MIGRATION_SAFETY_MIN_ROWS", 10_000)
+
+
+# ---------- OPERATIONS ----------
+class OnlineIndexMixin:
+    def ensure_not_in_transaction(self, schema_editor):
+        if schema_editor.connection.in_atomic_block:
+            raise NotSupportedError(
+                f"{self.__class__.__name__} cannot run inside a transaction (set atomic = False on the migration)."
+            )
+
+    def create_index(self, schema_editor, model, index):
+        vendor = schema_editor.connection.vendor
+        if vendor == "postgresql":
+            self.ensure_not_in_transaction(schema_editor)
+            schema_editor.add_index(model, index, concurrently=True)
+        elif vendor == "mysql":
+            # fails instead of silently falling back to a locking copy
+            schema_editor.execute(f"{index.create_sql(model, schema_editor)} ALGORITHM=INPLACE LOCK=NONE", params=None)
+        else:
+            schema_editor.add_index(model, index)
+
+    def drop_index(self, schema_editor, model, index):
+        vendor = schema_editor.connection.vendor
+        if vendor == "postgresql":
+            self.ensure_not_in_transaction(schema_editor)
+            schema_editor.remove_index(model, index, concurrently=True)
+        elif vendor == "mysql":
+            schema_editor.execute(f"{index.remove_sql(model, schema_editor)} ALGORITHM=INPLACE LOCK=NONE")
+        else:
+            schema_editor.remove_index(model, index)
+
+
+class AddIndexConcurrently(OnlineIndexMixin, migrations.AddIndex):
+    def describe(self):
+        return "Concurrently create index %s on %s" % (self.index.name, self.model_name)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            self.create_index(schema_editor, model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            self.drop_index(schema_editor, model, self.index)
+
+
+class RemoveIndexConcurrently(OnlineIndexMixin, migrations.RemoveIndex):
+    def describe(self):
+        return "Concurrently remove index %s from %s" % (self.name, self.model_name)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = from_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            self.drop_index(schema_editor, model, index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = to_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            self.create_index(schema_editor, model, index)
+
+
+class AlterFieldToText(migrations.AlterField):
+    # varchar(n) -> text. PostgreSQL only rewrites the catalog (the two types
+    # are binary compatible), and SQLite never enforced the length, so its
+    # table is left alone instead of being rebuilt. Other backends get
+    # Django's ALTER, which the safety check judges as usual.
+    online_vendors = {"postgresql", "sqlite"}
+
+    def describe(self):
+        return "Alter field %s on %s to text in place" % (self.name, self.model_name)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "sqlite":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "sqlite":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+# ---------- SAFETY CHECK ----------
+ONLINE_OPERATIONS = (AddIndexConcurrently, RemoveIndexConcurrently)
+
+
+def statement_rules(table):
+    quoted = r"[\"`]?%s[\"`]?" % re.escape(table)
+    return [
+        (
+            re.compile(r"^CREATE (UNIQUE )?INDEX (?!CONCURRENTLY).* ON %s" % quoted, re.I | re.S),
+            "builds an index while blocking writes; use app.online_migrations.AddIndexConcurrently",
+        ),
+        (
+            re.compile(r"^CREATE TABLE [\"`]?new__%s[\"`]?" % re.escape(table), re.I),
+            "copies the whole table into a new one (SQLite table rebuild)",
+        ),
+        (
+            re.compile(r"^ALTER TABLE %s .*(ALTER COLUMN .* TYPE|MODIFY|CHANGE) " % quoted, re.I | re.S),
+            "rewrites the table to change a column type",
+        ),
+        (
+            re.compile(r"^UPDATE %s " % quoted, re.I),
+            "updates every row in one statement; add the column nullable and fill it with run_backfill",
+        ),
+    ]
+
+
+def operation_sql(connection, migration, operation, state):
+    # the SQL one operation would run, like sqlmigrate; returns it with the
+    # state after the operation
+    new_state = state.clone()
+    operation.state_forwards(migration.app_label, new_state)
+    if not operation.reduces_to_sql:
+        return [], new_state
+    with connection.schema_editor(collect_sql=True, atomic=migration.atomic) as schema_editor:
+        operation.database_forwards(migration.app_label, schema_editor, state, new_state)
+    return schema_editor.collected_sql, new_state
+
+
+def table_rows(connection, table, limit=MIN_ROWS):
+    # counts at most `limit` rows, so this stays cheap on a huge table
+    if table not in connection.introspection.table_names():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM {connection.ops.quote_name(table)} LIMIT {int(limit)}) AS sample"
+        )
+        return cursor.fetchone()[0]
+
+
+def migration_problems(connection, migration, state, min_rows=MIN_ROWS):
+    # [(operation description, table, reason)] for one migration applied on
+    # top of state; tables under min_rows rows are never a problem
+    problems, touched, python_ops, created = [], set(), [], set()
+    for operation in migration.operations:
+        statements, state = operation_sql(connection, migration, operation, state)
+        if isinstance(operation, migrations.RunPython):
+            python_ops.append(operation)
+        if isinstance(operation, migrations.CreateModel):
+            # a table made by this migration is empty whatever else it does to it
+            options = state.models[migration.app_label, operation.name_lower].options
+            created.add(options.get("db_table") or f"{migration.app_label}_{operation.name_lower}")
+        if isinstance(operation, ONLINE_OPERATIONS) or connection.vendor in getattr(operation, "online_vendors", ()):
+            continue
+        for table in HOT_TABLES - created:
+            hits = [reason for sql in statements for rule, reason in statement_rules(table) if rule.search(sql.strip())]
+            if any(table in sql for sql in statements):
+                touched.add(table)
+            for reason in dict.fromkeys(hits):
+                problems.append((operation.describe(), table, reason))
+
+    if migration.atomic and touched:
+        for operation in python_ops:
+            for table in sorted(touched):
+                problems.append(
+                    (operation.describe(), table, "runs a data migration in the same transaction as a schema change")
+                )
+    if min_rows:
+        large = {table for _, table, _ in problems if table_rows(connection, table, min_rows) >= min_rows}
+        problems = [problem for problem in problems if problem[1] in large]
+    return problems
+
+
+def plan_problems(connection, loader, plan, min_rows=MIN_ROWS):
+    if min_rows and all(table_rows(connection, table, min_rows) < min_rows for table in HOT_TABLES):
+        return []  # a new or small database; nothing here can hurt
+    found = []
+    for migration, backwards in plan:
+        if backwards:
+            continue
+        state = loader.project_state((migration.app_label, migration.name), at_end=False)
+        for problem in migration_problems(connection, migration, state, min_rows):
+            found.append((migration, *problem))
+    return found
+
+
+def describe_problems(found):
+    return "\n".join(
+        f"  {migration.app_label}.{migration.name}: {operation} {reason} on {table}"
+        for migration, operation, table, reason in found
+    )
+
+
+# ---------- MIGRATE HOOK ----------
+_allow_unsafe = False
+
+
+@contextmanager
+def allow_unsafe(allowed=True):
+    global _allow_unsafe
+    previous, _allow_unsafe = _allow_unsafe, allowed
+    try:
+        yield
+    finally:
+        _allow_unsafe = previous
+
+
+def check_plan(using, plan):
+    # pre_migrate receiver body, see app/signals.py
+    from django.db import connections
+    from django.db.migrations.loader import MigrationLoader
+
+    if _allow_unsafe or not getattr(settings, "MIGRATION_SAFETY_CHECK", True) or not plan:
+        return
+    connection = connections[using]
+    found = plan_problems(connection, MigrationLoader(connection, ignore_no_migrations=True), plan)
+    if found:
+        raise CommandError(
+            f"Refusing to migrate {using!r}; these would lock or rewrite large tables:\n"
+            f"{describe_problems(found)}\n"
+            "Split them into online steps (see app/online_migrations.py) or rerun with --allow-unsafe "
+            "in a maintenance window."
+        )
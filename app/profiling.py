@@ -0,0 +1,186 @@
+import io
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from .models import RequestProfile
+
+# Staff-only request profiling. Off unless PROFILING_ENABLED is set, in which
+# case a request is profiled when it sends the PROFILING_HEADER, matches one of
+# PROFILING_URL_NAMES, or wins the PROFILING_SAMPLE_RATE draw. Results land in
+# RequestProfile (newest PROFILING_KEEP rows) and are listed under
+# /moderation/profiles/.
+ENABLED = getattr(settings, "PROFILING_ENABLED", False)
+ENGINE = getattr(settings, "PROFILING_ENGINE", "cprofile")
+HEADER = getattr(settings, "PROFILING_HEADER", "X-Profile")
+URL_NAMES = set(getattr(settings, "PROFILING_URL_NAMES", ()))
+SAMPLE_RATE = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+KEEP = getattr(settings, "PROFILING_KEEP", 200)
+
+TOP_FUNCTIONS = 25
+SLOW_QUERIES = 10
+
+
+def url_name(request):
+    try:
+        return resolve(request.path_info).url_name or ""
+    except Resolver404:
+        return ""
+
+
+def wants_profile(request):
+    if HEADER and request.headers.get(HEADER):
+        selected = True
+    elif URL_NAMES and url_name(request) in URL_NAMES:
+        selected = True
+    else:
+        selected = SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+    # checked last: it loads the session and user
+    return selected and request.user.is_staff
+
+
+class QueryTimer:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - start) * 1000))
+
+
+class CProfileEngine:
+    name = "cprofile"
+
+    def __init__(self):
+        import cProfile
+
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+
+    def results(self):
+        import pstats
+
+        stats = pstats.Stats(self.profiler)
+        stats.sort_stats("cumulative")
+
+        top = []
+        for func in stats.fcn_list[:TOP_FUNCTIONS]:
+            calls, ncalls, own, cumulative, _ = stats.stats[func]
+            top.append(
+                {
+                    "function": pstats.func_std_string(func),
+                    "calls": ncalls,
+                    "own_ms": round(own * 1000, 2),
+                    "cumulative_ms": round(cumulative * 1000, 2),
+                }
+            )
+
+        out = io.StringIO()
+        stats.stream = out
+        stats.print_stats(TOP_FUNCTIONS * 2)
+        return top, out.getvalue()
+
+
+class PyinstrumentEngine:
+    name = "pyinstrument"
+
+    def __init__(self):
+        from pyinstrument import Profiler
+
+        self.profiler = Profiler(async_mode="disabled")
+
+    def start(self):
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+
+    def results(self):
+        # statistical samples have no per-function call counts; the call tree
+        # in the text report is what to read
+        return [], self.profiler.output_text(unicode=True, show_all=False)
+
+
+ENGINES = {
+    "cprofile": CProfileEngine,
+    "pyinstrument": PyinstrumentEngine,
+}
+
+
+def save_profile(request, response, engine, elapsed, queries):
+    top, report = engine.results()
+    match = getattr(request, "resolver_match", None)
+    profile = RequestProfile.objects.create(
+        user=request.user if request.user.is_authenticated else None,
+        method=request.method,
+        path=request.get_full_path()[:500],
+        url_name=(match.url_name or "") if match else "",
+        status_code=getattr(response, "status_code", None),
+        engine=engine.name,
+        duration_ms=round(elapsed * 1000, 2),
+        sql_count=len(queries),
+        sql_ms=round(sum(ms for _, ms in queries), 2),
+        top_functions=top,
+        slow_queries=[
+            {"sql": sql[:2000], "ms": round(ms, 2)}
+            for sql, ms in sorted(queries, key=lambda q: q[1], reverse=True)[:SLOW_QUERIES]
+        ],
+        report=report,
+    )
+
+    # retention cap: drop everything older than the newest KEEP profiles
+    cutoff = RequestProfile.objects.order_by("-id").values_list("id", flat=True)[KEEP : KEEP + 1].first()
+    if cutoff is not None:
+        RequestProfile.objects.filter(id__lte=cutoff).delete()
+    return profile
+
+
+class ProfilingMiddleware:
+    # Must come after AuthenticationMiddleware. When profiling is disabled
+    # Django drops it from the chain entirely, so it costs nothing.
+    def __init__(self, get_response):
+        if not ENABLED:
+            raise MiddlewareNotUsed
+        if ENGINE not in ENGINES:
+            raise ImproperlyConfigured(f"Unknown PROFILING_ENGINE {ENGINE!r}.")
+        if ENGINE == "pyinstrument":
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                raise ImproperlyConfigured("PROFILING_ENGINE = 'pyinstrument' needs the pyinstrument package.")
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not wants_profile(request):
+            return self.get_response(request)
+
+        engine = ENGINES[ENGINE]()
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            # every database, so queries sent to a shard are counted too
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+            engine.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                engine.stop()
+        elapsed = time.perf_counter() - start
+
+        profile = save_profile(request, response, engine, elapsed, timer.queries)
+        response["X-Profile-Id"] = str(profile.pk)
+        return response
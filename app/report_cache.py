@@ -0,0 +1,184 @@
+import math
+import random
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from . import metrics
+from .models import ReportAttachment, RoadblockComment, RoadblockReport
+from .sharding import shard_for_pk
+
+# Read-through cache for the report detail page.
+#
+#   report:<pk>:version          -> current version (forgotten by the signals/touch)
+#   report:<pk>:v<ver>:<layout>  -> report row, owner name, first comment page, photos
+#
+# Every write bumps the report's version and forgets the version pointer, so
+# readers move on to a fresh entry; a pointer re-read while a write was in
+# flight is at most VERSION_TTL old. Only one caller rebuilds a missing entry: threads coalesce on a lock
+# stripe, processes on a cache.add() lock, and the rest wait for the winner.
+# Entries refresh early with a probability that grows as they near expiry
+# (XFetch), so hot reports don't all miss at the same moment.
+TTL = getattr(settings, "REPORT_CACHE_TTL", 300)
+VERSION_TTL = getattr(settings, "REPORT_CACHE_VERSION_TTL", 60)
+LOCK_TTL = 10
+WAIT_FOR_BUILD = 1.0
+EARLY_REFRESH_BETA = 1.0
+
+REPORT_FIELDS = [field.attname for field in RoadblockReport._meta.concrete_fields]
+COMMENT_FIELDS = ["id", "report_id", "owner_id", "text", "created_at"]
+ATTACHMENT_FIELDS = ["id", "report_id", "owner_id", "content_type", "size", "thumbnail", "width", "height"]
+# part of every entry key, so entries packed before a field was added are never unpacked
+LAYOUT = zlib.crc32(",".join(REPORT_FIELDS + COMMENT_FIELDS + ATTACHMENT_FIELDS).encode())
+
+_stripes = [threading.Lock() for _ in range(64)]
+
+
+# ---------- COMMENT PAGES ----------
+COMMENTS_PAGE_SIZE = 20
+
+
+def comment_page_queryset(report_id, before=None, limit=COMMENTS_PAGE_SIZE):
+    # Newest first, keyed on the comment id so a page is one indexed range scan
+    # no matter how deep into the thread the reader is. One extra row tells us
+    # whether there is a next page.
+    qs = (
+        RoadblockComment.objects.for_report(report_id)
+        .filter(report_id=report_id)
+        .select_related("owner")
+        .order_by("-id")
+    )
+    if before:
+        qs = qs.filter(id__lt=before)
+    return qs[: limit + 1]
+
+
+def split_comment_page(comments, limit=COMMENTS_PAGE_SIZE):
+    next_cursor = comments[limit - 1].id if len(comments) > limit else None
+    return comments[:limit], next_cursor
+
+
+def get_comment_page(report, before=None, limit=COMMENTS_PAGE_SIZE):
+    return split_comment_page(list(comment_page_queryset(report.pk, before, limit)), limit)
+
+
+def detail_key(pk, version):
+    return f"report:{pk}:v{version}:{LAYOUT:x}"
+
+
+# ---------- VERSION ----------
+def current_version(pk):
+    key = RoadblockReport.version_cache_key(pk)
+    version = cache.get(key)
+    metrics.cache_lookup("report_version", version is not None)
+    if version is None:
+        version = RoadblockReport.objects.for_report(pk).filter(pk=pk).values_list("version", flat=True).first()
+        if version is not None:
+            cache.set(key, version, VERSION_TTL)
+    return version
+
+
+# ---------- SERIALIZATION ----------
+# Plain values only: no pickled User rows (and password hashes) in the cache.
+def pack(report, comments, next_cursor, attachments):
+    return {
+        "report": [getattr(report, name) for name in REPORT_FIELDS],
+        "owner": report.owner.username,
+        "comments": [
+            ([getattr(comment, name) for name in COMMENT_FIELDS], comment.owner.username) for comment in comments
+        ],
+        "next_cursor": next_cursor,
+        "attachments": [list(values) for values in attachments.values_list(*ATTACHMENT_FIELDS)],
+    }
+
+
+def unpack(data):
+    db = shard_for_pk(data["report"][REPORT_FIELDS.index("id")])
+    report = RoadblockReport.from_db(db, REPORT_FIELDS, data["report"])
+    report.owner = User(id=report.owner_id, username=data["owner"])
+
+    comments = []
+    for values, username in data["comments"]:
+        comment = RoadblockComment.from_db(db, COMMENT_FIELDS, values)
+        comment.owner = User(id=comment.owner_id, username=username)
+        comments.append(comment)
+
+    attachments = [ReportAttachment.from_db(db, ATTACHMENT_FIELDS, values) for values in data["attachments"]]
+    return {"report": report, "comments": comments, "next_cursor": data["next_cursor"], "attachments": attachments}
+
+
+# ---------- DETAIL ----------
+def build(pk):
+    start = time.perf_counter()
+    report = RoadblockReport.objects.for_report(pk).select_related("owner").filter(pk=pk).first()
+    if report is None:
+        return None
+    comments, next_cursor = get_comment_page(report)
+    attachments = ReportAttachment.objects.for_report(pk).filter(report_id=pk).order_by("id")
+
+    entry = {
+        "data": pack(report, comments, next_cursor, attachments),
+        "cost": time.perf_counter() - start,
+        "expires": time.time() + TTL,
+    }
+    # keyed by the version actually read, which may be newer than the caller's
+    cache.set(detail_key(pk, report.version), entry, TTL * 2)
+    return entry
+
+
+def build_once(pk, key):
+    lock_key = key + ":lock"
+    if not cache.add(lock_key, 1, LOCK_TTL):
+        return None
+    try:
+        return build(pk)
+    finally:
+        cache.delete(lock_key)
+
+
+def due_for_refresh(entry):
+    # XFetch: -log(rand) is usually small, occasionally large, so a few
+    # requests shortly before expiry volunteer to rebuild
+    return time.time() - entry["cost"] * EARLY_REFRESH_BETA * math.log(random.random() or 1e-12) >= entry["expires"]
+
+
+def fill(pk, key):
+    with _stripes[hash(key) % len(_stripes)]:
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+
+        entry = build_once(pk, key)
+        if entry is not None:
+            return entry
+
+        # another process is building it
+        deadline = time.monotonic() + WAIT_FOR_BUILD
+        while time.monotonic() < deadline:
+            time.sleep(0.025)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry
+        return build(pk)
+
+
+def get_detail(pk):
+    version = current_version(pk)
+    if version is None:
+        return None
+
+    key = detail_key(pk, version)
+    entry = cache.get(key)
+    metrics.cache_lookup("report_detail", entry is not None)
+
+    if entry is None:
+        entry = fill(pk, key)
+    elif due_for_refresh(entry):
+        # whoever wins the lock refreshes; everyone else keeps the current copy
+        entry = build_once(pk, key) or entry
+
+    return unpack(entry["data"]) if entry is not None else None
@@ -0,0 +1,78 @@
+import re
+
+from django.db.models import Q
+
+from .models import Road, RoadAlias
+
+# Road names as people type them ("Interstate 55", "i-55 n", "US Hwy 49")
+# reduced to one canonical name per road ("I-55", "US-49"). Every spelling
+# seen is stored as a RoadAlias, so the next report with it is linked by a
+# single lookup, and a process-local map usually saves even that.
+NUMBERED = [
+    (re.compile(r"^(?:I|IH|INTERSTATE(?: HIGHWAY| HWY)?) ?(\d+[A-Z]?)$"), "I-{}"),
+    (re.compile(r"^(?:US|U S|US (?:HIGHWAY|HWY|ROUTE|RT)|HIGHWAY US|HWY US) ?(\d+[A-Z]?)$"), "US-{}"),
+    (re.compile(r"^(?:SR|STATE (?:ROUTE|HIGHWAY|HWY|ROAD|RD)) ?(\d+[A-Z]?)$"), "SR-{}"),
+    (re.compile(r"^(?:HWY|HIGHWAY|ROUTE|RT|RTE) ?(\d+[A-Z]?)$"), "HWY-{}"),
+    (re.compile(r"^(?:CR|COUNTY (?:ROAD|RD|ROUTE)) ?(\d+[A-Z]?)$"), "CR-{}"),
+]
+DIRECTIONS = re.compile(r" (?:N|S|E|W|NB|SB|EB|WB|NORTH|SOUTH|EAST|WEST|NORTHBOUND|SOUTHBOUND|EASTBOUND|WESTBOUND)$")
+SUFFIXES = {
+    "STREET": "ST",
+    "AVENUE": "AVE",
+    "ROAD": "RD",
+    "BOULEVARD": "BLVD",
+    "DRIVE": "DR",
+    "LANE": "LN",
+    "PARKWAY": "PKWY",
+    "HIGHWAY": "HWY",
+    "FREEWAY": "FWY",
+    "EXPRESSWAY": "EXPY",
+}
+MAX_NAME = Road._meta.get_field("name").max_length
+
+_known = {}  # spelling -> road id, for this process
+_KNOWN_LIMIT = 10_000
+
+
+# ---------- NORMALIZATION ----------
+def spelling(text):
+    # case, punctuation and spacing never make two spellings different
+    return " ".join(re.sub(r"[^A-Z0-9]+", " ", (text or "").upper()).split())[:MAX_NAME]
+
+
+def canonical(text):
+    name = spelling(text)
+    name = DIRECTIONS.sub("", name)
+    for pattern, template in NUMBERED:
+        match = pattern.match(name)
+        if match:
+            return template.format(match.group(1))
+    return " ".join(SUFFIXES.get(word, word) for word in name.split())
+
+
+# ---------- LOOKUP ----------
+def road_id_for(text):
+    # the road a report's road_name belongs to, creating it on first sight
+    key = spelling(text)
+    if not key:
+        return None
+    road_id = _known.get(key)
+    if road_id is None:
+        road_id = RoadAlias.objects.filter(key=key).values_list("road_id", flat=True).first()
+        if road_id is None:
+            road, _ = Road.objects.get_or_create(name=canonical(text))
+            alias, _ = RoadAlias.objects.get_or_create(key=key, defaults={"road": road})
+            road_id = alias.road_id
+        if len(_known) >= _KNOWN_LIMIT:
+            _known.clear()
+        _known[key] = road_id
+    return road_id
+
+
+def road_ids(names):
+    # ids of the roads the given names refer to, for queries; never creates
+    keys = {spelling(name) for name in names} - {""}
+    if not keys:
+        return []
+    match = Q(aliases__key__in=keys) | Q(name__in={canonical(key) for key in keys})
+    return list(Road.objects.filter(match).values_list("id", flat=True).distinct())
@@ -0,0 +1,275 @@
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, models
+from django.urls import Resolver404, resolve
+
+# Optional sharding of reports by state. Off unless SHARD_DATABASES names
+# extra database aliases (see config/settings_sharded.py).
+#
+# Each state lives on one shard: SHARD_STATE_MAP pins states explicitly, the
+# rest are hashed over SHARD_DATABASES. A report's comments, confirmations,
+# photos and notification rows live next to it. Users, profiles and everything
+# else stay on the default database; user rows are copied to every shard so
+# owner joins and foreign keys keep working there.
+#
+# Ids are globally unique: shard i hands out ids from i * SHARD_ID_RANGE up
+# (python manage.py init_shards sets the sequences), so the shard of any
+# report or comment can be read off its id. The default database keeps range 0
+# and whatever rows it had before sharding was turned on.
+SHARD_DATABASES = list(getattr(settings, "SHARD_DATABASES", []))
+STATE_MAP = {state.upper(): alias for state, alias in getattr(settings, "SHARD_STATE_MAP", {}).items()}
+ID_RANGE = getattr(settings, "SHARD_ID_RANGE", 10**12)
+
+ALIASES = [DEFAULT_DB_ALIAS] + [alias for alias in SHARD_DATABASES if alias != DEFAULT_DB_ALIAS]
+ENABLED = len(ALIASES) > 1
+
+SHARDED_MODELS = {
+    "app.roadblockreport",
+    "app.roadblockcomment",
+    "app.roadblockconfirmation",
+    "app.notificationevent",
+    "app.notificationdelivery",
+    "app.reportattachment",
+}
+
+for alias in {*ALIASES, *STATE_MAP.values()}:
+    if alias not in settings.DATABASES:
+        raise ImproperlyConfigured(f"Shard {alias!r} is not in DATABASES.")
+
+_current = ContextVar("reten_shard", default=None)
+
+
+# ---------- PLACEMENT ----------
+def shard_for_state(state):
+    state = (state or "").upper()
+    if not ENABLED or not state:
+        return DEFAULT_DB_ALIAS
+    if state in STATE_MAP:
+        return STATE_MAP[state]
+    return SHARD_DATABASES[zlib.crc32(state.encode()) % len(SHARD_DATABASES)]
+
+
+def shard_for_pk(pk):
+    if not ENABLED or not pk:
+        return DEFAULT_DB_ALIAS
+    index = int(pk) // ID_RANGE
+    return ALIASES[index] if index < len(ALIASES) else DEFAULT_DB_ALIAS
+
+
+def by_shard(items, key=None):
+    # ids, or rows keyed by key(row), grouped by the shard that holds them
+    groups = {}
+    for item in items:
+        groups.setdefault(shard_for_pk(key(item) if key else item), []).append(item)
+    return groups
+
+
+def is_sharded(model):
+    # a model class or an instance
+    return ENABLED and model._meta.label_lower in SHARDED_MODELS
+
+
+def home_shard(instance):
+    # where a new row belongs, from its own fields
+    if instance._meta.label_lower == "app.roadblockreport":
+        return shard_for_state(instance.state)
+    if getattr(instance, "report_id", None):
+        return shard_for_pk(instance.report_id)
+    return None
+
+
+@contextmanager
+def use_shard(alias):
+    token = _current.set(alias)
+    try:
+        yield alias
+    finally:
+        _current.reset(token)
+
+
+# ---------- QUERYSETS ----------
+def per_shard(qs):
+    # a queryset already pinned with using() stays where it is
+    if not is_sharded(qs.model) or qs._db is not None:
+        return [qs]
+    return [qs.using(alias) for alias in ALIASES]
+
+
+class ShardedQuerySet(models.QuerySet):
+    def for_state(self, state):
+        return self.using(shard_for_state(state)) if ENABLED else self
+
+    def for_report(self, report_id):
+        return self.using(shard_for_pk(report_id)) if ENABLED else self
+
+    def per_shard(self):
+        return per_shard(self)
+
+    def create(self, **kwargs):
+        # QuerySet.create saves with using=self.db, which the router answers
+        # without the instance; place the new row by its own fields instead
+        if ENABLED and self._db is None:
+            alias = home_shard(self.model(**kwargs))
+            if alias:
+                return super(ShardedQuerySet, self.using(alias)).create(**kwargs)
+        return super().create(**kwargs)
+
+
+# ---------- SCATTER-GATHER ----------
+_executor = None
+
+
+def _run(fn, item):
+    # pool threads keep their own connections; recycle them like a request would
+    close_old_connections()
+    try:
+        return fn(item)
+    finally:
+        close_old_connections()
+
+
+def scatter(fn, items):
+    global _executor
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=len(ALIASES), thread_name_prefix="shard")
+    return list(_executor.map(_run, [fn] * len(items), items))
+
+
+def gather(qs, key, reverse=False):
+    # each shard returns its rows already ordered; sorting the concatenation
+    # only has to merge those runs
+    parts = per_shard(qs)
+    if len(parts) == 1:
+        return qs
+    rows = [row for part in scatter(list, parts) for row in part]
+    return sorted(rows, key=key, reverse=reverse)
+
+
+# ---------- ROUTING ----------
+class ShardRouter:
+    # Rows being inserted go to their home shard. Everything else follows the
+    # instance it came from, then the shard the current request is pinned to
+    # (ShardMiddleware), then the default database.
+    def db_for_read(self, model, **hints):
+        return self.route(model, hints.get("instance"))
+
+    def db_for_write(self, model, **hints):
+        return self.route(model, hints.get("instance"))
+
+    def route(self, model, instance):
+        if not is_sharded(model):
+            return None
+        if instance is not None and is_sharded(instance):
+            if instance._state.adding:
+                alias = home_shard(instance)
+                if alias:
+                    return alias
+            if instance._state.db:
+                return instance._state.db
+        return _current.get()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        sharded = is_sharded(obj1), is_sharded(obj2)
+        if all(sharded):
+            return obj1._state.db == obj2._state.db
+        if any(sharded):
+            # users are copied to every shard; reports point at roads on the
+            # default database without a constraint; nothing else crosses
+            other = obj2 if sharded[0] else obj1
+            return other._meta.label_lower in ("auth.user", "app.road")
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # every database gets the full schema; unused tables stay empty
+        return None
+
+
+# ---------- USER COPIES ----------
+REPLICATED_USER_FIELDS = ["username", "is_active", "is_staff", "is_superuser"]
+
+
+def replicate_user(user):
+    # shards only need the id and display name; never copy the password hash
+    from django.contrib.auth.models import User
+
+    for alias in ALIASES[1:]:
+        fields = {name: getattr(user, name) for name in REPLICATED_USER_FIELDS}
+        if not User.objects.using(alias).filter(pk=user.pk).update(**fields):
+            User.objects.using(alias).bulk_create(
+                [User(pk=user.pk, password="!", date_joined=user.date_joined, **fields)], ignore_conflicts=True
+            )
+
+
+def forget_user(user_id):
+    from django.contrib.auth.models import User
+
+    for alias in ALIASES[1:]:
+        User.objects.using(alias).filter(pk=user_id).delete()
+
+
+# ---------- MIDDLEWARE ----------
+def url_kwargs(request):
+    try:
+        return resolve(request.path_info).kwargs
+    except Resolver404:
+        return {}
+
+
+def state_shard(profile):
+    return shard_for_state(profile.state) if profile and profile.state else None
+
+
+class ShardMiddleware:
+    # Pins the request to one shard, so report queries that don't name one go
+    # to the right database: a URL with a report or comment id goes to that
+    # row's shard; anything else a non-staff user sees is scoped to their state.
+    # Staff pages that span states scatter-gather explicitly.
+    # Must come after AuthenticationMiddleware.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        alias = self.shard_from_url(request)
+        if alias is None and not self.spans_states(request.user):
+            alias = state_shard(getattr(request.user, "profile", None))
+        with use_shard(alias):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        from .models import UserProfile
+
+        alias = self.shard_from_url(request)
+        if alias is None:
+            user = await request.auser()
+            if not self.spans_states(user):
+                alias = state_shard(await UserProfile.objects.filter(user_id=user.pk).afirst())
+        with use_shard(alias):
+            return await self.get_response(request)
+
+    def shard_from_url(self, request):
+        # only sharded models look at the pin, so other pk routes are harmless
+        kwargs = url_kwargs(request)
+        pk = kwargs.get("pk") or kwargs.get("comment_id")
+        return shard_for_pk(pk) if isinstance(pk, int) else None
+
+    def spans_states(self, user):
+        return not user.is_authenticated or user.is_staff or user.is_superuser
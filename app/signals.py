@@ -1,9 +1,73 @@
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_migrate
 from django.dispatch import receiver
-from .models import UserProfile
+from .models import UserProfile, RoadblockReport, RoadblockComment, RoadblockConfirmation
+from .metrics import REPORTS_CREATED
+from . import sharding
+
+# Connected from AppConfig.ready() in every process, so the modules the
+# receivers call into are imported on first use, not at startup.
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
+
+# shards keep a copy of each user row (app/sharding.py); logins only touch last_login
+@receiver(post_save, sender=User)
+def replicate_user(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    if sharding.ENABLED and not raw and using == "default" and update_fields != frozenset(["last_login"]):
+        sharding.replicate_user(instance)
+
+@receiver(post_delete, sender=User)
+def forget_user(sender, instance, using=None, **kwargs):
+    if sharding.ENABLED and using == "default":
+        sharding.forget_user(instance.pk)
+
+@receiver(post_save, sender=RoadblockReport)
+def report_created_event(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        from .notifications import record_report_event
+
+        REPORTS_CREATED.inc()
+        record_report_event(instance, "CREATED")
+
+# save() bumps version; the cached pointer to the old one has to go
+@receiver(post_save, sender=RoadblockReport)
+@receiver(post_delete, sender=RoadblockReport)
+def forget_report_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        RoadblockReport.forget_versions([instance.pk])
+
+# fan-out-on-write timelines only care which state and city a report is in
+@receiver(post_save, sender=RoadblockReport)
+def push_to_timelines(sender, instance, raw=False, update_fields=None, **kwargs):
+    from . import timelines
+
+    if timelines.ENABLED and not raw and (update_fields is None or {"state", "city"} & set(update_fields)):
+        timelines.push(instance)
+
+# Only post_save here: a post_delete receiver would stop the delete collector
+# from fast-deleting comments/confirmations, so delete paths touch explicitly.
+@receiver(post_save, sender=RoadblockComment)
+def touch_report(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        RoadblockReport.touch(pk=instance.report_id)
+
+# confirmations saved outside app.confirmations (admin, shell) still get counted
+@receiver(post_save, sender=RoadblockConfirmation)
+def count_confirmation(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        from .confirmations import counters, update_confirmed
+
+        update_confirmed(instance.user_id, instance.report_id, True)
+        counters.mark(instance.report_id)
+
+# migrate refuses plans that would lock or rewrite the big tables (app/online_migrations.py);
+# pre_migrate fires once per app with the same plan, so only this app's copy checks it
+@receiver(pre_migrate)
+def check_migration_safety(sender, app_config, using=None, plan=None, **kwargs):
+    if app_config.label == "app":
+        from . import online_migrations
+
+        online_migrations.check_plan(using, plan)
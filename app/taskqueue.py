@@ -0,0 +1,149 @@
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F, Min
+from django.utils import timezone
+
+from . import metrics
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+
+# ---------- DEFINING / ENQUEUEING ----------
+def task(name=None, priority=0, max_attempts=3):
+    # Calling the function still runs it inline; fn.delay(...) stores a row
+    # for the worker instead and returns immediately.
+    def decorator(func):
+        task_name = name or f"{func.__module__}.{func.__name__}"
+        REGISTRY[task_name] = func
+
+        @wraps(func)
+        def delay(*args, **kwargs):
+            return enqueue(task_name, args, kwargs, priority=priority, max_attempts=max_attempts)
+
+        func.task_name = task_name
+        func.delay = delay
+        return func
+
+    return decorator
+
+
+def enqueue(name, args=(), kwargs=None, priority=0, max_attempts=3, run_at=None):
+    # eager mode (dev/tests without a worker) only short-circuits immediate work
+    if getattr(settings, "TASKS_EAGER", False) and run_at is None:
+        REGISTRY[name](*args, **(kwargs or {}))
+        return None
+
+    return Task.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs or {},
+        priority=priority,
+        max_attempts=max_attempts,
+        run_at=run_at or timezone.now(),
+    )
+
+
+# ---------- WORKER ----------
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_tasks(limit, owner):
+    now = timezone.now()
+    with transaction.atomic():
+        qs = Task.objects.filter(status="QUEUED", run_at__lte=now).order_by("-priority", "run_at", "id")
+        if connection.features.has_select_for_update_skip_locked:
+            qs = qs.select_for_update(skip_locked=True)
+        ids = list(qs.values_list("pk", flat=True)[:limit])
+
+        # The status guard makes the claim a compare-and-set, so backends
+        # without SKIP LOCKED (SQLite) still never hand a task out twice.
+        Task.objects.filter(pk__in=ids, status="QUEUED").update(
+            status="RUNNING",
+            locked_by=owner,
+            started_at=now,
+            attempts=F("attempts") + 1,
+        )
+
+    return list(Task.objects.filter(pk__in=ids, status="RUNNING", locked_by=owner, started_at=now))
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(10 * 2 ** (attempts - 1), 3600))
+
+
+def run_task(task_obj):
+    func = REGISTRY.get(task_obj.name)
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task {task_obj.name!r}")
+        func(*task_obj.args, **task_obj.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception("Task %s (%s) failed", task_obj.pk, task_obj.name)
+
+        if task_obj.attempts < task_obj.max_attempts:
+            Task.objects.filter(pk=task_obj.pk).update(
+                status="QUEUED",
+                locked_by="",
+                last_error=error,
+                run_at=timezone.now() + retry_delay(task_obj.attempts),
+            )
+        else:
+            Task.objects.filter(pk=task_obj.pk).update(
+                status="FAILED", last_error=error, finished_at=timezone.now()
+            )
+        metrics.TASKS.inc(task=task_obj.name, result="error")
+        metrics.flush()
+        return False
+
+    Task.objects.filter(pk=task_obj.pk).update(status="DONE", finished_at=timezone.now())
+    metrics.TASKS.inc(task=task_obj.name, result="done")
+    metrics.flush()
+    return True
+
+
+def requeue_stale(older_than=timedelta(minutes=30)):
+    # tasks whose worker died mid-run
+    return Task.objects.filter(status="RUNNING", started_at__lt=timezone.now() - older_than).update(
+        status="QUEUED", locked_by=""
+    )
+
+
+def purge_finished(older_than=timedelta(days=7)):
+    return Task.objects.filter(status="DONE", finished_at__lt=timezone.now() - older_than).delete()[0]
+
+
+# ---------- METRICS ----------
+def queue_stats(window=timedelta(hours=1)):
+    now = timezone.now()
+    depth = dict(Task.objects.values_list("status").annotate(n=Count("id")).order_by())
+
+    queued = Task.objects.filter(status="QUEUED", run_at__lte=now)
+    oldest = queued.aggregate(oldest=Min("run_at"))["oldest"]
+
+    recent = Task.objects.filter(status="DONE", finished_at__gte=now - window)
+    timings = recent.aggregate(
+        wait=Avg(F("started_at") - F("run_at")),
+        run=Avg(F("finished_at") - F("started_at")),
+        done=Count("id"),
+    )
+
+    return {
+        "depth": {status: depth.get(status, 0) for status, _ in Task.STATUS_CHOICES},
+        "ready": queued.count(),
+        "oldest_wait_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+        "avg_wait_seconds": timings["wait"].total_seconds() if timings["wait"] else 0.0,
+        "avg_run_seconds": timings["run"].total_seconds() if timings["run"] else 0.0,
+        "done_last_window": timings["done"],
+    }
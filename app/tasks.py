@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import send_mail
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import (
+    AccountDeletion,
+    NotificationDelivery,
+    NotificationEvent,
+    ReportAttachment,
+    RoadblockComment,
+    RoadblockConfirmation,
+    RoadblockReport,
+    Task,
+)
+from .sharding import ALIASES, per_shard, use_shard
+from .taskqueue import enqueue, task
+
+
+@task(priority=10)
+def send_verification_email(email, verify_url):
+    send_mail(
+        subject="Verify your Roadblocks account",
+        message=f"Click this link to verify your account:\n\n{verify_url}\n\nThis link expires in 24 hours.",
+        from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
+        recipient_list=[email],
+        fail_silently=False,
+    )
+
+
+# worker threads build several at once; Pillow releases the GIL while resizing
+@task(priority=2)
+def make_thumbnail(attachment_id):
+    from .attachments import build_thumbnail
+
+    build_thumbnail(attachment_id)
+
+
+@task(priority=5)
+def process_notifications():
+    from .notifications import MIN_INTERVAL, fan_out_events, send_digests
+
+    # drains everything pending, so extra enqueues for a burst of events are cheap no-ops
+    held_back = False
+    for alias in ALIASES:
+        with use_shard(alias):
+            while fan_out_events()[0]:
+                pass
+            while send_digests():
+                pass
+            held_back = held_back or NotificationDelivery.objects.filter(sent_at__isnull=True).exists()
+
+    # users held back by the rate limit get picked up by one delayed follow-up run
+    followup = Task.objects.filter(name=process_notifications.task_name, status="QUEUED")
+    if held_back and not followup.exists():
+        enqueue(process_notifications.task_name, priority=5, run_at=timezone.now() + MIN_INTERVAL)
+
+
+# ---------- ACCOUNT DELETION ----------
+PURGE_BATCH_SIZE = getattr(settings, "ACCOUNT_PURGE_BATCH_SIZE", 500)
+PURGE_BATCHES_PER_RUN = getattr(settings, "ACCOUNT_PURGE_BATCHES_PER_RUN", 20)
+
+
+def purge_stages(user_id):
+    # Children before parents, so each report delete below finds nothing left
+    # for the collector to load.
+    return [
+        ("comments", RoadblockComment.objects.filter(owner_id=user_id)),
+        ("confirmations", RoadblockConfirmation.objects.filter(user_id=user_id)),
+        ("report comments", RoadblockComment.objects.filter(report__owner_id=user_id)),
+        ("report confirmations", RoadblockConfirmation.objects.filter(report__owner_id=user_id)),
+        (
+            "notifications",
+            NotificationDelivery.objects.filter(Q(user_id=user_id) | Q(report__owner_id=user_id)),
+        ),
+        ("notification events", NotificationEvent.objects.filter(report__owner_id=user_id)),
+        ("photos", ReportAttachment.objects.filter(Q(owner_id=user_id) | Q(report__owner_id=user_id))),
+        ("reports", RoadblockReport.objects.filter(owner_id=user_id)),
+        ("user", User.objects.filter(pk=user_id)),
+    ]
+
+
+def recount_confirmations(report_ids):
+    from .confirmations import counters
+
+    counters.write(report_ids)  # recounts and bumps the version now, not on a timer
+
+
+# Stages that change other people's reports: after each batch those reports
+# get their counts and versions refreshed, so pages and ETags move on.
+REFRESH_REPORTS = {
+    "comments": lambda report_ids: RoadblockReport.touch(pk__in=report_ids),
+    "confirmations": recount_confirmations,
+}
+
+
+@task(priority=-5, max_attempts=5)
+def purge_account(deletion_id):
+    from .confirmations import forget_confirmed
+
+    deletion = AccountDeletion.objects.get(pk=deletion_id)
+    if deletion.status == "DONE":
+        return
+
+    # Each batch is its own short transaction; after PURGE_BATCHES_PER_RUN the
+    # task re-enqueues itself so other queued work gets a turn.
+    batches = 0
+    for stage, stage_qs in purge_stages(deletion.user_id_snapshot):
+        refresh = REFRESH_REPORTS.get(stage)
+        fields = ["pk", "report_id"] if refresh else ["pk"]
+        for qs in per_shard(stage_qs):
+            while True:
+                rows = list(qs.values_list(*fields)[:PURGE_BATCH_SIZE])
+                if not rows:
+                    break
+
+                ids = [row[0] for row in rows]
+                deleted, _ = qs.model.objects.using(qs.db).filter(pk__in=ids).delete()
+                if refresh:
+                    refresh({row[1] for row in rows})
+                AccountDeletion.objects.filter(pk=deletion_id).update(
+                    status="RUNNING", stage=stage, rows_deleted=F("rows_deleted") + deleted
+                )
+
+                batches += 1
+                if batches >= PURGE_BATCHES_PER_RUN:
+                    purge_account.delay(deletion_id)
+                    return
+
+    forget_confirmed(deletion.user_id_snapshot)
+    AccountDeletion.objects.filter(pk=deletion_id).update(status="DONE", stage="", finished_at=timezone.now())
@@ -1,3 +1,640 @@
-from django.test import TestCase
+import base64
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import timedelta
+from io import StringIO
+from operator import attrgetter
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import attachments, backfills, escalation, online_migrations, sharding, taskqueue, timelines
+from .confirmations import counters
+from .views import timeline_scope
+from .models import (
+    AccountDeletion,
+    BackfillProgress,
+    ReportRevision,
+    RoadblockComment,
+    RoadblockConfirmation,
+    ReportAttachment,
+    RoadblockReport,
+    Task,
+    UserProfile,
+    attachment_storage,
+)
+
+
+def verified_user(username):
+    user = User.objects.create_user(username, password="p")
+    UserProfile.objects.update_or_create(user=user, defaults={"state": "MS", "city": "Jackson", "is_verified": True})
+    return user
+
+
+# counts wait for an explicit counters.flush(), as they would for the timer
+@mock.patch.object(counters, "interval", 3600)
+class ConfirmationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(counters.flush)
+        self.owner = verified_user("alice")
+        self.report = RoadblockReport.objects.create(
+            owner=self.owner, title="Tree down", description="d", road_name="I-55", city="Jackson", state="MS"
+        )
+        self.user = verified_user("bob")
+        self.client.force_login(self.user)
+        self.detail = reverse("report-detail", args=[self.report.pk])
+
+    def test_confirm_redirect_shows_confirmed_page(self):
+        # the page cached before confirming must not come back as a 304,
+        # even before the report's count and version are flushed
+        self.client.get(self.detail)  # sets the CSRF cookie, which is part of the tag
+        page = self.client.get(self.detail)
+        self.assertContains(page, "Confirm")
+        self.assertNotContains(page, "Unconfirm")
+        self.assertEqual(self.client.get(self.detail, HTTP_IF_NONE_MATCH=page["ETag"]).status_code, 304)
+
+        response = self.client.post(reverse("report-confirm", args=[self.report.pk]))
+        self.assertRedirects(response, self.detail, fetch_redirect_response=False)
+
+        again = self.client.get(self.detail, HTTP_IF_NONE_MATCH=page["ETag"])
+        self.assertEqual(again.status_code, 200)
+        self.assertContains(again, "Unconfirm")
+
+    def test_confirm_json_returns_current_count(self):
+        response = self.client.post(reverse("report-confirm", args=[self.report.pk]), HTTP_ACCEPT="application/json")
+        self.assertEqual(response.json(), {"report": self.report.pk, "confirmed": True, "confirmation_count": 1})
+
+    @override_settings(TASKS_EAGER=True)
+    def test_purge_recounts_and_touches_reports(self):
+        self.client.post(reverse("report-confirm", args=[self.report.pk]))
+        self.client.post(self.detail, {"text": "Still blocked at the exit"})
+        counters.flush()
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.confirmation_count, 1)
+        self.assertTrue(RoadblockComment.objects.filter(owner=self.user).exists())
+
+        owner_client = self.client_class()
+        owner_client.force_login(self.owner)
+        owner_client.get(self.detail)
+        page = owner_client.get(self.detail)
+        self.assertContains(page, "Still blocked at the exit")
+        self.assertEqual(owner_client.get(self.detail, HTTP_IF_NONE_MATCH=page["ETag"]).status_code, 304)
+        version = self.report.version
+
+        self.client.post(reverse("delete-account"))
+
+        self.assertEqual(AccountDeletion.objects.get(user_id_snapshot=self.user.pk).status, "DONE")
+        self.assertFalse(RoadblockComment.objects.filter(report=self.report).exists())
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.confirmation_count, 0)
+        self.assertGreater(self.report.version, version)
+
+        again = owner_client.get(self.detail, HTTP_IF_NONE_MATCH=page["ETag"])
+        self.assertEqual(again.status_code, 200)
+        self.assertNotContains(again, "Still blocked at the exit")
+
+
+# ---------- TASK QUEUE ----------
+@taskqueue.task(name="tests.flaky")
+def flaky(fail):
+    if fail:
+        raise RuntimeError("boom")
+
+
+class TaskQueueTests(TestCase):
+    def test_claim_takes_highest_priority_first_and_only_once(self):
+        low = flaky.delay(False)
+        high = taskqueue.enqueue("tests.flaky", [False], priority=5)
+        later = taskqueue.enqueue("tests.flaky", [False], run_at=timezone.now() + timedelta(hours=1))
+
+        claimed = taskqueue.claim_tasks(1, "w1")
+        self.assertEqual([t.pk for t in claimed], [high.pk])
+        self.assertEqual((claimed[0].status, claimed[0].attempts, claimed[0].locked_by), ("RUNNING", 1, "w1"))
+
+        self.assertEqual([t.pk for t in taskqueue.claim_tasks(5, "w2")], [low.pk])
+        self.assertEqual(taskqueue.claim_tasks(5, "w3"), [])
+        self.assertEqual(Task.objects.get(pk=later.pk).status, "QUEUED")
+
+    def test_failure_backs_off_then_fails_after_max_attempts(self):
+        task_obj = taskqueue.enqueue("tests.flaky", [True], max_attempts=2)
+
+        (claimed,) = taskqueue.claim_tasks(1, "w1")
+        with self.assertLogs("app.taskqueue", "ERROR"):
+            self.assertFalse(taskqueue.run_task(claimed))
+        task_obj.refresh_from_db()
+        self.assertEqual((task_obj.status, task_obj.locked_by), ("QUEUED", ""))
+        self.assertIn("boom", task_obj.last_error)
+        self.assertGreater(task_obj.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(taskqueue.claim_tasks(1, "w1"), [])
+
+        Task.objects.filter(pk=task_obj.pk).update(run_at=timezone.now())
+        (claimed,) = taskqueue.claim_tasks(1, "w1")
+        self.assertEqual(claimed.attempts, 2)
+        with self.assertLogs("app.taskqueue", "ERROR"):
+            self.assertFalse(taskqueue.run_task(claimed))
+        task_obj.refresh_from_db()
+        self.assertEqual(task_obj.status, "FAILED")
+        self.assertIsNotNone(task_obj.finished_at)
+
+    def test_retry_delay_doubles_up_to_an_hour(self):
+        self.assertEqual([taskqueue.retry_delay(n).total_seconds() for n in (1, 2, 3, 10)], [10, 20, 40, 3600])
+
+    def test_unknown_task_fails_instead_of_raising(self):
+        task_obj = taskqueue.enqueue("tests.missing", max_attempts=1)
+        (claimed,) = taskqueue.claim_tasks(1, "w1")
+        with self.assertLogs("app.taskqueue", "ERROR"):
+            self.assertFalse(taskqueue.run_task(claimed))
+        task_obj.refresh_from_db()
+        self.assertEqual(task_obj.status, "FAILED")
+        self.assertIn("LookupError", task_obj.last_error)
+
+    def test_success_marks_done(self):
+        task_obj = flaky.delay(False)
+        (claimed,) = taskqueue.claim_tasks(1, "w1")
+        self.assertTrue(taskqueue.run_task(claimed))
+        task_obj.refresh_from_db()
+        self.assertEqual(task_obj.status, "DONE")
+
+    def test_requeue_stale_only_touches_old_running_tasks(self):
+        stale = flaky.delay(False)
+        fresh = flaky.delay(False)
+        taskqueue.claim_tasks(2, "dead-worker")
+        Task.objects.filter(pk=stale.pk).update(started_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(taskqueue.requeue_stale(), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, stale.locked_by), ("QUEUED", ""))
+        self.assertEqual((fresh.status, fresh.locked_by), ("RUNNING", "dead-worker"))
+        self.assertEqual([t.pk for t in taskqueue.claim_tasks(5, "w2")], [stale.pk])
+
+
+# ---------- SHARDING ----------
+# The shards only exist under config.settings_sharded, so ShardingTests is
+# skipped in the normal run and ShardedSuiteTests runs it in a subprocess.
+@unittest.skipUnless(sharding.ENABLED, "needs DJANGO_SETTINGS_MODULE=config.settings_sharded")
+class ShardingTests(TransactionTestCase):
+    # committed rows, so scatter()'s pool threads can see them
+    databases = "__all__"
+
+    def setUp(self):
+        cache.clear()
+        call_command("init_shards", stdout=StringIO())
+        states = ["MS", "TN", "AL", "LA", "AR", "GA"]
+        self.states = {sharding.shard_for_state(state): state for state in states}
+        self.assertGreater(len(self.states), 1)
+        self.first, self.second = list(self.states.values())[:2]
+
+        self.owner = verified_user("alice")
+        self.reports = {
+            state: RoadblockReport.objects.create(
+                owner=self.owner,
+                title=f"Flooding in {state}",
+                description="d",
+                road_name="US 49",
+                city="X",
+                state=state,
+            )
+            for state in (self.first, self.second)
+        }
+
+    def test_reports_and_comments_live_on_their_state_shard(self):
+        for state, report in self.reports.items():
+            alias = sharding.shard_for_state(state)
+            self.assertNotEqual(alias, "default")
+            self.assertEqual(report._state.db, alias)
+            self.assertEqual(sharding.shard_for_pk(report.pk), alias)
+            self.assertFalse(RoadblockReport.objects.using("default").filter(pk=report.pk).exists())
+
+            comment = RoadblockComment.objects.create(report=report, owner=self.owner, text="Still closed")
+            self.assertEqual(sharding.shard_for_pk(comment.pk), alias)
+            self.assertTrue(RoadblockComment.objects.using(alias).filter(pk=comment.pk).exists())
+
+        self.assertTrue(User.objects.using(sharding.shard_for_state(self.first)).filter(pk=self.owner.pk).exists())
+
+    def test_detail_and_comment_urls_route_by_id(self):
+        self.client.force_login(self.owner)
+        for report in self.reports.values():
+            detail = reverse("report-detail", args=[report.pk])
+            self.client.post(detail, {"text": f"Comment on {report.title}"})
+            page = self.client.get(detail)
+            self.assertContains(page, report.title)
+            self.assertContains(page, f"Comment on {report.title}")
+
+    def test_lists_scope_to_the_state_or_gather_every_shard(self):
+        self.client.force_login(self.owner)
+        UserProfile.objects.filter(user=self.owner).update(state=self.first)
+        page = self.client.get(reverse("report-list"))
+        self.assertContains(page, f"Flooding in {self.first}")
+        self.assertNotContains(page, f"Flooding in {self.second}")
+
+        staff = User.objects.create_superuser("root", password="p")
+        self.client.force_login(staff)
+        page = self.client.get(reverse("report-list"))
+        self.assertContains(page, f"Flooding in {self.first}")
+        self.assertContains(page, f"Flooding in {self.second}")
+
+    def test_gather_merges_shards_in_order(self):
+        older, newer = self.reports.values()
+        RoadblockReport.objects.using(older._state.db).filter(pk=older.pk).update(
+            created_at=timezone.now() - timedelta(hours=1)
+        )
+        rows = sharding.gather(
+            RoadblockReport.objects.order_by("-created_at"), key=attrgetter("created_at"), reverse=True
+        )
+        self.assertEqual([report.pk for report in rows], [newer.pk, older.pk])
+        self.assertEqual(
+            sharding.by_shard([older.pk, newer.pk]),
+            {older._state.db: [older.pk], newer._state.db: [newer.pk]},
+        )
+
+
+class ShardedSuiteTests(SimpleTestCase):
+    def test_sharding_tests_pass_with_shards_configured(self):
+        if sharding.ENABLED:
+            self.skipTest("ShardingTests already runs in this process")
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "config.settings_sharded", "RETEN_SHARDS": "2"}
+        out = subprocess.run(
+            [sys.executable, "manage.py", "test", "app.tests.ShardingTests", "--noinput"],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(out.returncode, 0, out.stderr)
+        self.assertNotIn("skipped", out.stderr)
+
+
+# ---------- TIMELINES ----------
+@mock.patch.object(timelines, "ENABLED", True)
+class TimelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = verified_user("alice")
+        self.profile = UserProfile.objects.get(user=self.user)
+
+    def report(self, title, city="Jackson", state="MS"):
+        return RoadblockReport.objects.create(
+            owner=self.user, title=title, description="d", road_name="I-55", city=city, state=state
+        )
+
+    def test_saving_a_report_pushes_it_to_its_timelines(self):
+        first = self.report("first")
+        timelines.get("MS")  # built from the table, then patched by every push
+        timelines.get("MS", "Jackson")
+        second = self.report("second")
+        other = self.report("other", city="Clinton")
+        self.report("elsewhere", state="TN")
+
+        with mock.patch.object(timelines, "build") as build:
+            self.assertEqual(timelines.get("MS").newest(), [other.pk, second.pk, first.pk])
+            self.assertEqual(timelines.get("MS", "Jackson").newest(), [second.pk, first.pk])
+        build.assert_not_called()
+        self.assertEqual(timelines.known_cities("MS"), ("Clinton", "Jackson"))
+
+    def test_missing_timeline_is_rebuilt_and_moved_rows_dropped(self):
+        kept, moved = self.report("kept"), self.report("moved")
+        cache.clear()
+        self.assertEqual(timelines.get("MS", "Jackson").newest(), [moved.pk, kept.pk])
+
+        RoadblockReport.objects.filter(pk=moved.pk).update(city="Clinton")  # no save(), no push
+        self.assertEqual(timelines.reports("MS", "Jackson"), [kept])
+
+    def test_timeline_keeps_only_the_newest_ids(self):
+        with mock.patch.object(timelines, "LENGTH", 3):
+            timeline = timelines.Timeline([5, 3, 9])
+            self.assertFalse(timeline.push(1))
+            self.assertFalse(timeline.push(9))
+            self.assertTrue(timeline.push(7))
+        self.assertEqual(timeline.newest(), [9, 7, 5])
+
+    def test_city_filter_uses_a_timeline_only_for_one_matching_city(self):
+        for city in ("Jackson", "jackson ", "Clinton", "Brandon"):
+            self.report(city, city=city)
+        self.assertEqual(timelines.matching_city("MS", "jack"), "Jackson")
+        self.assertIsNone(timelines.matching_city("MS", "on"))  # every city
+        self.assertIsNone(timelines.matching_city("MS", "Jackson "))  # not every spelling of it
+        self.assertIsNone(timelines.matching_city("MS", "Memphis"))
+
+        self.assertEqual(timeline_scope(self.user, self.profile, {}), ("MS", None))
+        self.assertEqual(timeline_scope(self.user, self.profile, {"city": "jack"}), ("MS", "Jackson"))
+        self.assertIsNone(timeline_scope(self.user, self.profile, {"city": "on"}))
+        self.assertIsNone(timeline_scope(self.user, self.profile, {"severity": "HIGH"}))
+        staff = User.objects.create_superuser("root", password="p")
+        UserProfile.objects.filter(user=staff).update(state="MS")
+        self.assertIsNone(timeline_scope(staff, UserProfile.objects.get(user=staff), {}))
+
+    def test_list_page_reads_the_timeline_and_falls_back_to_the_query(self):
+        self.report("Tree down")
+        self.report("Flooded underpass", city="Clinton")
+        self.client.force_login(self.user)
+
+        page = self.client.get(reverse("report-list"), {"city": "jack"})
+        self.assertContains(page, "Tree down")
+        self.assertNotContains(page, "Flooded underpass")
+
+        with mock.patch.object(timelines, "reports") as from_timeline:
+            page = self.client.get(reverse("report-list"), {"city": "on"})
+        from_timeline.assert_not_called()
+        self.assertContains(page, "Tree down")
+        self.assertContains(page, "Flooded underpass")
+
+
+# ---------- ESCALATION ----------
+@mock.patch.object(counters, "interval", 3600)
+class EscalationTests(TestCase):
+    def setUp(self):
+        self.addCleanup(counters.flush)
+        self.owner = verified_user("alice")
+        self.report = RoadblockReport.objects.create(
+            owner=self.owner, title="Bridge out", description="d", road_name="I-55", city="Jackson", state="MS"
+        )
+        self.engine = escalation.EscalationEngine(window=60, thresholds={"MED": 2, "HIGH": 3}, review_threshold=3)
+
+    def confirm(self, *user_ids, ts=1000.0):
+        for user_id in user_ids:
+            self.engine.observe(self.report.pk, user_id, ts)
+
+    def test_engine_queues_each_level_once_within_the_window(self):
+        self.confirm(1)
+        self.confirm(2, ts=1100.0)  # the first confirmation has aged out
+        self.assertEqual(self.engine.take(), ({}, set()))
+
+        self.confirm(3, ts=1110.0)
+        self.assertEqual(self.engine.take(), ({self.report.pk: "MED"}, set()))
+        self.confirm(3, ts=1111.0)  # the same confirmer again adds nothing
+        self.confirm(4, ts=1112.0)
+        self.assertEqual(self.engine.take(), ({self.report.pk: "HIGH"}, {self.report.pk}))
+        self.confirm(5, ts=1113.0)
+        self.assertEqual(self.engine.take(), ({}, set()))
+
+    def test_flush_persists_severity_review_flag_and_revision(self):
+        version = self.report.version
+        self.confirm(1, 2, 3)
+        self.assertEqual(escalation.flush(self.engine), 1)
+
+        self.report.refresh_from_db()
+        self.assertEqual((self.report.severity, self.report.needs_review), ("HIGH", True))
+        self.assertGreater(self.report.version, version)
+        revision = ReportRevision.objects.get(report_id=self.report.pk)
+        self.assertEqual(revision.action, "ESCALATE")
+        self.assertEqual(revision.changes, {"severity": ["LOW", "HIGH"], "needs_review": [False, True]})
+
+    def test_persist_never_lowers_or_touches_closed_reports(self):
+        RoadblockReport.objects.filter(pk=self.report.pk).update(severity="HIGH")
+        self.assertEqual(escalation.persist({self.report.pk: "MED"}, set()), 0)
+
+        RoadblockReport.objects.filter(pk=self.report.pk).update(severity="LOW", status="RESOLVED")
+        self.assertEqual(escalation.persist({self.report.pk: "HIGH"}, {self.report.pk}), 0)
+        self.report.refresh_from_db()
+        self.assertEqual((self.report.severity, self.report.needs_review), ("LOW", False))
+        self.assertFalse(ReportRevision.objects.filter(report_id=self.report.pk).exists())
+
+    def test_feed_replays_confirmations_inside_the_window(self):
+        old = RoadblockConfirmation.objects.create(report=self.report, user=verified_user("bob"))
+        RoadblockConfirmation.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        new = RoadblockConfirmation.objects.create(report=self.report, user=verified_user("carol"))
+
+        feed = escalation.ConfirmationFeed(timezone.now() - timedelta(minutes=10))
+        self.assertEqual([row[0] for row in feed.read()], [new.pk])
+        self.assertEqual(feed.read(), [])
+
+
+# ---------- PHOTOS ----------
+# a 40x30 red PNG
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAACgAAAAeCAIAAADRv8uKAAAAKUlEQVR4nO3NMQEAAAgDILV/Z63gtwcK0FsZE3rFYrFYLBaLxWKxWPxw10YBOwBtD2oAAAAASUVORK5CYII="
+)
+
+
+class PhotoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        storage = {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": media}}
+        media_settings = override_settings(STORAGES={**settings.STORAGES, "attachments": storage})
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.owner = verified_user("alice")
+        self.client.force_login(self.owner)
+        self.reports = [
+            RoadblockReport.objects.create(
+                owner=self.owner, title=f"r{n}", description="d", road_name="I-55", city="Jackson", state="MS"
+            )
+            for n in range(2)
+        ]
+
+    def upload(self, report, content=PNG):
+        return self.client.post(
+            reverse("photo-upload", args=[report.pk]), {"photo": SimpleUploadedFile("photo.png", content)}
+        )
+
+    def stored_files(self):
+        storage = attachment_storage()
+        return sorted(
+            f"photos/{prefix}/{name}"
+            for prefix in storage.listdir("photos")[0]
+            for name in storage.listdir(f"photos/{prefix}")[1]
+        )
+
+    def test_same_photo_is_stored_once(self):
+        first, second = self.reports
+        self.upload(first)
+        self.upload(first)  # a repeat on the same report is the same attachment
+        self.upload(second)
+
+        self.assertEqual(ReportAttachment.objects.filter(report=first).count(), 1)
+        self.assertEqual(ReportAttachment.objects.filter(report=second).count(), 1)
+        self.assertEqual(len(set(ReportAttachment.objects.values_list("file", flat=True))), 1)
+        self.assertEqual(
+            self.stored_files(), [attachments.original_name(ReportAttachment.objects.first().content_hash, ".png")]
+        )
+
+    def test_rejects_files_that_are_not_images(self):
+        response = self.upload(self.reports[0], b"<svg xmlns='http://www.w3.org/2000/svg'/>")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ReportAttachment.objects.exists())
+
+    def test_photo_serves_byte_ranges(self):
+        self.upload(self.reports[0])
+        attachment = ReportAttachment.objects.get()
+        url = reverse("photo", args=[attachment.pk])
+
+        full = self.client.get(url)
+        self.assertEqual(full.status_code, 200)
+        self.assertEqual(b"".join(full.streaming_content), PNG)
+        self.assertEqual(full["Accept-Ranges"], "bytes")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=full["ETag"]).status_code, 304)
+
+        head = self.client.get(url, HTTP_RANGE="bytes=0-7")
+        self.assertEqual(head.status_code, 206)
+        self.assertEqual(b"".join(head.streaming_content), PNG[:8])
+        self.assertEqual(head["Content-Range"], f"bytes 0-7/{len(PNG)}")
+
+        tail = self.client.get(url, HTTP_RANGE="bytes=-12", HTTP_IF_RANGE=full["ETag"])
+        self.assertEqual(tail.status_code, 206)
+        self.assertEqual(b"".join(tail.streaming_content), PNG[-12:])
+
+        self.assertEqual(self.client.get(url, HTTP_RANGE="bytes=0-7", HTTP_IF_RANGE='"other"').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_RANGE="bytes=0-1,4-5").status_code, 200)
+        unsatisfiable = self.client.get(url, HTTP_RANGE=f"bytes={len(PNG)}-")
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable["Content-Range"], f"bytes */{len(PNG)}")
+
+    @unittest.skipIf(attachments.pillow()[0] is None, "needs Pillow")
+    def test_thumbnail_becomes_the_cover(self):
+        self.upload(self.reports[0])
+        attachment = ReportAttachment.objects.get()
+        attachments.build_thumbnail(attachment.pk)
+
+        attachment.refresh_from_db()
+        self.assertEqual(
+            (attachment.thumbnail.name, attachment.width, attachment.height),
+            (attachments.thumbnail_name(attachment.content_hash), 40, 30),
+        )
+        self.assertEqual(RoadblockReport.objects.get(pk=self.reports[0].pk).cover_id, attachment.pk)
+        thumbnail = self.client.get(reverse("photo-thumbnail", args=[attachment.pk]))
+        self.assertEqual(thumbnail["Content-Type"], "image/jpeg")
+
+    def test_sweep_deletes_only_files_nothing_points_at(self):
+        first, second = self.reports
+        self.upload(first)
+        self.upload(second)
+        self.upload(first, PNG + b"\0")
+        shared, other = (
+            ReportAttachment.objects.get(report=second),
+            ReportAttachment.objects.get(report=first, size=len(PNG) + 1),
+        )
+        self.client.post(reverse("photo-delete", args=[shared.pk]))
+        self.client.post(reverse("photo-delete", args=[other.pk]))
+
+        out = StringIO()
+        call_command("sweep_attachments", "--min-age", "0", "--dry-run", stdout=out)
+        self.assertIn("1 unused files, 0 deleted", out.getvalue())
+        call_command("sweep_attachments", "--min-age", "1", stdout=out)
+        self.assertEqual(len(self.stored_files()), 2)  # too new
+
+        call_command("sweep_attachments", "--min-age", "0", stdout=out)
+        self.assertEqual(self.stored_files(), [shared.file.name])
+        self.assertEqual(self.client.get(reverse("photo", args=[ReportAttachment.objects.get().pk])).status_code, 200)
+
+
+# ---------- ONLINE MIGRATIONS ----------
+class MigrationSafetyTests(TransactionTestCase):
+    # SQLite's schema editor, which collects the SQL, won't run inside the
+    # transaction a TestCase wraps each test in
+    def setUp(self):
+        loader = MigrationLoader(connection)
+        self.loader = loader
+        self.unsafe = loader.get_migration("app", "0004_roadblockreport_nearby_place")
+
+    def problems(self, name):
+        migration = self.loader.get_migration("app", name)
+        state = self.loader.project_state(("app", name), at_end=False)
+        return online_migrations.migration_problems(connection, migration, state, min_rows=0)
+
+    def test_flags_table_rebuilds_but_not_online_operations(self):
+        self.assertEqual(
+            {(table, reason.split(" ")[0]) for _, table, reason in self.problems("0004_roadblockreport_nearby_place")},
+            {("app_roadblockreport", "copies"), ("app_roadblockreport", "builds")},
+        )
+        self.assertEqual(self.problems("0006_roadblockcomment_thread_index_online"), [])
+        self.assertEqual(self.problems("0024_report_maps_url_text"), [])
+
+    def test_refuses_unsafe_plan_only_on_a_large_table(self):
+        plan = [(self.unsafe, False)]
+        online_migrations.check_plan("default", plan)  # an empty table is fine
+
+        owner = verified_user("alice")
+        RoadblockReport.objects.bulk_create(
+            RoadblockReport(owner=owner, title="t", description="d", road_name="I-55", city="Jackson", state="MS")
+            for _ in range(online_migrations.MIN_ROWS)
+        )
+        with self.assertRaisesMessage(CommandError, "app.0004_roadblockreport_nearby_place"):
+            online_migrations.check_plan("default", plan)
+
+        with online_migrations.allow_unsafe():
+            online_migrations.check_plan("default", plan)
+        online_migrations.check_plan("default", [(self.unsafe, True)])  # unapplying is never checked
+
+
+class BackfillTests(TestCase):
+    def setUp(self):
+        owner = verified_user("alice")
+        for n in range(5):
+            RoadblockReport.objects.create(
+                owner=owner, title=f"r{n}", description="d", road_name="I-55", city="Jackson", state="MS"
+            )
+        RoadblockReport.objects.update(confirmation_count=7)
+
+    def run_backfill(self, **kwargs):
+        return backfills.run("report_confirmation_count", batch=2, sleep=0, duty=1, **kwargs)
+
+    def test_stopped_run_resumes_from_its_cursor(self):
+        pks = list(RoadblockReport.objects.order_by("pk").values_list("pk", flat=True))
+
+        self.assertFalse(self.run_backfill(max_batches=1))
+        progress = BackfillProgress.objects.get(name="report_confirmation_count", database="default")
+        self.assertEqual((progress.last_pk, progress.rows, progress.finished_at), (pks[1], 2, None))
+        self.assertEqual(RoadblockReport.objects.filter(confirmation_count=7).count(), 3)
+
+        self.assertTrue(self.run_backfill())
+        progress.refresh_from_db()
+        self.assertEqual((progress.last_pk, progress.rows, progress.batches), (pks[-1], 5, 3))
+        self.assertIsNotNone(progress.finished_at)
+        self.assertFalse(RoadblockReport.objects.exclude(confirmation_count=0).exists())
+
+    def test_finished_backfill_only_reruns_on_restart(self):
+        self.assertTrue(self.run_backfill())
+        RoadblockReport.objects.update(confirmation_count=7)
+
+        self.assertTrue(self.run_backfill())
+        self.assertEqual(RoadblockReport.objects.filter(confirmation_count=7).count(), 5)
+
+        self.assertTrue(self.run_backfill(restart=True))
+        self.assertEqual(RoadblockReport.objects.filter(confirmation_count=7).count(), 0)
+        self.assertEqual(BackfillProgress.objects.get(name="report_confirmation_count").rows, 5)
+
+
+class ColdStartTests(SimpleTestCase):
+    # what a fresh RETEN_ROLE=api worker imports before its first request,
+    # as measured by benchmarks/import_time.py
+    PROBE = "import sys, config.wsgi; from django.urls import get_resolver; get_resolver().url_patterns; print(*sys.modules)"
+
+    def test_api_role_skips_photo_and_scoring_modules(self):
+        for async_views in ("", "1"):
+            env = {
+                **os.environ,
+                "DJANGO_SETTINGS_MODULE": "config.settings_prod",
+                "RETEN_ROLE": "api",
+                "RETEN_ALLOWED_HOSTS": "localhost",
+                "RETEN_ASYNC_VIEWS": async_views,
+            }
+            out = subprocess.run(
+                [sys.executable, "-c", self.PROBE],
+                cwd=settings.BASE_DIR,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            loaded = set(out.stdout.split())
+            with self.subTest(async_views=bool(async_views)):
+                self.assertEqual(sorted(loaded & {"PIL", "numpy", "app.attachments", "app.online_migrations"}), [])
@@ -0,0 +1,214 @@
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import cache_lookup
+from .models import RoadblockReport
+
+# Fan-out-on-write timelines for the report list (REPORT_TIMELINES = True).
+#
+#   timeline:state:<ST>         -> newest report ids filed in the state
+#   timeline:city:<ST>:<city>   -> the same for one city
+#   timeline:cities:<ST>        -> every city name reports in the state use
+#
+# Each timeline is a sorted id array, 8 bytes per id in the cache, capped at
+# LENGTH ids. Saving a report pushes its id into its state and city
+# timelines, so a list page is one cache read plus one in_bulk() of the ids,
+# instead of the filtered query. A missing timeline is rebuilt from the table
+# on first read; `manage.py rebuild_timelines` rebuilds them all.
+#
+# Reports are never pulled out of a timeline: rows that were deleted or moved
+# to another city simply don't come back from in_bulk() or are dropped when
+# read, so a timeline can run a few short until it is rebuilt.
+#
+# ?city= on the list matches city__icontains, so a city timeline only serves
+# it when exactly one city the state knows contains the text (see
+# matching_city); anything else runs the query.
+ENABLED = getattr(settings, "REPORT_TIMELINES", False)
+LENGTH = getattr(settings, "REPORT_TIMELINE_LENGTH", 200)
+TTL = getattr(settings, "REPORT_TIMELINE_TTL", 86400)
+
+
+def state_key(state):
+    return f"timeline:state:{state.upper()}"
+
+
+def city_key(state, city):
+    # cache-safe regardless of what people type as a city
+    return "timeline:city:%s:%s" % (state.upper(), "-".join(city.lower().split()))
+
+
+def timeline_key(state, city=None):
+    return city_key(state, city) if city is not None else state_key(state)
+
+
+def cities_key(state):
+    return f"timeline:cities:{state.upper()}"
+
+
+def keys_for(state, city):
+    # the timelines a report filed in state/city belongs to
+    if not state:
+        return []
+    keys = [state_key(state)]
+    if city and city.strip():
+        keys.append(city_key(state, city))
+    return keys
+
+
+# ---------- TIMELINE ----------
+class Timeline:
+    # ids ascending, which is filing order: ids only grow, within one
+    # database and from one shard range to the next
+    def __init__(self, ids=()):
+        self.ids = array("Q", sorted(set(ids))[-LENGTH:])
+
+    def push(self, report_id):
+        i = bisect_left(self.ids, report_id)
+        if i < len(self.ids) and self.ids[i] == report_id:
+            return False
+        if i == 0 and len(self.ids) >= LENGTH:
+            return False  # older than everything kept
+        self.ids.insert(i, report_id)
+        del self.ids[: len(self.ids) - LENGTH]
+        return True
+
+    def newest(self, n=LENGTH):
+        return self.ids[::-1][:n].tolist()
+
+    def dumps(self):
+        return self.ids.tobytes()
+
+    @classmethod
+    def loads(cls, value):
+        timeline = cls()
+        timeline.ids.frombytes(value)
+        return timeline
+
+
+# ---------- VERSIONED VALUES ----------
+# Same scheme as the confirmed index in app/confirmations.py: each key has a
+# version that every writer bumps first, a cached value is only read while it
+# carries the current version, and a writer patches it in place only when
+# it is exactly one version behind. Racing writers cost a rebuild, never a
+# lost id.
+def version_key(key):
+    return key + ":version"
+
+
+def new_version(key):
+    # nanoseconds, so an evicted version never comes back at an old number
+    cache.add(version_key(key), time.time_ns(), TTL)
+    return cache.get(version_key(key))
+
+
+def bump(key):
+    try:
+        return cache.incr(version_key(key))
+    except ValueError:  # not in the cache
+        new_version(key)
+        return cache.incr(version_key(key))
+
+
+def read(key):
+    # (value or None, current version)
+    values = cache.get_many([key, version_key(key)])
+    version = values.get(version_key(key))
+    if version is None:
+        version = new_version(key)
+    stored = values.get(key)
+    if stored is not None and stored[0] == version:
+        return stored[1], version
+    return None, version
+
+
+def patch(key, change):
+    version = bump(key)
+    stored = cache.get(key)
+    if stored is not None and stored[0] == version - 1:
+        cache.set(key, (version, change(stored[1])), TTL)
+
+
+def store(values):
+    # {key: value} built outside the versioning, e.g. by rebuild_timelines
+    cache.set_many({key: (bump(key), value) for key, value in values.items()}, TTL)
+
+
+# ---------- TIMELINES ----------
+def build(state, city=None, version=None):
+    qs = RoadblockReport.objects.for_state(state).filter(state=state.upper())
+    if city is not None:
+        qs = qs.filter(city__iexact=city.strip())
+    timeline = Timeline(qs.order_by("-id").values_list("id", flat=True)[:LENGTH])
+    if version is not None:
+        cache.set(timeline_key(state, city), (version, timeline.dumps()), TTL)
+    return timeline
+
+
+def get(state, city=None):
+    # a version read before the table means a push during the rebuild
+    # leaves this copy stale rather than wrong
+    value, version = read(timeline_key(state, city))
+    cache_lookup("report_timeline", value is not None)
+    if value is not None:
+        return Timeline.loads(value)
+    return build(state, city, version)
+
+
+def known_cities(state):
+    value, version = read(cities_key(state))
+    if value is None:
+        qs = RoadblockReport.objects.for_state(state).filter(state=state.upper())
+        value = tuple(sorted(set(qs.values_list("city", flat=True).distinct())))
+        cache.set(cities_key(state), (version, value), TTL)
+    return value
+
+
+def matching_city(state, text):
+    # The city whose timeline holds exactly the reports city__icontains=text
+    # finds in the state, or None. Spellings of one city that differ only in
+    # case or spacing share a timeline, so all of them have to match.
+    text = text.lower()
+    cities = known_cities(state)
+    keys = {city_key(state, city) for city in cities if text in city.lower()}
+    if len(keys) != 1:
+        return None
+    key = keys.pop()
+    spellings = [city for city in cities if city_key(state, city) == key]
+    if not all(text in city.lower() for city in spellings):
+        return None
+    return spellings[0]
+
+
+# ---------- FAN-OUT ----------
+def add_id(report_id):
+    def change(value):
+        timeline = Timeline.loads(value)
+        timeline.push(report_id)
+        return timeline.dumps()
+
+    return change
+
+
+def push(report):
+    if not report.state:
+        return
+    for key in keys_for(report.state, report.city):
+        patch(key, add_id(report.pk))
+
+    cities, _ = read(cities_key(report.state))
+    if cities is None or report.city not in cities:
+        patch(cities_key(report.state), lambda cities: tuple(sorted({*cities, report.city})))
+
+
+# ---------- READ ----------
+def reports(state, city=None, n=LENGTH):
+    # newest first, hydrated with one in_bulk() on the state's shard; rows
+    # that have since left the state or city are dropped
+    key = timeline_key(state, city)
+    ids = get(state, city).newest(n)
+    rows = RoadblockReport.objects.for_state(state).in_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows and key in keys_for(rows[pk].state, rows[pk].city)]
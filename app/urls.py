@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 from .views import (
@@ -15,10 +16,35 @@ from .views import (
     verify_email_view,
 )
 
-urlpatterns = [
+# Under ASGI the read-heavy pages can be served by their async twins.
+if settings.ASYNC_VIEWS:
+    from . import async_views
+
+    report_list = async_views.report_list_view
+    report_detail = async_views.report_detail_view
+    report_comments = async_views.report_comments_view
+    api_report_history = async_views.api_report_history
+else:
+    report_list = ReportListView.as_view()
+    report_detail = views.report_detail_view
+    report_comments = views.report_comments_view
+    api_report_history = views.api_report_history
+
+# JSON endpoints; config/urls_prod.py serves these alone on API workers
+api_urlpatterns = [
     path("api/signup/", views.api_signup, name="api-signup"),
     path("api/login/", views.api_login, name="api-login"),
+    path("api/reports/<int:pk>/history/", api_report_history, name="api-report-history"),
+    path("api/roads/", views.api_roads, name="api-roads"),
+    path("api/roads/reports/", views.api_road_reports, name="api-road-reports"),
+]
+
+# served by every worker role
+ops_urlpatterns = [
+    path("metrics", views.metrics_view, name="metrics"),
+]
 
+html_urlpatterns = [
     # Auth
     path("signup/", views.signup_view, name="signup"),
     path("profile/location/", edit_location, name="edit-location"),
@@ -26,20 +52,28 @@ urlpatterns = [
     # profile settings
     path("profile/contact/", edit_contact_view, name="edit-contact"),
     path("profile/verify/send/", send_verification_email_view, name="send-verify-email"),
-    path("verify/<uuid:token>/", verify_email_view, name="verify-email"),
+    path("verify/<uuid:token>/", views.legacy_verify_email_view, name="verify-email-legacy"),
+    path("verify/<str:token>/", verify_email_view, name="verify-email"),
     path("profile/delete/", views.delete_account_confirm, name="delete-account"),
 
 
     # Report list (home page)
-    path("", ReportListView.as_view(), name="report-list"),
+    path("", report_list, name="report-list"),
 
     # Create a new report
     path("report/new/", ReportCreateView.as_view(), name="report-create"),
 
     # Report detail (view + comments)
-    path("report/<int:pk>/", views.report_detail_view, name="report-detail"),
+    path("report/<int:pk>/", report_detail, name="report-detail"),
+    path("report/<int:pk>/comments/", report_comments, name="report-comments"),
     path("comments/<int:comment_id>/delete/", delete_comment_view, name="comment-delete"),
 
+    # Photos (see app/attachments.py)
+    path("report/<int:pk>/photos/", views.upload_photo_view, name="photo-upload"),
+    path("photos/<int:pk>/", views.photo_view, name="photo"),
+    path("photos/<int:pk>/thumbnail/", views.photo_thumbnail_view, name="photo-thumbnail"),
+    path("photos/<int:pk>/delete/", views.delete_photo_view, name="photo-delete"),
+
 
     # Update / delete (owner only)
     path("report/<int:pk>/edit/", ReportUpdateView.as_view(), name="report-update"),
@@ -57,4 +91,11 @@ urlpatterns = [
 
     path("moderation/reports/<int:pk>/edit/", ModerationReportUpdateView.as_view(), name="mod-edit-report"),
     path("moderation/reports/<int:pk>/delete/", delete_report_view, name="delete-report"),
+    path("moderation/reports/<int:pk>/history/", views.report_history_view, name="report-history"),
+
+    # Captured request profiles (see app/profiling.py)
+    path("moderation/profiles/", views.request_profiles_view, name="request-profiles"),
+    path("moderation/profiles/<int:pk>/", views.request_profile_detail_view, name="request-profile-detail"),
 ]
+
+urlpatterns = api_urlpatterns + html_urlpatterns + ops_urlpatterns
@@ -0,0 +1,38 @@
+import hashlib
+
+from django.conf import settings
+from django.core import signing
+
+# Email verification links are signed, timestamped payloads (HMAC with
+# SECRET_KEY), so checking one needs no table lookup. The payload includes a
+# digest of the address the link was sent to: if the user changes email in
+# the meantime, the old link stops working.
+SALT = "app.verification.email"
+MAX_AGE = getattr(settings, "EMAIL_VERIFICATION_MAX_AGE", 24 * 60 * 60)
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class ExpiredToken(InvalidToken):
+    pass
+
+
+def email_digest(email):
+    return hashlib.sha256((email or "").strip().lower().encode()).hexdigest()[:16]
+
+
+def make_token(user_id, email):
+    return signing.dumps({"u": user_id, "e": email_digest(email)}, salt=SALT)
+
+
+def read_token(token):
+    # returns (user_id, email digest); no database access
+    try:
+        data = signing.loads(token, salt=SALT, max_age=MAX_AGE)
+    except signing.SignatureExpired:
+        raise ExpiredToken
+    except signing.BadSignature:
+        raise InvalidToken
+    return data["u"], data["e"]
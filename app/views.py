@@ -1,6 +1,11 @@
 import json
+import uuid
+from functools import wraps
+from operator import attrgetter, itemgetter
 
-from django.http import JsonResponse, HttpResponseForbidden, HttpResponseBadRequest
+from asgiref.sync import iscoroutinefunction
+
+from django.http import Http404, HttpResponse, JsonResponse, HttpResponseForbidden, HttpResponseBadRequest
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.forms import UserCreationForm
@@ -8,18 +13,22 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin,
 from django.contrib import messages
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
-from django.core.mail import send_mail
 from django.shortcuts import render, redirect, get_object_or_404
-from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.db.models import Q
+from django.urls import reverse, reverse_lazy
+from django.utils.crypto import constant_time_compare
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
-from django.db.models import Q
-
-from rest_framework.authtoken.models import Token
 
-from .models import RoadblockReport, RoadblockComment, RoadblockConfirmation, UserProfile, EmailVerificationToken
-from .forms import RoadblockReportForm, RoadblockCommentForm, RoadblockFilterForm, ProfileLocationForm, ProfileContactForm
+from .models import Road, ReportAttachment, RoadblockReport, RoadblockComment, UserProfile, EmailVerificationToken, AccountDeletion, ReportRevision, RequestProfile
+from .forms import RoadblockReportForm, RoadblockCommentForm, ReportPhotoForm, RoadblockFilterForm, ProfileLocationForm, ProfileContactForm
+from . import audit, confirmations, metrics, report_cache, roads, sharding, timelines, verification
+from .etags import conditional, conditional_method, report_list_etag, all_reports_etag, report_etag, report_history_etag
+from .notifications import record_report_event
+from .report_cache import get_comment_page
+from .tasks import send_verification_email, purge_account
 
 
 # ---------- TEMPLATE AUTH (LOCAL DJANGO) ----------
@@ -59,31 +68,52 @@ def send_verification_email_view(request):
     if not profile.email:
         return redirect("edit-contact")
 
-    token_obj, _ = EmailVerificationToken.objects.get_or_create(user=request.user)
+    token = verification.make_token(request.user.pk, profile.email)
 
     verify_url = request.build_absolute_uri(
-        reverse_lazy("verify-email", kwargs={"token": str(token_obj.token)})
+        reverse_lazy("verify-email", kwargs={"token": token})
     )
 
-    send_mail(
-        subject="Verify your Roadblocks account",
-        message=f"Click this link to verify your account:\n\n{verify_url}\n\nThis link expires in 24 hours.",
-        from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
-        recipient_list=[profile.email],
-        fail_silently=False,
-    )
+    send_verification_email.delay(profile.email, verify_url)
+    metrics.VERIFICATION_LINKS.inc(result="sent")
 
     return redirect("edit-contact")
 
+def mark_email_verified(user):
+    profile, _ = UserProfile.objects.get_or_create(user=user)
+    profile.is_verified = True
+    profile.save()
+    RoadblockReport.refresh_owner_trust(user)  # trust badge changes on their reports
+
 def verify_email_view(request, token):
+    try:
+        user_id, digest = verification.read_token(token)
+    except verification.ExpiredToken:
+        metrics.VERIFICATION_LINKS.inc(result="expired")
+        return HttpResponseBadRequest("Verification link expired. Please request a new one.")
+    except verification.InvalidToken:
+        metrics.VERIFICATION_LINKS.inc(result="invalid")
+        return HttpResponseBadRequest("Invalid verification link.")
+
+    profile = get_object_or_404(UserProfile.objects.select_related("user"), user_id=user_id)
+    if verification.email_digest(profile.email) != digest:
+        metrics.VERIFICATION_LINKS.inc(result="invalid")
+        return HttpResponseBadRequest("This link was sent to a different email address. Please request a new one.")
+
+    if not profile.is_verified:
+        mark_email_verified(profile.user)
+    metrics.VERIFICATION_LINKS.inc(result="verified")
+
+    return render(request, "roadblocks/verify_success.html")
+
+# links from before signed tokens; drop once EmailVerificationToken is empty
+def legacy_verify_email_view(request, token):
     token_obj = get_object_or_404(EmailVerificationToken, token=token)
 
     if token_obj.is_expired():
         return HttpResponseBadRequest("Verification link expired. Please request a new one.")
 
-    profile, _ = UserProfile.objects.get_or_create(user=token_obj.user)
-    profile.is_verified = True
-    profile.save()
+    mark_email_verified(token_obj.user)
 
     token_obj.delete()  # one-time use
 
@@ -107,9 +137,17 @@ def delete_account_confirm(request):
         raise PermissionDenied
     if request.method == "POST":
         user = request.user
-        logout(request)         
-        user.delete()            # permanently delete user
-        return redirect("login") # or redirect("report-list") if you want
+
+        # Deactivating locks the account out everywhere right away (sessions and
+        # API tokens both reject inactive users); the rows are purged in batches
+        # by the worker.
+        user.is_active = False
+        user.save(update_fields=["is_active"])
+        deletion = AccountDeletion.objects.create(user=user, user_id_snapshot=user.pk, username=user.username)
+        purge_account.delay(deletion.pk)
+
+        logout(request)
+        return redirect("login")
 
     return render(request, "profile/delete_account_confirm.html")
 
@@ -133,6 +171,8 @@ def api_signup(request):
     if User.objects.filter(username=username).exists():
         return JsonResponse({"detail": "Username already taken"}, status=400)
 
+    from rest_framework.authtoken.models import Token
+
     user = User.objects.create_user(username=username, password=password)
     token, _ = Token.objects.get_or_create(user=user)
 
@@ -157,6 +197,7 @@ def api_login(request):
     if user is None:
         return JsonResponse({"detail": "Invalid username or password"}, status=400)
 
+    from rest_framework.authtoken.models import Token
     token, _ = Token.objects.get_or_create(user=user)
     return JsonResponse(
         {"detail": "Login success", "token": token.key},
@@ -164,6 +205,31 @@ def api_login(request):
     )
 
 
+def api_login_required(view):
+    # login_required for the JSON endpoints: a 401 rather than a redirect to
+    # a login page, which the api role (config/urls_prod.py) doesn't serve
+    def unauthorized():
+        return JsonResponse({"detail": "Authentication required"}, status=401)
+
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not (await request.auser()).is_authenticated:
+                return unauthorized()
+            return await view(request, *args, **kwargs)
+
+    else:
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return unauthorized()
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
 # ---------- MIXINS ----------
 class OwnerOnlyMixin(UserPassesTestMixin):
     def test_func(self):
@@ -171,43 +237,100 @@ class OwnerOnlyMixin(UserPassesTestMixin):
         return obj.owner == self.request.user
 
 
+class AuditedUpdateMixin:
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        audit.record(self.object, self.request.user, "EDIT", audit.form_changes(form))
+        return response
+
+
 # ---------- REPORT LIST ----------
+def filter_reports(user, profile, params):
+    qs = RoadblockReport.objects.all().order_by("-created_at")
+
+    # ✅ Non-admins are limited to their state
+    if not (user.is_staff or user.is_superuser):
+        if not profile or not profile.state:
+            return RoadblockReport.objects.none()
+        qs = qs.for_state(profile.state).filter(state=profile.state.upper())
+
+    # ✅ Now apply the filter form (admins + users)
+    form = RoadblockFilterForm(params)
+    if form.is_valid():
+        city = (form.cleaned_data.get("city") or "").strip()
+        road = (form.cleaned_data.get("road") or "").strip()
+        severity = form.cleaned_data.get("severity") or ""
+        status = form.cleaned_data.get("status") or ""
+        verified_only = form.cleaned_data.get("verified_only") or False
+
+        if city:
+            qs = qs.filter(city__icontains=city)
+        if road:
+            qs = qs.filter(road_id__in=roads.road_ids([road]))
+        if severity:
+            qs = qs.filter(severity=severity)
+        if status:
+            qs = qs.filter(status=status)
+        if verified_only:
+            qs = qs.filter(trust_level__in=["ADMIN", "ACCOUNT"])
+
+    return qs
+
+
+def timeline_scope(user, profile, params):
+    # With REPORT_TIMELINES on, a non-staff user's unfiltered list, or a
+    # ?city= that only one city of their state matches, is read from
+    # app/timelines.py. Returns (state, city or None), or None when the
+    # query has to run.
+    if not timelines.ENABLED or user.is_staff or user.is_superuser or not profile or not profile.state:
+        return None
+    form = RoadblockFilterForm(params)
+    if not form.is_valid() or any(value for name, value in form.cleaned_data.items() if name != "city"):
+        return None
+    city = (form.cleaned_data.get("city") or "").strip()
+    if not city:
+        return profile.state, None
+    city = timelines.matching_city(profile.state, city)
+    return (profile.state, city) if city is not None else None
+
+
+def stats_querysets(profile):
+    # ✅ STATS BAR: one COUNT per entry; None if the user has no location yet
+    if not profile or not profile.state:
+        return None
+
+    base_qs = RoadblockReport.objects.for_state(profile.state).filter(state=profile.state.upper())
+    return {
+        "total": base_qs,
+        "active": base_qs.filter(status="ACTIVE"),
+        "resolved": base_qs.filter(status="RESOLVED"),
+        "trusted": base_qs.filter(trust_level__in=["ADMIN", "ACCOUNT"]),
+    }
+
+
+EMPTY_STATS = {"total": 0, "active": 0, "resolved": 0, "trusted": 0}
+
+
+def list_reports(qs):
+    # staff lists span every shard and are merged here; everyone else's
+    # queryset is pinned to their state's shard and returned as is
+    return sharding.gather(qs, key=attrgetter("created_at"), reverse=True)
+
+
+@conditional_method(report_list_etag)
 class ReportListView(LoginRequiredMixin, ListView):
     model = RoadblockReport
     template_name = "roadblocks/report_list.html"
+    template_engine = settings.REPORT_LIST_TEMPLATE_ENGINE
     context_object_name = "reports"
 
     def get_queryset(self):
-        qs = RoadblockReport.objects.all().order_by("-created_at")
         user = self.request.user
-
-        # ✅ Non-admins are limited to their state
-        if not (user.is_staff or user.is_superuser):
-            profile = getattr(user, "profile", None)
-            if not profile or not profile.state:
-                return RoadblockReport.objects.none()
-            qs = qs.filter(state__iexact=profile.state)
-
-        # ✅ Now apply the filter form (admins + users)
-        form = RoadblockFilterForm(self.request.GET)
-        if form.is_valid():
-            city = (form.cleaned_data.get("city") or "").strip()
-            severity = form.cleaned_data.get("severity") or ""
-            status = form.cleaned_data.get("status") or ""
-            verified_only = form.cleaned_data.get("verified_only") or False
-
-            if city:
-                qs = qs.filter(city__icontains=city)
-            if severity:
-                qs = qs.filter(severity=severity)
-            if status:
-                qs = qs.filter(status=status)
-            if verified_only:
-                qs = qs.filter(Q(verified=True) | Q(owner__profile__is_verified=True))
-
-        if self.request.user.is_staff or self.request.user.is_superuser:
-            return qs
-        return qs
+        profile = getattr(user, "profile", None)
+        scope = timeline_scope(user, profile, self.request.GET)
+        if scope:
+            return timelines.reports(*scope)
+        return list_reports(filter_reports(user, profile, self.request.GET))
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -216,45 +339,51 @@ class ReportListView(LoginRequiredMixin, ListView):
         profile = getattr(self.request.user, "profile", None)
         ctx["needs_location"] = (not profile or not profile.state)
 
-        # ✅ STATS BAR 
-        if profile and profile.state:
-            base_qs = RoadblockReport.objects.filter(state__iexact=profile.state)
-
-            ctx["stats"] = {
-                "total": base_qs.count(),
-                "active": base_qs.filter(status="ACTIVE").count(),
-                "resolved": base_qs.filter(status="RESOLVED").count(),
-                "trusted": base_qs.filter(Q(verified=True) | Q(owner__profile__is_verified=True)).count(),
-            }
-        else:
-            # if user has no location yet, show zeros
-            ctx["stats"] = {"total": 0, "active": 0, "resolved": 0, "trusted": 0}
+        stats = stats_querysets(profile)
+        ctx["stats"] = {key: qs.count() for key, qs in stats.items()} if stats else EMPTY_STATS
 
+        ctx["confirmed_ids"] = confirmations.confirmed_reports(self.request.user.pk).among(
+            report.pk for report in ctx["reports"]
+        )
         return ctx
 
 
 # ---------- REPORT DETAIL ----------
+def parse_comment_cursor(request):
+    try:
+        return int(request.GET.get("before") or 0) or None
+    except ValueError:
+        return None
+
+
 @login_required
+@conditional(report_etag)
 def report_detail_view(request, pk):
-    report = get_object_or_404(RoadblockReport, pk=pk)
+    from . import attachments
+
+    detail = report_cache.get_detail(pk)
+    if detail is None:
+        raise Http404("No RoadblockReport matches the given query.")
+    report = detail["report"]
 
     if request.method == "POST":
         comment_form = RoadblockCommentForm(request.POST)
         if comment_form.is_valid():
             comment = comment_form.save(commit=False)
             comment.owner = request.user
-            comment.report = report
+            comment.report_id = report.pk
             comment.save()
             return redirect("report-detail", pk=pk)
     else:
         comment_form = RoadblockCommentForm()
 
-    already_confirmed = RoadblockConfirmation.objects.filter(
-        report=report,
-        user=request.user,
-    ).exists()
+    already_confirmed = report.pk in confirmations.confirmed_reports(request.user.pk)
 
-    confirmation_count = report.confirmations.count()
+    before = parse_comment_cursor(request)
+    if before:
+        comments, next_cursor = get_comment_page(report, before=before)
+    else:
+        comments, next_cursor = detail["comments"], detail["next_cursor"]
 
     return render(
         request,
@@ -263,10 +392,30 @@ def report_detail_view(request, pk):
             "report": report,
             "comment_form": comment_form,
             "already_confirmed": already_confirmed,
-            "confirmation_count": confirmation_count,
+            "confirmation_count": report.confirmation_count,
+            "comments": comments,
+            "next_cursor": next_cursor,
+            "idempotency_key": uuid.uuid4().hex,
+            "photos": detail["attachments"],
+            "photo_form": ReportPhotoForm(),
+            "max_photos": attachments.MAX_PER_REPORT,
         },
     )
 
+
+@login_required
+def report_comments_view(request, pk):
+    report = get_object_or_404(RoadblockReport, pk=pk)
+    comments, next_cursor = get_comment_page(report, before=parse_comment_cursor(request))
+
+    html = render_to_string(
+        "roadblocks/_comment_items.html",
+        {"comments": comments},
+        request=request,
+    )
+    return JsonResponse({"html": html, "count": len(comments), "next_cursor": next_cursor})
+
+
 @login_required
 @require_POST
 def delete_comment_view(request, comment_id):
@@ -278,34 +427,60 @@ def delete_comment_view(request, comment_id):
 
     report_id = comment.report_id
     comment.delete()
+    RoadblockReport.touch(pk=report_id)
     return redirect("report-detail", pk=report_id)
 
 
+def wants_json(request):
+    return "application/json" in request.headers.get("Accept", "")
+
+
+def confirmation_response(request, payload, status=200):
+    if wants_json(request):
+        return JsonResponse(payload, status=status)
+    if status == 403:
+        return HttpResponseForbidden(payload["detail"])
+    return redirect("report-detail", pk=payload["report"])
+
+
 @login_required
+@require_POST
 def confirm_report_view(request, pk):
-    report = get_object_or_404(RoadblockReport, pk=pk)
+    key = confirmations.idempotency_key(request)
+    if (payload := confirmations.replay(key)) is not None:
+        return confirmation_response(request, payload)
+
+    report = get_object_or_404(RoadblockReport.objects.only("owner_id"), pk=pk)
     profile, _ = UserProfile.objects.get_or_create(user=request.user)
     if not profile.is_verified:
-        return HttpResponseForbidden("You must verify your account before confirming reports.")
+        return confirmation_response(
+            request, {"report": pk, "detail": "You must verify your account before confirming reports."}, 403
+        )
 
     if report.owner_id == request.user.id:
-        return HttpResponseForbidden("You cannot confirm your own report.")
-    
-    RoadblockConfirmation.objects.get_or_create(
-        report=report,
-        user=request.user,
-    )
-    return redirect("report-detail", pk=pk)
+        return confirmation_response(request, {"report": pk, "detail": "You cannot confirm your own report."}, 403)
+
+    confirmations.confirm(pk, request.user.pk)
+
+    # the stored count catches up on the next counter flush
+    payload = {"report": pk, "confirmed": True, "confirmation_count": confirmations.current_count(pk)}
+    confirmations.remember(key, payload)
+    return confirmation_response(request, payload)
 
 
 @login_required
+@require_POST
 def unconfirm_report_view(request, pk):
-    report = get_object_or_404(RoadblockReport, pk=pk)
-    RoadblockConfirmation.objects.filter(
-        report=report,
-        user=request.user,
-    ).delete()
-    return redirect("report-detail", pk=pk)
+    key = confirmations.idempotency_key(request)
+    if (payload := confirmations.replay(key)) is not None:
+        return confirmation_response(request, payload)
+
+    get_object_or_404(RoadblockReport.objects.only("pk"), pk=pk)
+    confirmations.unconfirm(pk, request.user.pk)
+
+    payload = {"report": pk, "confirmed": False, "confirmation_count": confirmations.current_count(pk)}
+    confirmations.remember(key, payload)
+    return confirmation_response(request, payload)
 
 
 # ---------- CRUD ----------
@@ -320,7 +495,7 @@ class ReportCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class ReportUpdateView(LoginRequiredMixin, OwnerOnlyMixin, UpdateView):
+class ReportUpdateView(LoginRequiredMixin, OwnerOnlyMixin, AuditedUpdateMixin, UpdateView):
     model = RoadblockReport
     form_class = RoadblockReportForm
     template_name = "roadblocks/report_form.html"
@@ -332,8 +507,13 @@ class ReportDeleteView(LoginRequiredMixin, OwnerOnlyMixin, DeleteView):
     template_name = "roadblocks/report_confirm_delete.html"
     success_url = reverse_lazy("report-list")
 
+    def form_valid(self, form):
+        audit.record(self.object, self.request.user, "DELETE", audit.deleted_changes(self.object))
+        return super().form_valid(form)
+
 
 # ---------- MODERATION ----------
+@conditional_method(all_reports_etag)
 class ModerationDashboardView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
     permission_required = "roadblocks.can_view_moderation"
     model = RoadblockReport
@@ -341,7 +521,21 @@ class ModerationDashboardView(LoginRequiredMixin, PermissionRequiredMixin, ListV
     context_object_name = "reports"
 
     def get_queryset(self):
-        return RoadblockReport.objects.all().order_by("status", "-created_at")
+        # flagged reports (app/escalation.py) first within each status, then
+        # unverified ones by priority score (app/scoring.py); with sharding
+        # on, every shard is queried at once and the rows merged
+        return sharding.gather(
+            RoadblockReport.objects.all().order_by(
+                "status", "-needs_review", "verified", "-priority_score", "-created_at"
+            ),
+            key=lambda report: (
+                report.status,
+                not report.needs_review,
+                report.verified,
+                -report.priority_score,
+                -report.created_at.timestamp(),
+            ),
+        )
 
 
 @login_required
@@ -350,8 +544,14 @@ def verify_report_view(request, pk):
     if not request.user.has_perm("roadblocks.can_verify_report"):
         return redirect("report-list")
 
+    was_verified = report.verified
     report.verified = True
+    report.needs_review = False
     report.save()
+    if not was_verified:
+        metrics.VERIFICATIONS.inc()
+        record_report_event(report, "VERIFIED")
+        audit.record(report, request.user, "VERIFY", {"verified": [False, True]})
     return redirect("mod-dashboard")
 
 
@@ -361,12 +561,17 @@ def resolve_report_view(request, pk):
     if not request.user.has_perm("roadblocks.can_resolve_report"):
         return redirect("report-list")
 
+    old_status = report.status
     report.status = "RESOLVED"
+    report.needs_review = False
     report.save()
+    if old_status != "RESOLVED":
+        audit.record(report, request.user, "RESOLVE", {"status": [old_status, "RESOLVED"]})
     return redirect("mod-dashboard")
 
 # ✅ NEW: MODERATION EDIT (admin can edit any report)
-class ModerationReportUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
+@conditional_method(report_etag)
+class ModerationReportUpdateView(LoginRequiredMixin, PermissionRequiredMixin, AuditedUpdateMixin, UpdateView):
     permission_required = "app.change_roadblockreport"
     model = RoadblockReport
     form_class = RoadblockReportForm
@@ -382,5 +587,170 @@ class ModerationReportUpdateView(LoginRequiredMixin, PermissionRequiredMixin, Up
 @permission_required("app.delete_roadblockreport", raise_exception=True)
 def delete_report_view(request, pk):
     report = get_object_or_404(RoadblockReport, pk=pk)
+    audit.record(report, request.user, "DELETE", audit.deleted_changes(report))
     report.delete()
-    return redirect("mod-dashboard")
\ No newline at end of file
+    return redirect("mod-dashboard")
+
+
+# ---------- AUDIT HISTORY ----------
+def report_revisions(pk):
+    return ReportRevision.objects.filter(report_id=pk).select_related("actor").order_by("-ts", "-id")
+
+
+@login_required
+@permission_required("app.can_view_moderation", raise_exception=True)
+@conditional(report_history_etag)
+def report_history_view(request, pk):
+    return render(
+        request,
+        "roadblocks/report_history.html",
+        {
+            "report": RoadblockReport.objects.filter(pk=pk).first(),
+            "report_id": pk,
+            "revisions": report_revisions(pk),
+        },
+    )
+
+
+@api_login_required
+@permission_required("app.can_view_moderation", raise_exception=True)
+@conditional(report_history_etag)
+def api_report_history(request, pk):
+    revisions = [
+        {
+            "id": rev.id,
+            "action": rev.action,
+            "actor": rev.actor.username if rev.actor else None,
+            "changes": rev.changes,
+            "ts": rev.ts.isoformat(),
+        }
+        for rev in report_revisions(pk)
+    ]
+    return JsonResponse({"report_id": pk, "revisions": revisions})
+
+
+# ---------- ROADS ----------
+ROAD_REPORT_FIELDS = ["id", "title", "road_id", "road_name", "city", "state", "severity", "confirmation_count", "created_at"]
+ROAD_REPORTS_LIMIT = 500
+
+
+@api_login_required
+def api_roads(request):
+    # canonical roads for a picker: ?q=interstate 5 matches I-5, I-55, ...
+    q = request.GET.get("q", "").strip()
+    qs = Road.objects.order_by("name")
+    if q:
+        qs = qs.filter(Q(name__startswith=roads.canonical(q)) | Q(aliases__key__startswith=roads.spelling(q))).distinct()
+    return JsonResponse({"roads": [{"id": road.id, "name": road.name} for road in qs[:50]]})
+
+
+@api_login_required
+def api_road_reports(request):
+    # Active roadblocks along one or more roads, across cities and states:
+    # ?road=I-55&road=US 49[&state=MS&state=TN]. One query on the
+    # (road, state, status) index per shard the states live on.
+    names = request.GET.getlist("road")
+    if not names:
+        return JsonResponse({"error": "Pass at least one road."}, status=400)
+    states = sorted({state.strip().upper() for state in request.GET.getlist("state") if state.strip()})
+
+    road_ids = roads.road_ids(names)
+    qs = RoadblockReport.objects.filter(road_id__in=road_ids, status="ACTIVE")
+    if states:
+        qs = qs.filter(state__in=states)
+        if len({sharding.shard_for_state(state) for state in states}) == 1:
+            qs = qs.for_state(states[0])
+    qs = qs.order_by("-created_at").values(*ROAD_REPORT_FIELDS)[:ROAD_REPORTS_LIMIT]
+
+    rows = sharding.gather(qs, key=itemgetter("created_at"), reverse=True)[:ROAD_REPORTS_LIMIT]
+    names_by_id = dict(Road.objects.filter(pk__in=road_ids).values_list("id", "name"))
+    reports = []
+    for row in rows:
+        row["road"] = names_by_id.get(row.pop("road_id"))
+        row["created_at"] = row["created_at"].isoformat()
+        row["url"] = reverse("report-detail", args=[row["id"]])
+        reports.append(row)
+    return JsonResponse({"roads": sorted(names_by_id.values()), "states": states, "reports": reports})
+
+
+# ---------- PHOTOS ----------
+# app.attachments is imported by the photo views themselves, so the api role
+# (config/urls_prod.py), which serves none of them, never loads it
+@login_required
+@require_POST
+def upload_photo_view(request, pk):
+    # request.FILES comes from attachments.HashingUploadHandler: already on
+    # disk and hashed by the time this runs
+    from . import attachments
+
+    report = get_object_or_404(RoadblockReport.objects.only("owner_id"), pk=pk)
+    if report.owner_id != request.user.id:
+        return HttpResponseForbidden("You can only add photos to your own report.")
+
+    form = ReportPhotoForm(request.POST, request.FILES, report=report)
+    if not form.is_valid():
+        return HttpResponseBadRequest(" ".join(form.errors.get("photo", ["Invalid upload."])))
+    attachments.attach(report, request.user, form.cleaned_data["photo"], *form.kind)
+    return redirect("report-detail", pk=pk)
+
+
+@login_required
+@require_POST
+def delete_photo_view(request, pk):
+    from . import attachments
+
+    attachment = get_object_or_404(ReportAttachment.objects.only("report_id", "owner_id"), pk=pk)
+    if attachment.owner_id != request.user.id:
+        return HttpResponseForbidden("You can only delete your own photos.")
+
+    attachments.detach(attachment)
+    return redirect("report-detail", pk=attachment.report_id)
+
+
+PHOTO_FIELDS = ["file", "thumbnail", "content_hash", "content_type"]
+
+
+@login_required
+def photo_view(request, pk):
+    from . import attachments
+
+    attachment = get_object_or_404(ReportAttachment.objects.only(*PHOTO_FIELDS), pk=pk)
+    return attachments.serve(request, attachment.file.name, attachment.content_type, attachment.content_hash)
+
+
+@login_required
+def photo_thumbnail_view(request, pk):
+    from . import attachments
+
+    attachment = get_object_or_404(ReportAttachment.objects.only(*PHOTO_FIELDS), pk=pk)
+    if not attachment.thumbnail:
+        raise Http404("No thumbnail yet.")
+    return attachments.serve(request, attachment.thumbnail.name, "image/jpeg", attachment.content_hash + "-thumbnail")
+
+
+# ---------- PROFILES ----------
+@login_required
+@permission_required("app.can_view_moderation", raise_exception=True)
+def request_profiles_view(request):
+    profiles = RequestProfile.objects.select_related("user").defer("report", "slow_queries")[:100]
+    return render(request, "roadblocks/request_profiles.html", {"profiles": profiles})
+
+
+@login_required
+@permission_required("app.can_view_moderation", raise_exception=True)
+def request_profile_detail_view(request, pk):
+    profile = get_object_or_404(RequestProfile.objects.select_related("user"), pk=pk)
+    return render(request, "roadblocks/request_profile_detail.html", {"profile": profile})
+
+
+# ---------- METRICS ----------
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}")
+    else:
+        allowed = request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+    if not allowed:
+        return HttpResponseForbidden("Forbidden")
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
@@ -0,0 +1,48 @@
+# Shared bootstrap for the scripts in this folder: puts the project on the
+# path and runs everything against a throwaway test database, never db.sqlite3.
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+
+def setup():
+    import django
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def seed_reports(n, state="MS", city="Jackson", username="bench"):
+    from django.contrib.auth.models import User
+    from app.models import RoadblockReport, UserProfile
+
+    user, created = User.objects.get_or_create(username=username)
+    if created:
+        user.set_password("bench")
+        user.save()
+    UserProfile.objects.filter(user=user).update(state=state, city=city, email=f"{username}@example.com")
+
+    reports = [
+        RoadblockReport(
+            owner=user,
+            title=f"Closure {i}",
+            description="Lane closed for repairs. " * 4,
+            road_name=["I-55", "I-20", "US-49", "Highway 80"][i % 4],
+            nearby_place="Exit 96" if i % 3 else "",
+            city=city,
+            state=state,
+            severity=["LOW", "MED", "HIGH"][i % 3],
+            status="ACTIVE" if i % 5 else "RESOLVED",
+        )
+        for i in range(n)
+    ]
+    for report in reports:
+        report.maps_url = report.build_maps_url()  # bulk_create skips save()
+    RoadblockReport.objects.bulk_create(reports)
+    return user
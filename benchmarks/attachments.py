@@ -0,0 +1,179 @@
+# Report photos (app/attachments.py) on generated camera-sized JPEGs:
+#  - memory and time to parse one upload with Django's default handlers plus
+#    a second pass to hash it, vs. HashingUploadHandler
+#  - a thumbnail per photo with and without JPEG draft decoding, and the
+#    make_thumbnail task run by 1, 2 and 4 worker threads
+#  - bytes a list page of photo reports loads, thumbnails vs. originals
+#  - one Range request for the tail of a photo vs. the whole file
+#
+#   python benchmarks/attachments.py [photos] [megapixels]
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import _setup
+
+_setup.setup()
+
+from django.conf import settings
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+
+from app import attachments
+from app.models import ReportAttachment, RoadblockReport
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    sys.exit("This benchmark needs Pillow to generate photos.")
+
+
+def photo(megapixels, seed):
+    # noise compresses like a real photo, unlike a flat colour
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    noise = Image.effect_noise((width // 8, height // 8), 60 + seed).resize((width, height))
+    image = Image.merge("RGB", [noise, noise.rotate(90, expand=False), noise.transpose(Image.FLIP_LEFT_RIGHT)])
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def parse(data, handlers):
+    upload = io.BytesIO(data)
+    upload.name = "photo.jpg"
+    request = RequestFactory().post("/", {"photo": upload})
+    request.upload_handlers = [handler(request) for handler in handlers]
+    tracemalloc.start()
+    start = time.perf_counter()
+    photo_file = request.FILES["photo"]
+    digest = attachments.content_hash(photo_file)
+    elapsed = (time.perf_counter() - start) * 1000
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert digest == hashlib.sha256(data).hexdigest()
+    return peak, elapsed
+
+
+def uploads(photos):
+    # Django keeps uploads under FILE_UPLOAD_MAX_MEMORY_SIZE (2.5 MiB) in memory
+    print(f"{'one upload':24}{'MiB':>10}{'peak MiB':>10}{'ms':>8}")
+    for data in photos:
+        for name, handlers in [
+            ("default + hash", [MemoryFileUploadHandler, TemporaryFileUploadHandler]),
+            ("HashingUploadHandler", [attachments.HashingUploadHandler]),
+        ]:
+            peak, ms = parse(data, handlers)
+            print(f"{name:24}{len(data) / 2**20:>10.1f}{peak / 2**20:>10.2f}{ms:>8.1f}")
+
+
+def naive_thumbnail(data):
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((attachments.THUMBNAIL_SIZE, attachments.THUMBNAIL_SIZE))
+        out = io.BytesIO()
+        image.convert("RGB").save(out, "JPEG", quality=attachments.THUMBNAIL_QUALITY)
+        return out.getvalue()
+
+
+def draft_thumbnail(data):
+    with Image.open(io.BytesIO(data)) as image:
+        return attachments.render_thumbnail(image)
+
+
+def thumbnails(photos):
+    print(f"\n{'thumbnail, ' + str(len(photos)) + ' photos':34}{'ms each':>10}{'KiB':>8}")
+    for name, fn in [("full decode", naive_thumbnail), ("draft decode", draft_thumbnail)]:
+        start = time.perf_counter()
+        sizes = [len(fn(data)) for data in photos]
+        ms = (time.perf_counter() - start) * 1000 / len(photos)
+        print(f"{name:34}{ms:>10.1f}{sum(sizes) / len(sizes) / 1024:>8.1f}")
+
+
+def workers(client, report, photos):
+    # Pillow releases the GIL while decoding and resizing; threads only
+    # help with more than one core
+    print(f"\n{'make_thumbnail tasks, ' + str(os.cpu_count()) + ' CPUs':34}{'threads':>10}{'ms':>8}")
+    for threads in (1, 2, 4):
+        ReportAttachment.objects.all().delete()
+        RoadblockReport.objects.update(cover=None)
+        for data in photos:
+            upload = io.BytesIO(data)
+            upload.name = "photo.jpg"
+            client.post(reverse("photo-upload", args=[report.pk]), {"photo": upload})
+        # thumbnails are content-addressed too; start each round from none
+        storage = attachments.attachment_storage()
+        for attachment in ReportAttachment.objects.all():
+            storage.delete(attachments.thumbnail_name(attachment.content_hash))
+        ids = list(ReportAttachment.objects.values_list("pk", flat=True))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(attachments.build_thumbnail, ids))
+        print(f"{'':34}{threads:>10}{(time.perf_counter() - start) * 1000:>8.0f}")
+
+
+def page_bytes(client, photos, n_reports):
+    ReportAttachment.objects.all().delete()
+    RoadblockReport.objects.update(cover=None)
+    user = _setup.seed_reports(n_reports - 1)
+    for i, report in enumerate(RoadblockReport.objects.filter(owner=user).order_by("id")):
+        upload = io.BytesIO(photos[i % len(photos)])
+        upload.name = "photo.jpg"
+        client.post(reverse("photo-upload", args=[report.pk]), {"photo": upload})
+    for attachment_id in ReportAttachment.objects.filter(thumbnail="").values_list("pk", flat=True):
+        attachments.build_thumbnail(attachment_id)
+
+    covers = list(RoadblockReport.objects.exclude(cover=None).values_list("cover", flat=True))
+    html = client.get("/").content.decode()
+    thumbs = [reverse("photo-thumbnail", args=[pk]) for pk in covers if reverse("photo-thumbnail", args=[pk]) in html]
+    thumb_bytes = sum(len(b"".join(client.get(url).streaming_content)) for url in thumbs)
+    original_bytes = sum(ReportAttachment.objects.filter(pk__in=covers).values_list("size", flat=True))
+    stored = ReportAttachment.objects.values("content_hash").distinct().count()
+    print(f"\nlist page, {len(thumbs)} reports with photos")
+    print(
+        f"  images loaded: {thumb_bytes / 2**10:.0f} KiB of thumbnails, the originals are {original_bytes / 2**20:.1f} MiB"
+    )
+    print(f"  {ReportAttachment.objects.count()} attachments, {stored} files stored")
+
+
+def ranges(client, iterations=50):
+    attachment = ReportAttachment.objects.order_by("-size").first()
+    url = reverse("photo", args=[attachment.pk])
+    print(f"\n{'GET one ' + format(attachment.size / 2**20, '.1f') + ' MiB photo':34}{'bytes':>10}{'ms':>8}")
+    for name, headers in [("whole file", {}), ("Range: last 64 KiB", {"HTTP_RANGE": "bytes=-65536"})]:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            body = b"".join(client.get(url, **headers).streaming_content)
+        print(f"{name:34}{len(body):>10}{(time.perf_counter() - start) * 1000 / iterations:>8.2f}")
+
+
+def run(n_photos=8, megapixels=12):
+    photos = [photo(megapixels, seed) for seed in range(n_photos)]
+    uploads([photo(megapixels / 2, 0), photos[0]])
+    thumbnails(photos)
+
+    with tempfile.TemporaryDirectory() as root, override_settings(
+        STORAGES={
+            **settings.STORAGES,
+            "attachments": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": root}},
+        },
+        TASKS_EAGER=False,
+    ):
+        user = _setup.seed_reports(1)
+        report = RoadblockReport.objects.filter(owner=user).first()
+        client = Client()
+        client.login(username="bench", password="bench")
+        workers(client, report, photos)
+        page_bytes(client, photos, 20)
+        ranges(client)
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,52 @@
+# Bytes and latency for report-list / report-detail: a plain full render,
+# the same page gzip-compressed, and a conditional revalidation (304).
+#
+#   python benchmarks/conditional_get.py [reports] [iterations]
+import sys
+import time
+
+import _setup
+
+_setup.setup()
+
+from django.test import Client
+
+from app.models import RoadblockComment, RoadblockReport
+
+
+def measure(client, url, iterations, **headers):
+    response = client.get(url, **headers)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        response = client.get(url, **headers)
+    elapsed = (time.perf_counter() - start) / iterations * 1000
+    return response, len(response.content), elapsed
+
+
+def run(n_reports=200, iterations=50):
+    user = _setup.seed_reports(n_reports)
+    report = RoadblockReport.objects.order_by("id").first()
+    RoadblockComment.objects.bulk_create(
+        RoadblockComment(report=report, owner=user, text=f"Still closed at {i}") for i in range(60)
+    )
+
+    client = Client()
+    client.login(username="bench", password="bench")
+
+    print(f"{n_reports} reports, {iterations} iterations per row\n")
+    print(f"{'page':16}{'mode':12}{'status':>8}{'bytes':>10}{'ms/req':>10}")
+    for name, url in [("report-list", "/"), ("report-detail", f"/report/{report.pk}/")]:
+        full, size, ms = measure(client, url, iterations)
+        print(f"{name:16}{'identity':12}{full.status_code:>8}{size:>10}{ms:>10.2f}")
+
+        gz, size, ms = measure(client, url, iterations, HTTP_ACCEPT_ENCODING="gzip")
+        print(f"{name:16}{'gzip':12}{gz.status_code:>8}{size:>10}{ms:>10.2f}")
+
+        not_modified, size, ms = measure(
+            client, url, iterations, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=gz["ETag"]
+        )
+        print(f"{name:16}{'304':12}{not_modified.status_code:>8}{size:>10}{ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:3]])
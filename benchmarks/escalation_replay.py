@@ -0,0 +1,92 @@
+# Replays a burst of confirmations through the escalation engine
+# (app/escalation.py): first the bare in-memory engine on a synthetic stream,
+# then the same stream written to the confirmation table and read back the way
+# run_escalation reads it, counting the SQL that takes.
+#
+#   python benchmarks/escalation_replay.py [confirmations] [reports]
+import random
+import sys
+import time
+
+import _setup
+
+_setup.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from app import escalation
+from app.models import ReportRevision, RoadblockConfirmation, RoadblockReport
+
+RATE = 2000  # confirmations per second in the synthetic stream
+
+
+def synthetic_stream(n, report_ids, user_ids, seed=42):
+    # a handful of hot reports take most of the traffic
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** 1.2 for rank in range(len(report_ids))]
+    seen = set()
+    start = time.time() - n / RATE
+    stream = []
+    for i, report_id in enumerate(rng.choices(report_ids, weights, k=n)):
+        user_id = rng.choice(user_ids)
+        if (report_id, user_id) not in seen:
+            seen.add((report_id, user_id))
+            stream.append((report_id, user_id, start + i / RATE))
+    return stream
+
+
+def replay_in_memory(stream):
+    engine = escalation.EscalationEngine()
+    start = time.perf_counter()
+    for report_id, user_id, ts in stream:
+        engine.observe(report_id, user_id, ts)
+    elapsed = time.perf_counter() - start
+    escalate, review = engine.take()
+    return elapsed, escalate, review
+
+
+def replay_from_table(stream):
+    RoadblockConfirmation.objects.bulk_create(
+        [RoadblockConfirmation(report_id=report_id, user_id=user_id) for report_id, user_id, _ in stream],
+        batch_size=2000,
+    )
+    engine = escalation.EscalationEngine()
+    feed = escalation.ConfirmationFeed(since=RoadblockReport.objects.order_by("created_at").first().created_at)
+
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        observed = 0
+        while rows := feed.read():
+            for _, report_id, user_id, created_at in rows:
+                engine.observe(report_id, user_id, created_at.timestamp())
+            observed += len(rows)
+        read_elapsed = time.perf_counter() - start
+        read_queries = len(queries)
+        changed = escalation.flush(engine)
+    return observed, read_elapsed, read_queries, len(queries) - read_queries, changed
+
+
+def run(n=100_000, n_reports=500):
+    owner = _setup.seed_reports(n_reports)
+    User.objects.bulk_create(User(username=f"confirmer{i}", password="!") for i in range(2000))
+    user_ids = list(User.objects.exclude(pk=owner.pk).values_list("pk", flat=True))
+    report_ids = list(RoadblockReport.objects.order_by("pk").values_list("pk", flat=True))
+    stream = synthetic_stream(n, report_ids, user_ids)
+
+    print(f"{len(stream)} confirmations on {n_reports} reports, thresholds {escalation.THRESHOLDS}")
+    print(f"review at {escalation.REVIEW_THRESHOLD}, window {escalation.WINDOW}s\n")
+
+    elapsed, escalate, review = replay_in_memory(stream)
+    print(f"in memory   {len(stream) / elapsed:12,.0f} confirmations/s   {elapsed * 1000:8.1f} ms")
+    print(f"            {len(escalate)} escalations and {len(review)} review flags queued")
+
+    observed, elapsed, reads, writes, changed = replay_from_table(stream)
+    print(f"from table  {observed / elapsed:12,.0f} confirmations/s   {elapsed * 1000:8.1f} ms")
+    print(f"            {reads} SELECTs to read {observed} rows, {writes} queries to persist {changed} changes")
+    print(f"            {ReportRevision.objects.filter(action='ESCALATE').count()} ESCALATE revisions")
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,80 @@
+# Cold-start cost of a web worker: a fresh interpreter imports config.wsgi
+# (which runs django.setup()) and loads the URLconf, as the first request
+# would. Each configuration runs in its own subprocess. The median wall time is
+# reported with the packages that spend the most time importing, taken from
+# `python -X importtime`.
+# No database is touched.
+#
+#   python benchmarks/import_time.py [runs]
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = [
+    ("config.settings", None),
+    ("config.settings_prod", "all"),
+    ("config.settings_prod", "html"),
+    ("config.settings_prod", "api"),
+]
+
+PROBE = """
+import time
+start = time.perf_counter()
+import config.wsgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(time.perf_counter() - start)
+"""
+
+
+def env_for(settings_module, role):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+    env.pop("RETEN_ROLE", None)
+    if role:
+        env["RETEN_ROLE"] = role
+        env.setdefault("RETEN_ALLOWED_HOSTS", "localhost")
+    return env
+
+
+def wall_time(env):
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def package(module):
+    parts = module.split(".")
+    return ".".join(parts[:3] if parts[:2] == ["django", "contrib"] else parts[:2])
+
+
+def slowest_packages(env, top=8):
+    # self time summed per package, so nesting order doesn't matter
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    totals = {}
+    for line in out.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+\d+ \| *(\S+)", line)
+        if match:
+            name = package(match.group(2))
+            totals[name] = totals.get(name, 0) + int(match.group(1))
+    return sorted(((micros, name) for name, micros in totals.items()), reverse=True)[:top]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 11
+    for settings_module, role in PROFILES:
+        env = env_for(settings_module, role)
+        wall_time(env)  # warm the bytecode and OS caches
+        times = [wall_time(env) for _ in range(runs)]
+        label = settings_module + (f" RETEN_ROLE={role}" if role else "")
+        print(f"{label:40} median {statistics.median(times) * 1000:6.1f} ms  min {min(times) * 1000:6.1f} ms")
+        for micros, name in slowest_packages(env):
+            print(f"    {micros / 1000:6.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
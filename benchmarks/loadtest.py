@@ -0,0 +1,121 @@
+# Closed-loop HTTP load test for comparing the sync (WSGI) and async (ASGI)
+# deployments at high concurrency. Point it at a running server, e.g.
+#
+#   gunicorn config.wsgi -w 4 --threads 8 -b 127.0.0.1:8000
+#   RETEN_ASYNC_VIEWS=1 uvicorn config.asgi:application --workers 4 --port 8001
+#
+#   python benchmarks/loadtest.py http://127.0.0.1:8000/ --username bench --password bench
+#   python benchmarks/loadtest.py http://127.0.0.1:8001/ --username bench --password bench
+#
+# Only the standard library is used, so it runs anywhere the server does.
+import argparse
+import asyncio
+import http.cookiejar
+import re
+import statistics
+import time
+import urllib.parse
+import urllib.request
+
+
+def login(base, username, password):
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    login_url = urllib.parse.urljoin(base, "/accounts/login/")
+
+    page = opener.open(login_url).read().decode()
+    token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page).group(1)
+    data = urllib.parse.urlencode(
+        {"username": username, "password": password, "csrfmiddlewaretoken": token}
+    ).encode()
+    opener.open(urllib.request.Request(login_url, data=data, headers={"Referer": login_url}))
+
+    cookies = {cookie.name: cookie.value for cookie in jar}
+    if "sessionid" not in cookies:
+        raise SystemExit("login failed")
+    return "; ".join(f"{name}={value}" for name, value in cookies.items())
+
+
+async def worker(url, cookie, deadline_count, latencies, errors):
+    parts = urllib.parse.urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nCookie: {cookie}\r\n"
+        f"Accept-Encoding: gzip\r\nConnection: keep-alive\r\n\r\n"
+    ).encode()
+
+    reader = writer = None
+    while deadline_count():
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.decode().partition(":")
+                headers[name.strip().lower()] = value.strip()
+            await reader.readexactly(int(headers.get("content-length", 0)))
+            latencies.append(time.perf_counter() - start)
+
+            if not status_line.split()[1].startswith(b"2"):
+                errors.append(status_line.decode().strip())
+            if headers.get("connection", "").lower() == "close":
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, IndexError) as exc:
+            errors.append(repr(exc))
+            if writer is not None:
+                writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run(url, cookie, concurrency, total):
+    latencies, errors = [], []
+    issued = 0
+
+    def take():
+        nonlocal issued
+        issued += 1
+        return issued <= total
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(url, cookie, take, latencies, errors) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("url")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    cookie = login(args.url, args.username, args.password)
+    latencies, errors, elapsed = asyncio.run(run(args.url, cookie, args.concurrency, args.requests))
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000  # noqa: E731
+    print(f"{args.url}  concurrency={args.concurrency}  requests={len(latencies)}  errors={len(errors)}")
+    print(f"throughput: {len(latencies) / elapsed:.1f} req/s")
+    if latencies:
+        print(
+            f"latency ms: mean {statistics.mean(latencies) * 1000:.1f}  p50 {pct(0.50):.1f}  "
+            f"p95 {pct(0.95):.1f}  p99 {pct(0.99):.1f}"
+        )
+    if errors:
+        print("first errors:", errors[:3])
+
+
+if __name__ == "__main__":
+    main()
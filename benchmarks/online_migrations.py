@@ -0,0 +1,142 @@
+# The large-table migration tooling (app/online_migrations.py and
+# app/backfills.py) against a generated report table: which synthetic
+# migrations the safety check flags, how long an online index build takes,
+# and the backfills run in throttled batches, stopped halfway and resumed,
+# with the longest single batch (the longest any row stays locked).
+#
+#   python benchmarks/online_migrations.py [reports] [batch]
+import sys
+import time
+
+import _setup
+
+_setup.setup()
+
+from django.db import connection, migrations, models
+from django.db.migrations.loader import MigrationLoader
+
+from app import backfills, online_migrations
+from app.models import BackfillProgress, RoadblockReport
+
+
+def migration(name, operations, atomic=True):
+    m = migrations.Migration(name, "app")
+    m.operations, m.atomic = operations, atomic
+    return m
+
+
+def check(n_reports):
+    state = MigrationLoader(connection).project_state()
+    cases = [
+        ("AddIndex", [migrations.AddIndex("roadblockreport", models.Index(fields=["title"], name="bench_title_idx"))]),
+        (
+            "AddIndexConcurrently",
+            [
+                online_migrations.AddIndexConcurrently(
+                    "roadblockreport", models.Index(fields=["title"], name="bench_title_idx")
+                )
+            ],
+        ),
+        (
+            "AlterField max_length",
+            [migrations.AlterField("roadblockreport", "title", models.CharField(max_length=300))],
+        ),
+        (
+            "AlterFieldToText",
+            [online_migrations.AlterFieldToText("roadblockreport", "title", models.TextField())],
+        ),
+        ("AddField nullable", [migrations.AddField("roadblockreport", "bench", models.IntegerField(null=True))]),
+        ("AddField default=0", [migrations.AddField("roadblockreport", "bench", models.IntegerField(default=0))]),
+        (
+            "AddField db_default",
+            [
+                migrations.AddField(
+                    "roadblockreport", "bench", models.IntegerField(null=True, db_default=models.Value(0))
+                )
+            ],
+        ),
+        (
+            "AddField + RunPython",
+            [
+                migrations.AddField("roadblockreport", "bench", models.IntegerField(null=True)),
+                migrations.RunPython(migrations.RunPython.noop),
+            ],
+        ),
+    ]
+    print(f"{n_reports} reports, safety check at {online_migrations.MIN_ROWS} rows\n")
+    print(f"{'migration':26}{'verdict':9}{'ms':>8}")
+    for name, operations in cases:
+        start = time.perf_counter()
+        problems = online_migrations.migration_problems(connection, migration("9999_bench", operations), state)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{name:26}{'refused' if problems else 'ok':9}{elapsed:>8.1f}")
+        for _, table, reason in problems:
+            print(f"{'':4}{table}: {reason}")
+
+
+def index_build():
+    state = MigrationLoader(connection).project_state()
+    index = models.Index(fields=["title"], name="bench_title_idx")
+    op = online_migrations.AddIndexConcurrently("roadblockreport", index)
+    new_state = state.clone()
+    op.state_forwards("app", new_state)
+    with connection.schema_editor(atomic=False) as schema_editor:
+        start = time.perf_counter()
+        op.database_forwards("app", schema_editor, state, new_state)
+        built = time.perf_counter() - start
+        op.database_backwards("app", schema_editor, new_state, state)
+    print(f"\n{op.describe()} ({connection.vendor}): {built:.2f}s")
+
+
+def backfill(name, batch):
+    timings = []
+    target = backfills.REGISTRY[name]
+    apply = target.apply
+
+    def timed(qs, pks):
+        start = time.perf_counter()
+        try:
+            return apply(qs, pks)
+        finally:
+            timings.append(time.perf_counter() - start)
+
+    target.apply = timed
+    try:
+        start = time.perf_counter()
+        first = backfills.run(name, batch=batch, sleep=0, duty=1, max_batches=20, restart=True)
+        done = backfills.run(name, batch=batch, sleep=0, duty=1)
+        elapsed = time.perf_counter() - start
+    finally:
+        target.apply = apply
+    progress = BackfillProgress.objects.get(name=name, database="default")
+    print(
+        f"{name:28}{progress.rows:>8}{progress.batches:>8}{elapsed:>8.2f}{max(timings) * 1000:>9.1f}"
+        f"{'  resumed' if not first and done else ''}"
+    )
+
+
+def duty(batch, batches=10):
+    # the same batches throttled to half the wall clock
+    start = time.perf_counter()
+    backfills.run("report_display_fields", batch=batch, sleep=0, duty=0.5, max_batches=batches, restart=True)
+    print(f"\n{batches} batches at duty 0.5: {time.perf_counter() - start:.2f}s wall clock")
+
+
+def run(n_reports=200_000, batch=1000):
+    _setup.seed_reports(n_reports)
+    check(n_reports)
+    index_build()
+
+    # leave something for each backfill to do
+    RoadblockReport.objects.update(road=None)
+    RoadblockReport.objects.filter(pk__lt=n_reports // 2).update(trust_level="ADMIN")
+    RoadblockReport.objects.filter(pk__lt=n_reports // 10).update(confirmation_count=3)
+
+    print(f"\n{'backfill, batch ' + str(batch):28}{'rows':>8}{'batches':>8}{'s':>8}{'max ms':>9}")
+    for name in backfills.REGISTRY:
+        backfill(name, batch)
+    duty(batch)
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,61 @@
+# The home-page report list with and without fan-out-on-write timelines
+# (app/timelines.py): the filtered query per request, the same query capped
+# at the timeline length, and the timeline read plus in_bulk() hydration.
+# Then the whole page both ways, with the SQL each one runs.
+#
+#   python benchmarks/report_timelines.py [reports] [iterations]
+import sys
+import time
+
+import _setup
+
+_setup.setup()
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from app import timelines
+from app.models import UserProfile
+from app.views import filter_reports
+
+
+def measure(fn, iterations):
+    fn()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            rows = fn()
+        elapsed = (time.perf_counter() - start) / iterations * 1000
+    return len(rows), len(queries) / iterations, elapsed
+
+
+def run(n_reports=5000, iterations=50):
+    user = _setup.seed_reports(n_reports)
+    profile = UserProfile.objects.get(user=user)
+    cache.clear()
+
+    print(f"{n_reports} reports in {profile.state}, timeline length {timelines.LENGTH}, {iterations} iterations\n")
+    print(f"{'path':34}{'rows':>7}{'queries':>9}{'ms':>9}")
+    for name, fn in [
+        ("query, every row", lambda: list(filter_reports(user, profile, {}))),
+        ("query, newest LENGTH", lambda: list(filter_reports(user, profile, {})[: timelines.LENGTH])),
+        ("timeline + in_bulk", lambda: timelines.reports(profile.state)),
+        ("timeline + in_bulk, one city", lambda: timelines.reports(profile.state, profile.city)),
+    ]:
+        rows, queries, ms = measure(fn, iterations)
+        print(f"{name:34}{rows:>7}{queries:>9.1f}{ms:>9.2f}")
+
+    client = Client()
+    client.login(username="bench", password="bench")
+    print(f"\n{'GET /':34}{'bytes':>7}{'queries':>9}{'ms':>9}")
+    for enabled in (False, True):
+        timelines.ENABLED = enabled
+        _, queries, ms = measure(lambda: [client.get("/")], iterations)
+        size = len(client.get("/").content)
+        print(f"{'timelines ' + ('on' if enabled else 'off'):34}{size:>7}{queries:>9.1f}{ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:3]])
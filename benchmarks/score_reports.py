@@ -0,0 +1,83 @@
+# Times the moderation scoring job (app/scoring.py) on a synthetic backlog of
+# unverified reports from many reporters: one full pass that writes every
+# score, then a second pass where nothing has moved and nothing is written.
+#
+#   python benchmarks/score_reports.py [reports] [reporters]
+import random
+import sys
+import time
+
+import _setup
+
+_setup.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from app import scoring
+from app.models import RoadblockReport, UserProfile
+
+DESCRIPTIONS = [
+    "Lane closed for repairs, expect a detour.",
+    "Accident blocking the right lane near the exit. Police on scene, traffic backed up about a mile.",
+    "flooded",
+    "test test",
+    "Construction crew has the road down to one lane until Friday evening.",
+    "Debris in the road.",
+]
+
+
+def seed(n, n_owners, seed=7):
+    rng = random.Random(seed)
+    User.objects.bulk_create(User(username=f"reporter{i}", password="!") for i in range(n_owners))
+    owners = list(User.objects.values_list("pk", flat=True))
+    # bulk_create skips the signal that creates profiles
+    UserProfile.objects.bulk_create(UserProfile(user_id=pk, is_verified=True) for pk in owners[::4])
+
+    batch = []
+    for i in range(n):
+        batch.append(
+            RoadblockReport(
+                owner_id=rng.choice(owners),
+                title=f"Report {i}",
+                description=rng.choice(DESCRIPTIONS),
+                road_name="I-55",
+                city="Jackson",
+                state="MS",
+                verified=rng.random() < 0.3,
+                status="ACTIVE" if rng.random() < 0.8 else "RESOLVED",
+                confirmation_count=int(rng.expovariate(0.3)),
+            )
+        )
+        if len(batch) == 10_000:
+            RoadblockReport.objects.bulk_create(batch)
+            batch = []
+    RoadblockReport.objects.bulk_create(batch)
+
+
+def timed(label, **kwargs):
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        scored, changed = scoring.score_reports(**kwargs)
+        elapsed = time.perf_counter() - start
+    print(f"{label:14}{scored:>10}{changed:>10}{len(queries):>9}{elapsed:>10.2f}s{scored / elapsed:>12,.0f}/s")
+
+
+def run(n=200_000, n_owners=20_000):
+    start = time.perf_counter()
+    seed(n, n_owners)
+    print(f"seeded {n} reports from {n_owners} reporters in {time.perf_counter() - start:.1f}s\n")
+
+    start = time.perf_counter()
+    scoring.reporter_history(), scoring.verified_reporters()
+    print(f"reporter history and verified set: {time.perf_counter() - start:.2f}s\n")
+
+    print(f"{'pass':14}{'scored':>10}{'written':>10}{'queries':>9}{'time':>11}{'rate':>14}")
+    timed("dry run", dry_run=True)
+    timed("first run")
+    timed("rerun")
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,68 @@
+# Bytes transferred for the report list page and its static assets, with the
+# plain static setup vs. the hashed + precompressed pipeline (app/assets.py).
+#
+#   python benchmarks/static_transfer.py
+import re
+import tempfile
+
+import _setup
+
+_setup.setup()
+
+from django.contrib.staticfiles import finders
+from django.core.management import call_command
+from django.test import Client, override_settings
+
+ASSET_RE = re.compile(rb'(?:href|src)="(/static/[^"]+)"')
+
+
+def page_and_assets(client):
+    html = client.get("/").content
+    return html, [url.decode() for url in ASSET_RE.findall(html)]
+
+
+def run():
+    _setup.seed_reports(200)
+
+    # before: source files, no compression, no cache lifetime
+    client = Client()
+    client.login(username="bench", password="bench")
+    html, assets = page_and_assets(client)
+    raw = {}
+    for url in assets:
+        with open(finders.find(url[len("/static/"):]), "rb") as f:
+            raw[url] = len(f.read())
+    before_first = len(html) + sum(raw.values())
+    before_repeat = before_first
+
+    # after: collectstatic into a temp STATIC_ROOT and serve through the middleware
+    with tempfile.TemporaryDirectory() as root, override_settings(
+        DEBUG=False,
+        STATIC_ROOT=root,
+        STORAGES={
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+            "staticfiles": {"BACKEND": "app.assets.CompressedManifestStaticFilesStorage"},
+        },
+    ):
+        call_command("collectstatic", interactive=False, verbosity=0)
+        client = Client(HTTP_ACCEPT_ENCODING="gzip, br")
+        client.login(username="bench", password="bench")
+        html, assets = page_and_assets(client)
+
+        after_first = len(html)
+        for url in assets:
+            response = client.get(url)
+            body = b"".join(response.streaming_content)
+            after_first += len(body)
+            print(f"  {url}: {len(body)} bytes, {response.get('Content-Encoding', 'identity')}, "
+                  f"Cache-Control: {response['Cache-Control']}")
+        # immutable assets are not requested again on a repeat visit
+        after_repeat = len(html)
+
+    print(f"{'':24}{'first visit':>14}{'repeat visit':>14}")
+    print(f"{'before (bytes)':24}{before_first:>14}{before_repeat:>14}")
+    print(f"{'after (bytes)':24}{after_first:>14}{after_repeat:>14}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,67 @@
+# Render cost of the report list template: Django templates vs. the optional
+# Jinja2 copy in app/jinja2/. Only the render is timed; the queryset is
+# evaluated once up front.
+# Both engines are loaded here, whatever RETEN_REPORT_LIST_ENGINE says.
+#
+#   python benchmarks/template_render.py [reports] [iterations]
+import sys
+import time
+
+import _setup
+
+_setup.setup()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.template import engines
+from django.test import RequestFactory, override_settings
+
+from app.forms import RoadblockFilterForm
+from app.models import RoadblockReport
+from config.settings import TEMPLATE_CONTEXT_PROCESSORS
+
+JINJA2 = {
+    "BACKEND": "django.template.backends.jinja2.Jinja2",
+    "DIRS": [],
+    "APP_DIRS": True,
+    "OPTIONS": {
+        "environment": "config.jinja2.environment",
+        "context_processors": TEMPLATE_CONTEXT_PROCESSORS,
+    },
+}
+
+
+def time_render(template, context, request, iterations):
+    html = template.render(context, request)  # warm up / compile
+    start = time.perf_counter()
+    for _ in range(iterations):
+        template.render(context, request)
+    return (time.perf_counter() - start) / iterations * 1000, len(html)
+
+
+def run(n_reports=500, iterations=20):
+    _setup.seed_reports(n_reports)
+    request = RequestFactory().get("/")
+    request.user = User.objects.get(username="bench")
+    reports = list(RoadblockReport.objects.order_by("-created_at"))
+    context = {
+        "reports": reports,
+        "filter_form": RoadblockFilterForm(),
+        "stats": {"total": n_reports, "active": 0, "resolved": 0, "trusted": 0},
+        "needs_location": False,
+    }
+
+    with override_settings(TEMPLATES=settings.TEMPLATES[:1] + [JINJA2]):
+        print(f"{n_reports} reports, {iterations} renders each")
+        for alias in ("django", "jinja2"):
+            try:
+                template = engines[alias].get_template("roadblocks/report_list.html")
+            except ImportError:
+                print(f"{alias:8} skipped (not installed)")
+                continue
+            ms, size = time_render(template, context, request, iterations)
+            print(f"{alias:8} {ms:8.2f} ms/render  {size} bytes")
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,20 @@
+from django.template.defaultfilters import date
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.timezone import localtime
+from jinja2 import Environment
+
+
+def url(name, *args):
+    return reverse(name, args=args)
+
+
+def local_date(value, fmt):
+    return date(localtime(value), fmt)
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update({"static": static, "url": url})
+    env.filters["date"] = local_date
+    return env
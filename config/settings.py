@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,34 +47,74 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "app.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "app.assets.StaticAssetMiddleware",
+    "app.middleware.GZipMiddleware",
+    "django.middleware.http.ConditionalGetMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "app.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "app.audit.AuditMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
 
+TEMPLATE_CONTEXT_PROCESSORS = [
+    "django.template.context_processors.debug",
+    "django.template.context_processors.request",
+    "django.contrib.auth.context_processors.auth",
+    "django.contrib.messages.context_processors.messages",
+]
+
+# Templates are compiled once per process; runserver's autoreloader still
+# resets the cache when a template file changes.
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [],
-        "APP_DIRS": True,
         "OPTIONS": {
-            "context_processors": [
-                "django.template.context_processors.debug",
-                "django.template.context_processors.request",
-                "django.contrib.auth.context_processors.auth",
-                "django.contrib.messages.context_processors.messages",
+            "context_processors": TEMPLATE_CONTEXT_PROCESSORS,
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
             ],
         },
     },
 ]
 
+# Optional Jinja2 renderer for the report list (app/jinja2/). Needs the
+# jinja2 package; see benchmarks/template_render.py for the comparison.
+REPORT_LIST_TEMPLATE_ENGINE = os.environ.get("RETEN_REPORT_LIST_ENGINE") or None
+
+if REPORT_LIST_TEMPLATE_ENGINE == "jinja2":
+    TEMPLATES.append(
+        {
+            "BACKEND": "django.template.backends.jinja2.Jinja2",
+            "DIRS": [],
+            "APP_DIRS": True,
+            "OPTIONS": {
+                "environment": "config.jinja2.environment",
+                "context_processors": TEMPLATE_CONTEXT_PROCESSORS,
+            },
+        }
+    )
+
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
+
+# Serve the report list/detail pages and JSON endpoints with async views
+# (app/async_views.py). Only worth it under an ASGI server.
+ASYNC_VIEWS = os.environ.get("RETEN_ASYNC_VIEWS") == "1"
 
 
 # Database
@@ -122,6 +163,38 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# With DEBUG off, collectstatic writes content-hashed copies plus .gz/.br
+# variants, and app.assets.StaticAssetMiddleware serves them with far-future
+# cache headers. In DEBUG runserver keeps serving the source files.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    # report photos (app/attachments.py); any storage backend works here
+    "attachments": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": BASE_DIR / "media" / "attachments"},
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage"
+            if DEBUG
+            else "app.assets.CompressedManifestStaticFilesStorage"
+        ),
+    },
+}
+
+MEDIA_ROOT = BASE_DIR / "media"
+
+# Uploads are streamed to a temporary file and hashed as they arrive, never
+# held in memory (app/attachments.py). Photos over ATTACHMENT_MAX_BYTES are
+# refused; thumbnails (ATTACHMENT_THUMBNAIL_SIZE px) need Pillow.
+FILE_UPLOAD_HANDLERS = ["app.attachments.HashingUploadHandler"]
+ATTACHMENT_MAX_BYTES = 10 * 2**20
+ATTACHMENT_MAX_PER_REPORT = 8
+ATTACHMENT_THUMBNAIL_SIZE = 320
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -148,4 +221,78 @@ LOGOUT_REDIRECT_URL = "/accounts/login/"
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 DEFAULT_FROM_EMAIL = "no-reply@roadblocks.local"
 
+# High-severity area alerts (see app/notifications.py)
+NOTIFICATION_BATCH_SIZE = 500
+NOTIFICATION_MIN_INTERVAL = 60 * 60  # seconds between digests to the same user
+
+# Background tasks (app/taskqueue.py). Run them with `manage.py run_worker`;
+# TASKS_EAGER runs immediate tasks inline instead, for setups without a worker.
+TASKS_EAGER = False
+
+# Account deletion purges rows in batches of this size, re-queueing between runs
+ACCOUNT_PURGE_BATCH_SIZE = 500
+ACCOUNT_PURGE_BATCHES_PER_RUN = 20
+
+# Confirmation counters are refreshed in micro-batches (app/confirmations.py):
+# at most this many seconds late, or as soon as this many reports are dirty.
+CONFIRMATION_FLUSH_INTERVAL = 0.5
+CONFIRMATION_FLUSH_BATCH = 200
+CONFIRMED_INDEX_TTL = 600  # per-user "you confirmed this" index, in seconds
+
+# Idempotency keys and other shared state. Use a cache every worker can reach
+# (Redis/Memcached) when running more than one process.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
 
+# Request profiling for staff (app/profiling.py). With PROFILING_ENABLED off
+# the middleware removes itself at startup. When on, a request is profiled if
+# it sends the header, hits one of the URL names, or is sampled.
+PROFILING_ENABLED = os.environ.get("RETEN_PROFILING") == "1"
+PROFILING_ENGINE = os.environ.get("RETEN_PROFILING_ENGINE", "cprofile")  # or "pyinstrument"
+PROFILING_HEADER = "X-Profile"
+PROFILING_URL_NAMES = []
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_KEEP = 200
+
+# Prometheus metrics at /metrics (app/metrics.py). Set METRICS_DIR to a
+# directory shared by all worker processes to aggregate across them, and
+# METRICS_TOKEN to require "Authorization: Bearer <token>" from the scraper.
+# Without a token only METRICS_ALLOWED_IPS may scrape.
+METRICS_DIR = os.environ.get("RETEN_METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = 5.0
+METRICS_TOKEN = os.environ.get("RETEN_METRICS_TOKEN", "")
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+
+# Report detail read-through cache (app/report_cache.py), in seconds
+REPORT_CACHE_TTL = 300
+REPORT_CACHE_VERSION_TTL = 60
+
+# Fan-out-on-write report list timelines (app/timelines.py). When on, a
+# non-staff user's plain list, or one city's (exact city name), is the newest
+# REPORT_TIMELINE_LENGTH reports from a cached id list instead of a query.
+# Needs a shared cache (Redis/Memcached) with more than one process.
+REPORT_TIMELINES = False
+REPORT_TIMELINE_LENGTH = 200
+REPORT_TIMELINE_TTL = 86400
+
+# Migration safety (app/online_migrations.py): migrate refuses migrations that
+# would rebuild, rewrite or write-lock one of MIGRATION_HOT_TABLES once it
+# holds MIGRATION_SAFETY_MIN_ROWS rows, unless run with --allow-unsafe.
+MIGRATION_SAFETY_CHECK = True
+MIGRATION_SAFETY_MIN_ROWS = 10_000
+
+# Severity escalation (app/escalation.py, run by manage.py run_escalation):
+# distinct confirmers within ESCALATION_WINDOW seconds that raise a report to
+# each severity, or flag it for moderator review.
+ESCALATION_WINDOW = 600
+ESCALATION_THRESHOLDS = {"MED": 5, "HIGH": 15}
+ESCALATION_REVIEW_THRESHOLD = 30
+ESCALATION_FLUSH_INTERVAL = 5.0
+
+# Sharding reports by state (app/sharding.py) is off unless SHARD_DATABASES
+# lists extra database aliases; config/settings_sharded.py sets it up.
+SHARD_DATABASES = []
+SHARD_STATE_MAP = {}  # {"MS": "shard_1"}; unlisted states are hashed
@@ -0,0 +1,71 @@
+"""
+Production settings, trimmed per worker role to keep cold starts short.
+
+    DJANGO_SETTINGS_MODULE=config.settings_prod RETEN_ROLE=html gunicorn config.wsgi
+    DJANGO_SETTINGS_MODULE=config.settings_prod RETEN_ROLE=api gunicorn config.wsgi
+
+RETEN_ROLE:
+    html  the server-rendered site (accounts/, reports, moderation)
+    api   the JSON endpoints under api/ only
+    all   both (default)
+
+Nothing here loads the admin or the DRF app. The admin only makes sense on
+the full config.settings. Run migrate, run_worker and the other management
+commands with config.settings too: the worker's account purge needs every app
+that has a foreign key to User installed.
+See benchmarks/import_time.py for the startup numbers.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, TEMPLATE_CONTEXT_PROCESSORS
+
+RETEN_ROLE = os.environ.get("RETEN_ROLE", "all")
+if RETEN_ROLE not in ("html", "api", "all"):
+    raise ValueError(f"RETEN_ROLE must be html, api or all, not {RETEN_ROLE!r}")
+
+DEBUG = os.environ.get("RETEN_DEBUG") == "1"
+SECRET_KEY = os.environ.get("RETEN_SECRET_KEY", SECRET_KEY)  # noqa: F405
+ALLOWED_HOSTS = [host for host in os.environ.get("RETEN_ALLOWED_HOSTS", "").split(",") if host]
+
+ROOT_URLCONF = "config.urls_prod"
+
+# authtoken stays installed for every role: Token rows have to keep their
+# model registered (and cascade) wherever users are deleted or logged in
+skip_apps = {"django.contrib.admin", "rest_framework"}
+skip_middleware = set()
+
+if RETEN_ROLE == "api":
+    skip_apps |= {"django.contrib.messages", "django.contrib.staticfiles"}
+    skip_middleware |= {
+        "app.assets.StaticAssetMiddleware",
+        "django.contrib.messages.middleware.MessageMiddleware",
+        "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    }
+    TEMPLATE_CONTEXT_PROCESSORS = [
+        processor for processor in TEMPLATE_CONTEXT_PROCESSORS if "messages" not in processor
+    ]
+    TEMPLATES = [
+        {**engine, "OPTIONS": {**engine["OPTIONS"], "context_processors": TEMPLATE_CONTEXT_PROCESSORS}}
+        for engine in TEMPLATES  # noqa: F405
+    ]
+
+if RETEN_ROLE == "html":
+    # the CORS allow-list only covers the API's external front end
+    skip_apps |= {"corsheaders"}
+    skip_middleware |= {"corsheaders.middleware.CorsMiddleware"}
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in skip_apps]
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in skip_middleware]
+
+STORAGES = {
+    **STORAGES,  # noqa: F405
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage"
+            if DEBUG
+            else "app.assets.CompressedManifestStaticFilesStorage"
+        ),
+    },
+}
@@ -0,0 +1,32 @@
+"""
+Reports sharded by state across several local SQLite files, for trying out
+app/sharding.py:
+
+    DJANGO_SETTINGS_MODULE=config.settings_sharded python manage.py init_shards
+    DJANGO_SETTINGS_MODULE=config.settings_sharded python manage.py runserver
+
+The default database keeps users, profiles, tasks and any reports filed
+before sharding was turned on; shards/shard_<n>.sqlite3 hold the rest.
+RETEN_SHARDS sets how many shards there are (3 by default).
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, MIDDLEWARE
+
+SHARD_COUNT = int(os.environ.get("RETEN_SHARDS", "3"))
+SHARD_DATABASES = [f"shard_{n}" for n in range(1, SHARD_COUNT + 1)]
+
+DATABASES = {
+    **DATABASES,
+    **{
+        alias: {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / "shards" / f"{alias}.sqlite3"}
+        for alias in SHARD_DATABASES
+    },
+}
+DATABASE_ROUTERS = ["app.sharding.ShardRouter"]
+
+# pins each request to a shard; needs request.user
+after_auth = MIDDLEWARE.index("django.contrib.auth.middleware.AuthenticationMiddleware") + 1
+MIDDLEWARE = [*MIDDLEWARE[:after_auth], "app.sharding.ShardMiddleware", *MIDDLEWARE[after_auth:]]
@@ -0,0 +1,20 @@
+"""
+URL configuration for config.settings_prod: no admin, and only the routes
+the worker's RETEN_ROLE serves.
+"""
+
+from django.conf import settings
+from django.urls import path, include
+
+from app.urls import api_urlpatterns, html_urlpatterns, ops_urlpatterns
+
+urlpatterns = list(ops_urlpatterns)
+
+if settings.RETEN_ROLE in ("html", "all"):
+    urlpatterns += [
+        path("accounts/", include("django.contrib.auth.urls")),
+        path("", include(html_urlpatterns)),
+    ]
+
+if settings.RETEN_ROLE in ("api", "all"):
+    urlpatterns += [path("", include(api_urlpatterns))]